@@ -0,0 +1,180 @@
+"""
+Fulfilment allocation of sales orders across warehouses.
+
+``allocate_orders`` locks the orders, reads the items of every order and
+the stock of every product involved with one query each, plans the
+shipments in memory and applies them with one ``apply_warehouse_deltas``
+call and one ``Shipment.objects.bulk_create``, all in one transaction.
+
+Planning is greedy per product line, aiming for the fewest shipments: a
+line goes to a single warehouse holding the full quantity when there is
+one, preferring warehouses at the earlier of the requested locations, then
+warehouses the order already ships from. Otherwise it is split across the
+warehouses holding the most stock first. Orders are all or nothing; an
+order that cannot be filled completely reports its shortages and takes no
+stock, leaving it to the orders after it.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.db import transaction
+
+from .events import publish_stock_change
+from .models import Order, OrderItem, Shipment, WarehouseProduct
+from .reports import refresh_customers
+from .stock import apply_warehouse_deltas
+
+
+@dataclass
+class Allocation:
+    order_id: int
+    # (warehouse_id, product_id, quantity)
+    shipments: list = field(default_factory=list)
+    # product_id -> units that could not be allocated
+    shortages: dict = field(default_factory=dict)
+
+    @property
+    def allocated(self):
+        return bool(self.shipments) and not self.shortages
+
+    def as_dict(self):
+        return {
+            "order": self.order_id,
+            "allocated": self.allocated,
+            "shipments": [
+                {"warehouse": warehouse_id, "product": product_id, "quantity": quantity}
+                for warehouse_id, product_id, quantity in self.shipments
+            ],
+            "shortages": [
+                {"product": product_id, "quantity": quantity} for product_id, quantity in self.shortages.items()
+            ],
+        }
+
+
+def load_availability(product_ids):
+    """Return ``({product_id: {warehouse_id: quantity}}, {warehouse_id: location_id})`` in one query."""
+    stock = defaultdict(dict)
+    locations = {}
+    for warehouse_id, product_id, quantity, location_id in (
+        WarehouseProduct.objects.filter(product_id__in=product_ids, quantity__gt=0, warehouse__isnull=False)
+        .order_by("pk").values_list("warehouse_id", "product_id", "quantity", "warehouse__location_id")
+    ):
+        # Duplicated placements of a pair are moved through the oldest one
+        # only (see apply_warehouse_deltas), so do not sum them here.
+        stock[product_id].setdefault(warehouse_id, quantity)
+        locations[warehouse_id] = location_id
+    return stock, locations
+
+
+def plan_line(need, available, rank):
+    """
+    Return ``[(warehouse_id, quantity)]`` covering ``need`` from ``available``
+    ({warehouse_id: quantity}) with as few warehouses as possible, or None.
+    """
+    whole = [warehouse_id for warehouse_id, quantity in available.items() if quantity >= need]
+    if whole:
+        return [(min(whole, key=rank), need)]
+    if sum(available.values()) < need:
+        return None
+    picks = []
+    for warehouse_id in sorted(available, key=lambda warehouse_id: (-available[warehouse_id], rank(warehouse_id))):
+        take = min(need, available[warehouse_id])
+        picks.append((warehouse_id, take))
+        need -= take
+        if not need:
+            break
+    return picks
+
+
+def plan_allocations(lines, stock, locations, preferred_locations=()):
+    """
+    Plan ``lines`` ({order_id: {product_id: quantity}}) against ``stock``,
+    consuming it as orders are allocated. Returns a list of ``Allocation``.
+    """
+    location_rank = {location_id: index for index, location_id in enumerate(preferred_locations)}
+    unranked = len(location_rank)
+    allocations = []
+    for order_id, products in lines.items():
+        allocation = Allocation(order_id)
+        used = set()
+
+        def rank(warehouse_id):
+            return (location_rank.get(locations.get(warehouse_id), unranked), warehouse_id not in used, warehouse_id)
+
+        for product_id, need in products.items():
+            available = {
+                warehouse_id: quantity for warehouse_id, quantity in stock.get(product_id, {}).items() if quantity > 0
+            }
+            picks = plan_line(need, available, rank)
+            if picks is None:
+                allocation.shortages[product_id] = need - sum(available.values())
+                continue
+            for warehouse_id, quantity in picks:
+                used.add(warehouse_id)
+                allocation.shipments.append((warehouse_id, product_id, quantity))
+
+        if allocation.shortages:
+            allocation.shipments = []
+        for warehouse_id, product_id, quantity in allocation.shipments:
+            stock[product_id][warehouse_id] -= quantity
+        allocations.append(allocation)
+    return allocations
+
+
+def allocate_orders(order_ids, preferred_locations=()):
+    """
+    Allocate the given pending sales orders and create their outgoing
+    shipments. Allocated orders move to ``processing``. Raises ValueError if
+    the stock changed underneath the plan; nothing is written in that case.
+    """
+    with transaction.atomic():
+        # Lock the orders in primary key order and check them on the locked
+        # rows: a concurrent allocation of the same orders waits here and
+        # then finds them processing.
+        pending = list(Order.objects.select_for_update().filter(
+            pk__in=order_ids,
+            order_type=Order.OrderType.SALE_ORDER,
+            order_status=Order.OrderStatus.PENDING,
+        ).order_by("pk").values_list("pk", "order_date", "customer_id"))
+        shipped = set(Shipment.objects.filter(order_id__in=[pk for pk, _, _ in pending]).values_list("order_id", flat=True))
+        lines = {
+            order_id: {}
+            for order_id, _, _ in sorted(pending, key=lambda row: (row[1], row[0]))
+            if order_id not in shipped
+        }
+        for order_id, product_id, quantity in OrderItem.objects.filter(
+            order_id__in=lines, quantity__gt=0
+        ).values_list("order_id", "product_id", "quantity"):
+            lines[order_id][product_id] = lines[order_id].get(product_id, 0) + quantity
+        lines = {order_id: products for order_id, products in lines.items() if products}
+
+        stock, locations = load_availability({product_id for products in lines.values() for product_id in products})
+        allocations = plan_allocations(lines, stock, locations, preferred_locations)
+        allocated = [allocation for allocation in allocations if allocation.allocated]
+        if not allocated:
+            return allocations
+
+        deltas = defaultdict(int)
+        for allocation in allocated:
+            for warehouse_id, product_id, quantity in allocation.shipments:
+                deltas[(warehouse_id, product_id)] -= quantity
+        remaining = apply_warehouse_deltas(deltas)
+        Shipment.objects.bulk_create([
+            Shipment(
+                shipment_type="outgoing", order_id=allocation.order_id,
+                warehouse_id=warehouse_id, product_id=product_id, quantity=quantity,
+            )
+            for allocation in allocated
+            for warehouse_id, product_id, quantity in allocation.shipments
+        ])
+        allocated_ids = {allocation.order_id for allocation in allocated}
+        Order.objects.filter(pk__in=allocated_ids).update(order_status=Order.OrderStatus.PROCESSSING)
+        # QuerySet.update bypasses the Order receivers. Pending and processing
+        # sales orders count alike in CustomerSummary (counted_customer), the
+        # receivables snapshot rows of their customers are refreshed here.
+        customers = {customer_id for pk, _, customer_id in pending if pk in allocated_ids} - {None}
+        if customers:
+            transaction.on_commit(lambda: refresh_customers(customers))
+    for (warehouse_id, product_id), quantity in remaining.items():
+        publish_stock_change(product_id, quantity, deltas[(warehouse_id, product_id)], warehouse_id)
+    return allocations
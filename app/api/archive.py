@@ -0,0 +1,87 @@
+"""
+Archival of cold orders.
+
+Completed and cancelled orders older than the cutoff are copied to
+``ArchivedOrder``/``ArchivedOrderItem`` and removed from the hot tables in
+id-ordered chunks, one transaction per chunk, so the hot tables and their
+indexes only hold orders that are still read and written regularly. Their
+shipments and manifests stay where they are and are repointed to the
+archived order. Orders with an amount still due stay in the hot tables
+until they are settled, the receivables ageing report only reads those.
+While a chunk deletes its orders ``is_archiving()`` is True, so receivers
+can tell archival from the removal of an order.
+"""
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem, Shipment, ShipmentManifest
+
+ARCHIVABLE_STATUSES = [Order.OrderStatus.COMPLETED, Order.OrderStatus.CANCELLED]
+
+_archiving = ContextVar("archiving", default=False)
+
+
+def is_archiving():
+    """True while ``archive_chunk`` deletes orders it has copied to the archive."""
+    return _archiving.get()
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = getattr(settings, "ORDER_ARCHIVE_AFTER_DAYS", 365)
+    return timezone.now() - timedelta(days=days)
+
+
+def _copied_fields(archive_model):
+    return [
+        field.attname for field in archive_model._meta.concrete_fields
+        if field.attname != "archived_at"
+    ]
+
+
+def archivable_orders(cutoff):
+    return Order.objects.filter(
+        order_date__lt=cutoff,
+        order_status__in=ARCHIVABLE_STATUSES,
+    ).exclude(due__gt=0)
+
+
+def archive_chunk(order_ids):
+    """Move the given orders and their items to the archive tables."""
+    with transaction.atomic():
+        orders = Order.objects.filter(id__in=order_ids).values(*_copied_fields(ArchivedOrder))
+        ArchivedOrder.objects.bulk_create(ArchivedOrder(**row) for row in orders)
+        items = OrderItem.objects.filter(order_id__in=order_ids).values(*_copied_fields(ArchivedOrderItem))
+        ArchivedOrderItem.objects.bulk_create(ArchivedOrderItem(**row) for row in items)
+        # Shipment.order is enforced by the database.
+        for model in (Shipment, ShipmentManifest):
+            model.objects.filter(order_id__in=order_ids).update(archived_order_id=F("order_id"), order=None)
+        # Items go with their orders through the cascade.
+        token = _archiving.set(True)
+        try:
+            Order.objects.filter(id__in=order_ids).delete()
+        finally:
+            _archiving.reset(token)
+
+
+def archive_orders(cutoff=None, batch_size=1000):
+    """
+    Archive all archivable orders placed before ``cutoff`` and return how
+    many were moved.
+    """
+    cutoff = cutoff or archive_cutoff()
+    candidates = archivable_orders(cutoff).order_by("id").values_list("id", flat=True)
+    moved = 0
+    last_id = 0
+    while True:
+        order_ids = list(candidates.filter(id__gt=last_id)[:batch_size])
+        if not order_ids:
+            return moved
+        archive_chunk(order_ids)
+        moved += len(order_ids)
+        last_id = order_ids[-1]
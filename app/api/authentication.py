@@ -0,0 +1,156 @@
+"""
+Stateless token authentication for the API.
+
+Tokens are signed (``django.core.signing``, keyed by SECRET_KEY) lists of
+``[user id, User.token_version, expiry]`` sent as ``Authorization: Token
+<token>``; nothing is stored per token. A verified token is kept in a
+bounded in-process LRU together with its user and the version of the user's
+``user-tokens`` cache namespace (api/caching.py), so a repeated token costs a
+dict lookup and one cache read instead of a signature check and a user
+query.
+
+Revoking a user's tokens increments ``token_version``, which invalidates
+every token issued before, and bumps the namespace so processes sharing the
+cache drop their entries on the next request. Saving or deleting a user
+bumps it as well, so role changes apply immediately. Since the default cache
+may be local to each process, an entry older than ``REVALIDATE_AFTER``
+seconds is also checked against the user's ``token_version`` in the database
+again, which bounds how long a revoked token or a changed role survives in
+other processes.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import F
+from rest_framework import authentication, exceptions
+
+from .caching import bump_version, get_version
+from .models import User
+
+SALT = "api.authentication.token"
+
+DEFAULTS = {
+    "MAX_AGE": 30 * 24 * 3600,
+    "CACHE_SIZE": 10000,
+    # Seconds after which a cached token is checked against the database again.
+    "REVALIDATE_AFTER": 60,
+}
+
+
+def get_setting(name):
+    return getattr(settings, "API_TOKENS", {}).get(name, DEFAULTS[name])
+
+
+def user_tokens(user_id):
+    """Namespace whose version invalidates the cached tokens of a user."""
+    return f"user-tokens:{user_id}"
+
+
+def issue_token(user, max_age=None):
+    """Return a token for ``user`` valid for ``max_age`` seconds (API_TOKENS["MAX_AGE"])."""
+    expires = int(time.time() + (max_age or get_setting("MAX_AGE")))
+    return signing.Signer(salt=SALT).sign_object([str(user.pk), user.token_version, expires])
+
+
+def revoke_tokens(user_id):
+    """Invalidate every token issued to the user so far."""
+    User.objects.filter(pk=user_id).update(token_version=F("token_version") + 1)
+    bump_version(user_tokens(user_id))
+
+
+class VerifiedTokenCache:
+    """Thread-safe LRU of ``token -> (user, token version, expires, namespace version, verified at)``."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, token):
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is not None:
+                self.entries.move_to_end(token)
+            return entry
+
+    def set(self, token, entry):
+        with self.lock:
+            self.entries[token] = entry
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+verified_tokens = VerifiedTokenCache(get_setting("CACHE_SIZE"))
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    keyword = "Token"
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed("Invalid token header.")
+        try:
+            token = header[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed("Invalid token header.")
+        return self.verify_request_token(request, token), token
+
+    def verify_request_token(self, request, token):
+        """
+        Verify ``token`` once per request: the outcome is kept on the Django
+        request, so ThrottleMiddleware and the view's authentication share it.
+        """
+        request = getattr(request, "_request", request)
+        verified = getattr(request, "_verified_token", None)
+        if verified is None or verified[0] != token:
+            try:
+                verified = (token, self.authenticate_token(token))
+            except exceptions.AuthenticationFailed as e:
+                verified = (token, e)
+            request._verified_token = verified
+        if isinstance(verified[1], exceptions.AuthenticationFailed):
+            raise verified[1]
+        return verified[1]
+
+    def authenticate_token(self, token):
+        now = time.time()
+        entry = verified_tokens.get(token)
+        if entry is not None:
+            user, token_version, expires, version, verified_at = entry
+            if expires > now and version == get_version(user_tokens(user.pk)):
+                if now - verified_at < get_setting("REVALIDATE_AFTER"):
+                    return user
+                return self.load_user(token, user.pk, token_version, expires, version, now)
+
+        try:
+            user_id, token_version, expires = signing.Signer(salt=SALT).unsign_object(token)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise exceptions.AuthenticationFailed("Invalid token.")
+        if expires <= now:
+            raise exceptions.AuthenticationFailed("Token has expired.")
+        # Read before the user, a revocation in between then misses the cache next time.
+        version = get_version(user_tokens(user_id))
+        return self.load_user(token, user_id, token_version, expires, version, now)
+
+    @staticmethod
+    def load_user(token, user_id, token_version, expires, version, now):
+        """Return the user of a verified token unless it was revoked since, and cache it."""
+        user = User.objects.filter(pk=user_id, token_version=token_version).first()
+        if user is None:
+            raise exceptions.AuthenticationFailed("Token has been revoked.")
+        verified_tokens.set(token, (user, token_version, expires, version, now))
+        return user
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,62 @@
+"""
+Versioned response caching.
+
+Cached responses are stored under a key containing the current version of
+their namespace (e.g. one supplier's catalog). Writers bump the version once
+their transaction commits instead of hunting down every cached page, so
+invalidation is O(1) and stale entries simply expire.
+
+Versions held in the cache reach other processes only through a shared
+cache. Namespaces that must be invalidated everywhere regardless use
+``get_db_version``/``bump_db_version`` instead, which keep the version in a
+``CacheVersion`` row: one primary key lookup per read, replaced in the
+writer's transaction.
+"""
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import CacheVersion
+
+
+def version_key(namespace):
+    return f"version:{namespace}"
+
+
+def get_version(namespace):
+    """Return the current version token of ``namespace``."""
+    version = cache.get(version_key(namespace))
+    if version is None:
+        cache.add(version_key(namespace), uuid4().hex, None)
+        version = cache.get(version_key(namespace))
+    return version
+
+
+def bump_version(*namespaces):
+    """Invalidate everything cached for ``namespaces`` once the transaction commits."""
+    def bump():
+        cache.set_many({version_key(namespace): uuid4().hex for namespace in namespaces}, None)
+
+    transaction.on_commit(bump)
+
+
+def get_db_version(namespace):
+    """Return the current version of ``namespace`` from the database."""
+    return CacheVersion.objects.filter(pk=namespace).values_list("version", flat=True).first() or ""
+
+
+def bump_db_version(*namespaces):
+    """Invalidate everything cached for ``namespaces``, effective when the transaction commits."""
+    version = uuid4().hex
+    CacheVersion.objects.bulk_create(
+        [CacheVersion(namespace=namespace, version=version) for namespace in namespaces],
+        update_conflicts=True,
+        unique_fields=["namespace"],
+        update_fields=["version"],
+    )
+
+
+def supplier_catalog(supplier_id):
+    """Namespace of a supplier's product listing (/api/suppliers/<id>/products/)."""
+    return f"supplier-products:{supplier_id}"
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Cache-based invalidation only reaches other worker processes through a shared cache."""
+    if settings.CACHES["default"]["BACKEND"] in PROCESS_LOCAL_CACHES:
+        return [Warning(
+            "The default cache is local to each process, so supplier product pages "
+            "and other cached data are not invalidated in other worker processes.",
+            hint="Set CACHE_BACKEND and CACHE_LOCATION to a shared cache such as Redis or Memcached.",
+            id="api.W001",
+        )]
+    return []
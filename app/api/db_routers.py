@@ -0,0 +1,86 @@
+"""
+Read replica routing.
+
+``ReplicaRoutingMiddleware`` marks safe-method requests to views that opt in
+with ``read_replica = True`` as replica-readable; ``ReplicaRouter`` then sends
+their reads to one of ``settings.REPLICA_DATABASES``. Everything else, and any
+read after the request wrote, goes to the primary. A write also sets a short
+lived cookie so the client's next requests keep reading its own writes from
+the primary while the replicas catch up.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PRIMARY = DEFAULT_DB_ALIAS
+
+_request_state = ContextVar("replica_request_state", default=None)
+
+
+class RequestState:
+    def __init__(self, pinned=False):
+        self.replica = None
+        self.pinned = pinned
+
+
+def pin_to_primary():
+    """Route the remaining reads of the current request to the primary."""
+    state = _request_state.get()
+    if state is not None:
+        state.pinned = True
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state is None or state.pinned or state.replica is None:
+            return PRIMARY
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cookie = getattr(settings, "REPLICA_PIN_COOKIE", "db_pin")
+        state = RequestState(pinned=cookie in request.COOKIES)
+        token = _request_state.set(state)
+        try:
+            request.replica_state = state
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+        if state.pinned and request.method not in self.SAFE_METHODS:
+            response.set_cookie(
+                cookie, "1", max_age=getattr(settings, "REPLICA_PIN_SECONDS", 5), httponly=True, samesite="Lax"
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        replicas = getattr(settings, "REPLICA_DATABASES", [])
+        view_class = getattr(view_func, "cls", None)
+        if (
+            replicas
+            and request.method in self.SAFE_METHODS
+            and getattr(view_class, "read_replica", False)
+        ):
+            # One replica per request keeps its reads consistent with each other.
+            request.replica_state.replica = random.choice(replicas)
+        return None
@@ -0,0 +1,135 @@
+"""
+In-process publish/subscribe for live stock level events.
+
+Every stock movement publishes a stock event once its transaction commits:
+``reserve_product_stock`` and ``receive_product_stock`` (api/stock.py),
+``Shipment.save``, ``create_manifest`` (api/shipments.py),
+``allocate_orders`` (api/allocation.py) and ``TransferOrderViewSet.transfer``.
+The SSE endpoint subscribes per connection with an optional
+product/warehouse filter. The backend is pluggable through
+``settings.STOCK_EVENTS["BACKEND"]``: ``LocalBackend`` fans out inside one
+process, a backend fanning out across workers (e.g. over Redis pub/sub) only
+needs to implement ``publish``, ``subscribe`` and ``unsubscribe``.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+DEFAULTS = {
+    "BACKEND": "api.events.LocalBackend",
+    "HEARTBEAT": 15,
+    "MAX_AGE": 300,
+    "QUEUE_SIZE": 1000,
+}
+
+_event_ids = itertools.count(1)
+
+
+def get_setting(name):
+    return getattr(settings, "STOCK_EVENTS", {}).get(name, DEFAULTS[name])
+
+
+class Subscription:
+    """
+    A single subscriber. Events are handed over to the subscriber's event loop
+    thread-safely, since publishers run in sync code (worker threads).
+    """
+
+    def __init__(self, products=None, warehouses=None, maxsize=None):
+        self.products = set(products) if products else None
+        self.warehouses = set(warehouses) if warehouses else None
+        self.dropped = 0
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize or get_setting("QUEUE_SIZE"))
+
+    def matches(self, event):
+        if self.products is not None and event["product"] not in self.products:
+            return False
+        if self.warehouses is not None and event["warehouse"] not in self.warehouses:
+            return False
+        return True
+
+    def deliver(self, event):
+        try:
+            self._loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The subscriber's loop closed without unsubscribing.
+            self.dropped += 1
+
+    def _put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: drop rather than grow without bound.
+            self.dropped += 1
+
+    async def get(self, timeout):
+        """Return the next event, or None if nothing arrived within ``timeout``."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalBackend:
+    """Fan out events to subscribers living in this process."""
+
+    def __init__(self, **options):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.add(subscription)
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.matches(event):
+                subscription.deliver(event)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    options = dict(getattr(settings, "STOCK_EVENTS", {}))
+    backend_class = import_string(options.pop("BACKEND", DEFAULTS["BACKEND"]))
+    return backend_class(**options)
+
+
+def _reset_backend(setting, **kwargs):
+    if setting == "STOCK_EVENTS":
+        get_backend.cache_clear()
+
+
+setting_changed.connect(_reset_backend)
+
+
+def publish_stock_change(product_id, stock, delta, warehouse_id=None):
+    """Publish a stock event after the current transaction commits."""
+    event = {
+        "id": next(_event_ids),
+        "product": str(product_id),
+        "warehouse": warehouse_id,
+        "stock": stock,
+        "delta": delta,
+        "at": timezone.now().isoformat(),
+    }
+    transaction.on_commit(lambda: get_backend().publish(event))
+
+
+def format_event(event):
+    """Encode an event in the text/event-stream wire format."""
+    return f"id: {event['id']}\nevent: stock\ndata: {json.dumps(event)}\n\n".encode()
@@ -0,0 +1,197 @@
+"""
+Read-only fast path for serializing querysets in list actions.
+
+``serialize_many(ProductSerializer, queryset)`` returns the same rows as
+``ProductSerializer(queryset, many=True).data`` without building model
+instances or walking DRF's field machinery per row: the serializer's fields
+are compiled once into ``(name, column, converter)`` entries, the rows are
+fetched as ``values_list`` tuples and mapped to dicts, and many-to-many
+primary keys are loaded with one grouped query on the through table.
+
+Fields that need the model instance (``SerializerMethodField``, nested
+serializers, dotted or ``*`` sources, reverse relations) make the whole
+serializer fall back to DRF, so output never diverges; see
+``compile_serializer``.
+"""
+from datetime import timezone as dt_timezone
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, relations, serializers
+from rest_framework.settings import api_settings
+
+# Batch size for the many-to-many lookups (keeps IN lists under SQLite's
+# parameter limit).
+M2M_BATCH_SIZE = 500
+
+# DRF field class -> converter for non-null database values. Converters
+# mirror the field's to_representation for values as the database returns
+# them; any other field uses its bound to_representation.
+CONVERTERS = {
+    serializers.CharField: None,
+    serializers.EmailField: None,
+    serializers.SlugField: None,
+    serializers.URLField: None,
+    serializers.ChoiceField: None,
+    serializers.IntegerField: int,
+    serializers.FloatField: float,
+    serializers.BooleanField: bool,
+    serializers.ReadOnlyField: None,
+    relations.PrimaryKeyRelatedField: None,
+}
+
+
+class Unsupported(Exception):
+    pass
+
+
+class DateTimeConverter:
+    """
+    ISO 8601 output of ``serializers.DateTimeField``. The field's timezone
+    is resolved once per serialized queryset (``bind``) instead of per value.
+    """
+
+    def __init__(self, field):
+        self.field = field
+
+    def bind(self):
+        field = self.field
+        field_timezone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+
+        def convert(value):
+            if isinstance(value, str):
+                return value
+            if field_timezone is not None:
+                if timezone.is_aware(value):
+                    value = value.astimezone(field_timezone)
+                else:
+                    value = timezone.make_aware(value, field_timezone)
+            elif timezone.is_aware(value):
+                value = timezone.make_naive(value, dt_timezone.utc)
+            value = value.isoformat()
+            return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+        return convert
+
+
+class CompiledSerializer:
+    """Precompiled read plan for one serializer class and model."""
+
+    def __init__(self, names, columns, converters, m2m):
+        self.names = names
+        self.columns = columns
+        # (position, converter) pairs, only for columns needing conversion
+        self.converters = converters
+        # (position, through model, source attname, target attname)
+        self.m2m = m2m
+
+    def serialize(self, queryset):
+        rows = [list(row) for row in queryset.values_list(*self.columns)]
+        for position, convert in self.converters:
+            if isinstance(convert, DateTimeConverter):
+                convert = convert.bind()
+            for row in rows:
+                value = row[position]
+                if value is not None:
+                    row[position] = convert(value)
+        for position, through, source, target in self.m2m:
+            related = self.related_ids(queryset.db, through, source, target, [row[position] for row in rows])
+            for row in rows:
+                row[position] = related.get(row[position], [])
+        names = self.names
+        return [dict(zip(names, row)) for row in rows]
+
+    @staticmethod
+    def related_ids(using, through, source, target, ids):
+        related = {}
+        for start in range(0, len(ids), M2M_BATCH_SIZE):
+            pairs = (
+                through.objects.using(using)
+                .filter(**{f"{source}__in": ids[start:start + M2M_BATCH_SIZE]})
+                .order_by("pk")
+                .values_list(source, target)
+            )
+            for source_id, target_id in pairs:
+                related.setdefault(source_id, []).append(target_id)
+        return related
+
+
+def compile_field(model, name, field):
+    if field.source == "*" or "." in field.source:
+        raise Unsupported(name)
+    try:
+        model_field = model._meta.get_field(field.source)
+    except FieldDoesNotExist:
+        raise Unsupported(name)
+    if model_field.auto_created and not model_field.concrete:
+        raise Unsupported(name)  # reverse relation
+
+    if isinstance(field, relations.ManyRelatedField):
+        child = field.child_relation
+        if type(child) is not relations.PrimaryKeyRelatedField or child.pk_field is not None:
+            raise Unsupported(name)
+        through = model_field.remote_field.through
+        source = through._meta.get_field(model_field.m2m_field_name()).attname
+        target = through._meta.get_field(model_field.m2m_reverse_field_name()).attname
+        return None, (through, source, target)
+
+    field_class = type(field)
+    if isinstance(field, serializers.BaseSerializer):
+        raise Unsupported(name)  # nested serializer
+    if isinstance(field, relations.RelatedField) and (
+        field_class is not relations.PrimaryKeyRelatedField or field.pk_field is not None
+    ):
+        raise Unsupported(name)
+
+    if field_class in CONVERTERS:
+        converter = CONVERTERS[field_class]
+    elif field_class is serializers.UUIDField and field.uuid_format == "hex_verbose":
+        converter = str
+    elif field_class is serializers.DateTimeField and _is_iso(getattr(field, "format", api_settings.DATETIME_FORMAT)):
+        converter = DateTimeConverter(field)
+    else:
+        converter = field.to_representation
+    return model_field.attname, converter
+
+
+def _is_iso(output_format):
+    return output_format is not None and output_format.lower() == ISO_8601
+
+
+@lru_cache(maxsize=None)
+def compile_serializer(serializer_class, model):
+    """
+    Return a ``CompiledSerializer`` for ``serializer_class`` reading rows of
+    ``model``, or None when a field needs DRF's instance-based path.
+    """
+    names, columns, converters, m2m = [], [], [], []
+    for name, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        try:
+            column, converter = compile_field(model, name, field)
+        except Unsupported:
+            return None
+        position = len(columns)
+        names.append(name)
+        if column is None:
+            # Fetch the primary key here, replaced by the related ids.
+            columns.append(model._meta.pk.attname)
+            m2m.append((position, *converter))
+        else:
+            columns.append(column)
+            if converter is not None:
+                converters.append((position, converter))
+    return CompiledSerializer(names, columns, converters, m2m)
+
+
+def serialize_many(serializer_class, queryset, context=None):
+    """
+    Serialize ``queryset`` like ``serializer_class(queryset, many=True).data``,
+    through the compiled fast path when the serializer supports it.
+    """
+    plan = compile_serializer(serializer_class, queryset.model)
+    if plan is None:
+        return serializer_class(queryset, many=True, context=context or {}).data
+    return plan.serialize(queryset)
@@ -0,0 +1,297 @@
+"""
+Bulk import of products and customers from CSV or XLSX files.
+
+Files are read as a stream of rows (``csv`` over the file, openpyxl in
+read-only mode) and processed in batches, so memory is bounded by the batch
+size rather than the file size. For every batch:
+
+* foreign key references are resolved with one query per referenced model
+  (products: ``category`` by slug, ``supplier`` by uuid, ``created_by`` by
+  user email),
+* every row is validated with the resource's serializer rules, minus the
+  per-row relation and uniqueness queries,
+* unique fields, including model defaults of missing ones, are checked
+  with one query per field, plus duplicates within the batch,
+* the valid rows are written with one ``bulk_create`` in their own
+  transaction. Should a concurrent write take a unique value after the
+  check, the batch is retried with a savepoint per row so only the
+  conflicting rows fail.
+
+Rows that fail are reported with their line number and field errors and the
+other rows are still imported. Columns are the serializer's field names;
+empty cells are treated as missing so model defaults apply.
+"""
+import csv
+import io
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from rest_framework import relations
+from rest_framework.exceptions import ValidationError
+from rest_framework.validators import UniqueValidator
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover - XLSX support is optional
+    openpyxl = None
+
+from .caching import bump_version, supplier_catalog
+from .changes import record_changes
+from .models import Category, Customer, Product, Supplier, User, apply_category_deltas
+from .serializers import CustomerSerialiser, ProductSerializer
+
+BATCH_SIZE = 1000
+
+# Failed rows beyond this are counted but not listed.
+MAX_REPORTED_ERRORS = 1000
+
+
+def read_csv(fileobj):
+    """Yield ``(line, row)`` from a binary CSV file with a header line."""
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, {name.strip(): value for name, value in row.items() if name}
+    finally:
+        # Leave the underlying file open for its owner.
+        text.detach()
+
+
+def read_xlsx(fileobj):
+    """Yield ``(line, row)`` from the first sheet of an XLSX workbook with a header row."""
+    if openpyxl is None:
+        raise ValueError("XLSX imports need openpyxl installed")
+    workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(name).strip() if name is not None else "" for name in next(rows, ())]
+        for line, values in enumerate(rows, start=2):
+            yield line, {name: value for name, value in zip(header, values) if name}
+    finally:
+        workbook.close()
+
+
+READERS = {".csv": read_csv, ".xlsx": read_xlsx}
+
+
+def read_rows(fileobj, filename):
+    """Return the row iterator for ``fileobj``, chosen by the extension of ``filename``."""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f"Unsupported file type '{extension}', expected one of: {', '.join(READERS)}")
+    return READERS[extension](fileobj)
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    failed: int = 0
+    # [{"line": n, "errors": {field: [messages]}}], at most MAX_REPORTED_ERRORS
+    errors: list = field(default_factory=list)
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({
+                "line": line,
+                "errors": {name: [str(message) for message in messages] for name, messages in errors.items()},
+            })
+
+    def as_dict(self):
+        return {"created": self.created, "failed": self.failed, "errors": self.errors}
+
+
+class Importer:
+    model = None
+    serializer_class = None
+    # Relation field -> (related model, field identifying it in the file)
+    references = {}
+
+    def __init__(self, batch_size=BATCH_SIZE, dry_run=False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.validator = self.get_validator()
+        self.unique_fields = [
+            model_field.name for model_field in self.model._meta.concrete_fields
+            if model_field.unique and not model_field.primary_key and model_field.name in self.validator.fields
+        ]
+
+    def get_validator(self):
+        """
+        Return a serializer whose ``run_validation`` applies the resource's
+        rules to one row without querying: relations are resolved per batch
+        (or not importable) and uniqueness is checked per batch.
+        """
+        validator = self.serializer_class()
+        fields = validator.fields
+        for name, serializer_field in list(fields.items()):
+            if serializer_field.read_only:
+                continue
+            if name in self.references or isinstance(
+                serializer_field, (relations.RelatedField, relations.ManyRelatedField)
+            ):
+                del fields[name]
+                continue
+            serializer_field.validators = [
+                rule for rule in serializer_field.validators if not isinstance(rule, UniqueValidator)
+            ]
+        return validator
+
+    def run(self, rows):
+        """Import ``rows`` (an iterable of ``(line, row)``) and return an ``ImportResult``."""
+        result = ImportResult()
+        batch = []
+        for line, row in rows:
+            batch.append((line, {name: value for name, value in row.items() if value not in (None, "")}))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch, result)
+                batch = []
+        if batch:
+            self.import_batch(batch, result)
+        return result
+
+    def resolve_references(self, batch):
+        """Return ``{field: {file value: pk}}`` with one query per relation."""
+        resolved = {}
+        for name, (model, lookup) in self.references.items():
+            to_python = model._meta.get_field(lookup).to_python
+            values = set()
+            for _, row in batch:
+                try:
+                    values.add(to_python(row[name]))
+                except (KeyError, DjangoValidationError):
+                    continue
+            resolved[name] = {}
+            # Oldest match wins for non-unique lookups (category slugs).
+            for value, pk in model.objects.filter(**{f"{lookup}__in": values}).order_by("-pk").values_list(lookup, "pk"):
+                resolved[name][value] = pk
+        return resolved
+
+    def validate_row(self, row, resolved):
+        """Return ``(attrs, errors)`` for one row."""
+        errors = {}
+        try:
+            attrs = dict(self.validator.run_validation(row))
+        except ValidationError as e:
+            attrs = {}
+            errors.update(e.detail if isinstance(e.detail, dict) else {"non_field_errors": e.detail})
+        for name, (model, lookup) in self.references.items():
+            model_field = self.model._meta.get_field(name)
+            if name not in row:
+                if not model_field.null:
+                    errors[name] = ["This field is required."]
+                continue
+            try:
+                pk = resolved[name].get(model._meta.get_field(lookup).to_python(row[name]))
+            except DjangoValidationError:
+                pk = None
+            if pk is None:
+                errors[name] = [f"Unknown {model._meta.verbose_name} '{row[name]}'."]
+            else:
+                attrs[model_field.attname] = pk
+        return attrs, errors
+
+    def unique_value(self, attrs, name):
+        """
+        Return the value ``attrs`` give the unique field ``name``, or its
+        model default if missing. Callable defaults (uuid4) differ per row.
+        """
+        if name in attrs:
+            return attrs[name]
+        model_field = self.model._meta.get_field(name)
+        if model_field.has_default() and not callable(model_field.default):
+            return model_field.default
+        return None
+
+    def existing_values(self, validated):
+        """Return ``{unique field: values already taken}`` with one query per field."""
+        taken = {}
+        for name in self.unique_fields:
+            values = {self.unique_value(attrs, name) for _, attrs, errors in validated if not errors}
+            taken[name] = set(
+                self.model.objects.filter(**{f"{name}__in": values - {None}}).values_list(name, flat=True)
+            )
+        return taken
+
+    def import_batch(self, batch, result):
+        resolved = self.resolve_references(batch)
+        validated = [(line, *self.validate_row(row, resolved)) for line, row in batch]
+        taken = self.existing_values(validated)
+
+        objs, lines = [], []
+        for line, attrs, errors in validated:
+            for name in self.unique_fields:
+                value = self.unique_value(attrs, name)
+                if errors or value is None:
+                    continue
+                if value in taken[name]:
+                    errors[name] = [f"{self.model._meta.verbose_name} with this {name} already exists."]
+                taken[name].add(value)
+            if errors:
+                result.add_error(line, errors)
+                continue
+            objs.append(self.model(**attrs))
+            lines.append(line)
+
+        if self.dry_run or not objs:
+            result.created += len(objs)
+            return
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(objs)
+                self.after_create(objs)
+        except IntegrityError:
+            # A concurrent write took a unique value after the check.
+            self.create_each(objs, lines, result)
+            return
+        result.created += len(objs)
+
+    def create_each(self, objs, lines, result):
+        """Create ``objs`` with a savepoint per row, reporting only the rows that fail."""
+        created = []
+        with transaction.atomic():
+            for obj, line in zip(objs, lines):
+                try:
+                    with transaction.atomic():
+                        self.model.objects.bulk_create([obj])
+                except IntegrityError as e:
+                    result.add_error(line, {"non_field_errors": [f"Row not imported: {e}"]})
+                else:
+                    created.append(obj)
+            if created:
+                self.after_create(created)
+        result.created += len(created)
+
+    def after_create(self, objs):
+        # bulk_create bypasses the signal receivers.
+        record_changes(self.model, [obj.pk for obj in objs])
+
+
+class ProductImporter(Importer):
+    model = Product
+    serializer_class = ProductSerializer
+    references = {
+        "category": (Category, "slug"),
+        "supplier": (Supplier, "uuid"),
+        "created_by": (User, "email"),
+    }
+
+    def after_create(self, objs):
+        super().after_create(objs)
+        bump_version(*{supplier_catalog(obj.supplier_id) for obj in objs})
+        apply_category_deltas(Counter(obj.category_id for obj in objs))
+
+
+class CustomerImporter(Importer):
+    model = Customer
+    serializer_class = CustomerSerialiser
+
+
+IMPORTERS = {
+    "products": ProductImporter,
+    "customers": CustomerImporter,
+}
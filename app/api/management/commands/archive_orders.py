@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from api.archive import archivable_orders, archive_cutoff, archive_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Move completed and cancelled orders older than the cutoff "
+        "(settings.ORDER_ARCHIVE_AFTER_DAYS) to the archive tables in chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Archive orders older than this many days.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Orders moved per transaction.")
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many orders would move.")
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options["days"])
+        if options["dry_run"]:
+            count = archivable_orders(cutoff).count()
+            self.stdout.write(f"{count} orders placed before {cutoff:%Y-%m-%d} would be archived")
+            return
+
+        moved = archive_orders(cutoff, options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} orders placed before {cutoff:%Y-%m-%d}"))
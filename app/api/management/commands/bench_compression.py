@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api.management.commands.bench_renderers import list_payloads
+from api.middleware import STREAMS, compress, get_level
+
+# Levels compared per encoding besides the configured one.
+LEVELS = {"gzip": [1, 6, 9], "br": [1, 4, 6, 11], "zstd": [1, 3, 9, 19]}
+
+
+class Command(BaseCommand):
+    help = (
+        "Report compression CPU time against bytes saved per encoding and level for the "
+        "JSON product and order list payloads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Rows per payload (existing rows are repeated).")
+        parser.add_argument("--repeat", type=int, default=5, help="Compressions per measurement.")
+
+    def handle(self, *args, **options):
+        for name, data in list_payloads(options["rows"]):
+            if data is None:
+                self.stdout.write(self.style.WARNING(f"\n{name}: no rows to compress, skipped"))
+                continue
+            body = JSONRenderer().render(data)
+            self.report(name, body, options["repeat"])
+
+    def report(self, name, body, repeat):
+        self.stdout.write(f"\n{name} ({len(body)} bytes of JSON, best of {repeat})")
+        self.stdout.write(f"{'encoding':<10}{'level':>6}{'ms':>9}{'MB/s':>9}{'bytes':>11}{'saved':>8}")
+        for encoding in STREAMS:
+            for level in sorted({*LEVELS[encoding], get_level(encoding)}):
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    compressed = compress(encoding, body, level)
+                    timings.append(time.perf_counter() - started)
+                best = min(timings)
+                marker = " *" if level == get_level(encoding) else ""
+                self.stdout.write(
+                    f"{encoding:<10}{level:>6}{best * 1000:9.2f}{len(body) / best / 1e6:9.1f}"
+                    f"{len(compressed):11d}{1 - len(compressed) / len(body):8.1%}{marker}"
+                )
+        self.stdout.write("* configured level")
@@ -0,0 +1,71 @@
+import itertools
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Order, Product
+from api.renderers import FastJSONRenderer, MessagePackRenderer
+from api.serializers import OrderSerialiser, ProductSerializer
+
+# Label -> (renderer, accepted media type)
+FORMATS = [
+    ("json", JSONRenderer(), "application/json"),
+    ("orjson", FastJSONRenderer(), "application/json; encoder=orjson"),
+    ("msgpack", MessagePackRenderer(), "application/msgpack"),
+]
+
+LISTS = [
+    ("products", Product, ProductSerializer),
+    ("orders", Order, OrderSerialiser),
+]
+
+
+def list_payloads(rows):
+    """
+    Yield ``(name, payload)`` list responses of ``rows`` rows built from the
+    existing rows (repeated as needed); empty tables yield ``None``.
+    """
+    for name, model, serializer_class in LISTS:
+        data = serializer_class(model.objects.all()[:rows], many=True).data
+        if not data:
+            yield name, None
+            continue
+        yield name, {
+            "result": "success",
+            "data": list(itertools.islice(itertools.cycle(data), rows)),
+            "total": rows,
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        "Report encode time and payload size per response format for the product and "
+        "order list payloads, serialized once from existing rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Rows per payload (existing rows are repeated).")
+        parser.add_argument("--repeat", type=int, default=20, help="Encodes per measurement.")
+
+    def handle(self, *args, **options):
+        for name, data in list_payloads(options["rows"]):
+            if data is None:
+                self.stdout.write(self.style.WARNING(f"\n{name}: no rows to encode, skipped"))
+                continue
+            self.report(name, data, options["repeat"])
+
+    def report(self, name, data, repeat):
+        self.stdout.write(f"\n{name} ({data['total']} rows, best of {repeat})")
+        self.stdout.write(f"{'format':<10}{'encode ms':>11}{'bytes':>12}{'vs json':>9}")
+        baseline = None
+        for label, renderer, media_type in FORMATS:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                payload = renderer.render(data, media_type, {})
+                timings.append(time.perf_counter() - started)
+            baseline = baseline or len(payload)
+            self.stdout.write(
+                f"{label:<10}{min(timings) * 1000:11.2f}{len(payload):12d}{len(payload) / baseline:9.2f}"
+            )
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.fast_serializers import compile_serializer, serialize_many
+from api.management.commands.bench_renderers import LISTS
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows serialized per second by DRF and by the compiled fast path for the "
+        "product and order lists (both including the database fetch)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=5000, help="Rows read per run.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'list':<10}{'rows':>7}{'drf rows/s':>14}{'fast rows/s':>14}{'speedup':>9}")
+        for name, model, serializer_class in LISTS:
+            queryset = model.objects.all()[:options["limit"]]
+            if compile_serializer(serializer_class, model) is None:
+                self.stdout.write(self.style.WARNING(f"{name}: serializer not supported by the fast path"))
+                continue
+            rows = len(serialize_many(serializer_class, queryset.all()))
+            if not rows:
+                self.stdout.write(self.style.WARNING(f"{name}: no rows, skipped"))
+                continue
+            drf = self.best(lambda: serializer_class(queryset.all(), many=True).data, options["repeat"])
+            fast = self.best(lambda: serialize_many(serializer_class, queryset.all()), options["repeat"])
+            self.stdout.write(f"{name:<10}{rows:>7}{rows / drf:14.0f}{rows / fast:14.0f}{drf / fast:8.1f}x")
+
+    @staticmethod
+    def best(run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
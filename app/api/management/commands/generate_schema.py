@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.schema import write_schema_file
+
+
+class Command(BaseCommand):
+    help = "Precompute the OpenAPI schema served by the documentation view."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=None,
+            help="Schema file to write. Defaults to settings.SWAGGER_SCHEMA_FILE.",
+        )
+
+    def handle(self, *args, **options):
+        output = options["output"] or settings.SWAGGER_SCHEMA_FILE
+        write_schema_file(output)
+        self.stdout.write(self.style.SUCCESS(f"Schema written to {output}"))
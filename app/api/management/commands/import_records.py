@@ -0,0 +1,32 @@
+import csv
+import zipfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.imports import BATCH_SIZE, IMPORTERS, read_rows
+
+
+class Command(BaseCommand):
+    help = "Import products or customers from a CSV or XLSX file, streaming it in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("resource", choices=sorted(IMPORTERS))
+        parser.add_argument("path", help="A .csv or .xlsx file with a header row of field names.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows validated and written per batch.")
+        parser.add_argument("--dry-run", action="store_true", help="Validate only, write nothing.")
+
+    def handle(self, *args, **options):
+        importer = IMPORTERS[options["resource"]](batch_size=options["batch_size"], dry_run=options["dry_run"])
+        try:
+            with open(options["path"], "rb") as fileobj:
+                result = importer.run(read_rows(fileobj, options["path"]))
+        except (OSError, ValueError, csv.Error, zipfile.BadZipFile) as e:
+            raise CommandError(str(e))
+
+        for error in result.errors:
+            self.stdout.write(f"Line {error['line']}: {error['errors']}")
+        if result.failed > len(result.errors):
+            self.stdout.write(f"... {result.failed - len(result.errors)} more failed rows")
+        action = "Validated" if options["dry_run"] else "Imported"
+        style = self.style.SUCCESS if not result.failed else self.style.WARNING
+        self.stdout.write(style(f"{action} {result.created} {options['resource']}, {result.failed} failed"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.authentication import get_setting, issue_token, revoke_tokens
+from api.models import User
+
+
+class Command(BaseCommand):
+    help = "Print a signed API token for the user with the given email, or revoke all of the user's tokens."
+
+    def add_arguments(self, parser):
+        parser.add_argument("email")
+        parser.add_argument(
+            "--max-age", type=int, default=get_setting("MAX_AGE"), help="Token lifetime in seconds."
+        )
+        parser.add_argument("--revoke", action="store_true", help="Revoke every token issued to the user instead.")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=options["email"]).first()
+        if user is None:
+            raise CommandError(f"No user with email {options['email']}")
+        if options["revoke"]:
+            revoke_tokens(user.pk)
+            self.stdout.write(self.style.SUCCESS(f"Revoked the tokens of {user.email}"))
+            return
+        self.stdout.write(issue_token(user, options["max_age"]))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.planning import create_draft_orders, get_setting, suggest_reorders
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute reorder suggestions from min_stock, stock, open purchase orders and sales "
+        "velocity, and create one draft purchase order per supplier."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--supplier", type=int, action="append", help="Only plan for this supplier (repeatable).")
+        parser.add_argument("--window", type=int, default=get_setting("SALES_WINDOW_DAYS"), help="Sales window in days.")
+        parser.add_argument("--lead-time", type=int, default=get_setting("LEAD_TIME_DAYS"), help="Lead time in days.")
+        parser.add_argument("--cover", type=int, default=get_setting("COVER_DAYS"), help="Days of sales to order for.")
+        parser.add_argument("--dry-run", action="store_true", help="Report suggestions without creating orders.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        suggestions = suggest_reorders(
+            options["supplier"], options["window"], options["lead_time"], options["cover"]
+        )
+        planned = time.perf_counter() - started
+        units = sum(suggestion.quantity for suggestion in suggestions)
+        suppliers = len({suggestion.supplier_id for suggestion in suggestions})
+        self.stdout.write(
+            f"{len(suggestions)} products to reorder ({units} units) from {suppliers} suppliers, "
+            f"planned in {planned:.2f}s"
+        )
+        if options["dry_run"]:
+            for suggestion in suggestions:
+                self.stdout.write(
+                    f"supplier {suggestion.supplier_id}  product {suggestion.product_id}  "
+                    f"order {suggestion.quantity} (stock {suggestion.stock}, on order {suggestion.on_order})"
+                )
+            return
+        orders = create_draft_orders(suggestions)
+        self.stdout.write(self.style.SUCCESS(f"Created {len(orders)} draft purchase orders"))
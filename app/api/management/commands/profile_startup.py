@@ -0,0 +1,106 @@
+import os
+import re
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+
+# Imported by a fresh interpreter to measure a worker's cold start.
+STARTUP_SCRIPT = (
+    "import django; django.setup(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+class Command(BaseCommand):
+    help = (
+        "Report worker cold-start import time per module and the per-request cost "
+        "of each middleware for the active settings (use --settings to compare profiles)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=25, help="Number of modules to list.")
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per middleware measurement.")
+        parser.add_argument("--path", default="/api/products/", help="Request path used for middleware timing.")
+        parser.add_argument("--skip-imports", action="store_true", help="Only measure middleware.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Settings: {settings.SETTINGS_MODULE}")
+        if not options["skip_imports"]:
+            self.report_imports(options["top"])
+        self.report_middleware(options["path"], options["requests"])
+
+    def report_imports(self, top):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE},
+            capture_output=True,
+            text=True,
+        )
+        elapsed = time.perf_counter() - started
+        if result.returncode:
+            self.stderr.write(result.stderr.splitlines()[-1] if result.stderr else "Startup failed")
+            return
+
+        modules = []
+        for line in result.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if match:
+                own, cumulative, indent, name = match.groups()
+                modules.append((int(own), int(cumulative), len(indent) // 2, name))
+
+        total = sum(own for own, _, _, _ in modules)
+        self.stdout.write(
+            f"\nCold start: {elapsed * 1000:.0f} ms wall, {len(modules)} modules, "
+            f"{total / 1000:.0f} ms importing"
+        )
+        self.stdout.write(f"{'self ms':>9} {'cumulative ms':>14}  module")
+        for own, cumulative, _, name in sorted(modules, reverse=True)[:top]:
+            self.stdout.write(f"{own / 1000:9.2f} {cumulative / 1000:14.2f}  {name}")
+
+        self.stdout.write(f"\n{'cumulative ms':>14}  top-level package")
+        packages = sorted((m for m in modules if m[2] == 0), key=lambda m: m[1], reverse=True)
+        for _, cumulative, _, name in packages[:top]:
+            self.stdout.write(f"{cumulative / 1000:14.2f}  {name}")
+
+    def report_middleware(self, path, requests):
+        def view(request):
+            return HttpResponse(b"{}", content_type="application/json")
+
+        def measure(chain):
+            handler = view
+            for middleware in reversed(chain):
+                handler = import_string(middleware)(handler)
+            factory = RequestFactory()
+            started = time.perf_counter()
+            for _ in range(requests):
+                handler(factory.get(path))
+            return (time.perf_counter() - started) / requests * 1e6
+
+        # Middleware are layered cumulatively, so each one sees the request
+        # attributes set by the layers before it (e.g. request.session); its
+        # cost is the increase over the chain without it.
+        self.stdout.write(f"\nMiddleware cost per request ({requests} requests to {path})")
+        self.stdout.write(f"{'us':>9}  middleware")
+        # Limits high enough that every request reaches the view; a fresh
+        # store is used for the measurement.
+        unthrottled = {**getattr(settings, "API_THROTTLING", {}), "ROUTES": {}, "SCOPES": {
+            "default": {"rate": 1e9, "burst": 1e9, "concurrency": 1e9},
+        }}
+        with override_settings(ALLOWED_HOSTS=["*"], API_THROTTLING=unthrottled):
+            baseline = previous = measure([])
+            for index, middleware in enumerate(settings.MIDDLEWARE, start=1):
+                current = measure(settings.MIDDLEWARE[:index])
+                self.stdout.write(f"{max(current - previous, 0):9.2f}  {middleware}")
+                previous = current
+        self.stdout.write(f"{previous - baseline:9.2f}  total ({len(settings.MIDDLEWARE)} middleware)")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.totals import verify_category_tree
+
+
+class Command(BaseCommand):
+    help = "Recompute the category paths, depths and subtree product counts and report (or repair) drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repair", action="store_true", help="Overwrite drifted categories.")
+
+    def handle(self, *args, **options):
+        drifted = verify_category_tree(options["repair"])
+        for category_id in drifted:
+            self.stdout.write(f"Category {category_id}: tree fields drifted")
+
+        action = "repaired" if options["repair"] else "found"
+        style = self.style.SUCCESS if not drifted or options["repair"] else self.style.WARNING
+        self.stdout.write(style(f"{action.capitalize()} {len(drifted)} drifted categories"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.totals import verify_customer_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute the customer summaries from the hot and archived sales orders and report (or repair) drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repair", action="store_true", help="Overwrite drifted summaries.")
+
+    def handle(self, *args, **options):
+        drifted = verify_customer_summaries(options["repair"])
+        for customer_id in drifted:
+            self.stdout.write(f"Customer {customer_id}: summary drifted")
+
+        action = "repaired" if options["repair"] else "found"
+        style = self.style.SUCCESS if not drifted or options["repair"] else self.style.WARNING
+        self.stdout.write(style(f"{action.capitalize()} {len(drifted)} drifted customer summaries"))
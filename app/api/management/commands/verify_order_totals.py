@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api.totals import verify_order_totals
+
+
+class Command(BaseCommand):
+    help = "Recompute order totals from their items in batches and report (or repair) drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Orders checked per batch.")
+        parser.add_argument("--repair", action="store_true", help="Overwrite drifted totals.")
+
+    def handle(self, *args, **options):
+        checked = drifted = 0
+        for batch_checked, batch_drifted in verify_order_totals(options["batch_size"], options["repair"]):
+            checked += batch_checked
+            drifted += len(batch_drifted)
+            for order_id in batch_drifted:
+                self.stdout.write(f"Order {order_id}: totals drifted")
+
+        action = "repaired" if options["repair"] else "found"
+        style = self.style.SUCCESS if not drifted or options["repair"] else self.style.WARNING
+        self.stdout.write(style(f"Checked {checked} orders, {action} {drifted} with drifted totals"))
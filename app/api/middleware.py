@@ -0,0 +1,249 @@
+"""
+Response compression negotiated from ``Accept-Encoding``, and API throttling
+(ThrottleMiddleware, see api/throttling.py).
+
+Brotli and zstd are offered when their packages are installed, gzip always.
+Buffered responses below ``MIN_SIZE`` bytes are sent as they are; streaming
+responses are compressed chunk by chunk and flushed after every chunk, so a
+long export (or an event stream) reaches the client as it is produced
+instead of being held back in the compressor.
+"""
+import math
+import re
+import zlib
+from functools import partial
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from . import throttling
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+DEFAULTS = {
+    # Server preference, best first; unavailable encodings are skipped.
+    "ENCODINGS": ["br", "zstd", "gzip"],
+    "LEVELS": {"br": 4, "zstd": 3, "gzip": 6},
+    "MIN_SIZE": 860,
+    "CONTENT_TYPES": [
+        "application/json",
+        "application/msgpack",
+        "application/javascript",
+        "application/xml",
+        "text/",
+    ],
+}
+
+_etag_re = re.compile(r'^"')
+
+
+def get_setting(name):
+    return getattr(settings, "RESPONSE_COMPRESSION", {}).get(name, DEFAULTS[name])
+
+
+def get_level(encoding):
+    return get_setting("LEVELS").get(encoding, DEFAULTS["LEVELS"][encoding])
+
+
+class GzipStream:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliStream:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdStream:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+# Content-Encoding token -> stream class
+STREAMS = {"gzip": GzipStream}
+if brotli is not None:
+    STREAMS["br"] = BrotliStream
+if zstandard is not None:
+    STREAMS["zstd"] = ZstdStream
+
+
+def compress(encoding, data, level=None):
+    """Compress a complete body with ``encoding``."""
+    stream = STREAMS[encoding](level if level is not None else get_level(encoding))
+    return stream.compress(data) + stream.finish()
+
+
+def parse_accept_encoding(header):
+    """Return ``{coding: q}`` for an Accept-Encoding header."""
+    accepted = {}
+    for item in header.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+def select_encoding(header):
+    """Pick the server-preferred available encoding the client accepts, or None."""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    candidates = [
+        (accepted.get(encoding, wildcard), -index, encoding)
+        for index, encoding in enumerate(get_setting("ENCODINGS"))
+        if encoding in STREAMS
+    ]
+    candidates = [candidate for candidate in candidates if candidate[0] > 0]
+    return max(candidates)[2] if candidates else None
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress responses with brotli, zstd or gzip, whichever the client
+    accepts with the highest q-value (ties go to the ``ENCODINGS`` order).
+    """
+
+    def process_response(self, request, response):
+        if response.has_header("Content-Encoding") or not self.compressible(response):
+            return response
+        if not response.streaming and len(response.content) < get_setting("MIN_SIZE"):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = select_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+        level = get_level(encoding)
+
+        if response.streaming:
+            stream = STREAMS[encoding](level)
+            if response.is_async:
+                response.streaming_content = self.compress_async(stream, response.streaming_content)
+            else:
+                response.streaming_content = self.compress_sync(stream, response.streaming_content)
+            del response.headers["Content-Length"]
+        else:
+            compressed = compress(encoding, response.content, level)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # The compressed body is not byte-identical to the original, so a
+        # strong validator would be wrong (RFC 9110 8.8.1).
+        if response.has_header("ETag"):
+            response.headers["ETag"] = _etag_re.sub('W/"', response.headers["ETag"])
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    @staticmethod
+    def compressible(response):
+        if not 200 <= response.status_code < 300 or response.status_code == 204:
+            return False
+        content_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+        return content_type.endswith("+json") or content_type.startswith(tuple(get_setting("CONTENT_TYPES")))
+
+    @staticmethod
+    def compress_sync(stream, chunks):
+        for chunk in chunks:
+            data = stream.compress(chunk)
+            if data:
+                yield data
+        yield stream.finish()
+
+    @staticmethod
+    async def compress_async(stream, chunks):
+        try:
+            async for chunk in chunks:
+                data = stream.compress(chunk)
+                if data:
+                    yield data
+            yield stream.finish()
+        finally:
+            # Propagate a client disconnect to the wrapped generator so it
+            # can release its resources (e.g. an event subscription).
+            if hasattr(chunks, "aclose"):
+                await chunks.aclose()
+
+
+class ThrottleMiddleware(MiddlewareMixin):
+    """
+    Refuse API requests over their client's rate limit or in-flight cap with
+    429 and a Retry-After header.
+    """
+
+    def process_request(self, request):
+        if not throttling.get_setting("ENABLED") or not request.path.startswith(throttling.get_setting("PATH_PREFIX")):
+            return None
+        scope = throttling.route_scope(request.path)
+        client, role = throttling.identify(request)
+        rate, burst, concurrency = throttling.get_limits(scope, role)
+        store = throttling.get_store()
+        key = f"{scope}:{client}"
+
+        wait = store.take(key, rate, burst)
+        if wait:
+            return self.too_many_requests("Rate limit exceeded", wait)
+        if concurrency is not None:
+            if not store.acquire(key, concurrency):
+                return self.too_many_requests("Too many concurrent requests", 1)
+            request._throttle_slot = (store, key)
+        return None
+
+    def process_response(self, request, response):
+        slot = getattr(request, "_throttle_slot", None)
+        if slot is not None:
+            del request._throttle_slot
+            store, key = slot
+            if response.streaming:
+                # Held until the server closes the response, after the last chunk.
+                response._resource_closers.append(partial(store.release, key))
+            else:
+                store.release(key)
+        return response
+
+    @staticmethod
+    def too_many_requests(message, wait):
+        retry_after = max(1, math.ceil(wait))
+        return JsonResponse(
+            {"result": "error", "message": f"{message}, retry in {retry_after}s"},
+            status=429,
+            headers={"Retry-After": str(retry_after)},
+        )
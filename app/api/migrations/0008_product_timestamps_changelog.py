@@ -0,0 +1,52 @@
+# Generated by Django 4.2.16 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+def seed_changelog(apps, schema_editor):
+    # Seed one upsert per existing row so that a sync from token 0 is a full sync.
+    ChangeLog = apps.get_model('api', 'ChangeLog')
+    for name, model_name in (('product', 'Product'), ('customer', 'Customer'), ('warehouse', 'Warehouse')):
+        model = apps.get_model('api', model_name)
+        object_ids = model.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=2000)
+        batch = []
+        for object_id in object_ids:
+            batch.append(ChangeLog(model=name, object_id=str(object_id), action='upsert'))
+            if len(batch) >= 2000:
+                ChangeLog.objects.bulk_create(batch)
+                batch = []
+        ChangeLog.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_orderitem_order_products'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=50)),
+                ('object_id', models.CharField(max_length=64)),
+                ('action', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=10)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'id'], name='api_changelog_model_id_idx')],
+            },
+        ),
+        migrations.RunPython(seed_changelog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-19 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_product_timestamps_changelog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='warehouseproduct',
+            name='quantity',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.16 on 2026-10-19 17:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_warehouseproduct_quantity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('uuid', models.UUIDField(unique=True)),
+                ('order_date', models.DateTimeField()),
+                ('order_status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processsing'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=150)),
+                ('order_type', models.CharField(choices=[('sale_order', 'Sale Order'), ('purchase_order', 'Purchase Order'), ('transfer_order', 'Transfer Order')], max_length=150)),
+                ('total_items', models.IntegerField()),
+                ('sub_total', models.FloatField()),
+                ('vat', models.FloatField()),
+                ('total_amount', models.FloatField()),
+                ('invoice_no', models.CharField(max_length=255, null=True)),
+                ('payment_type', models.CharField(max_length=255, null=True)),
+                ('pay', models.IntegerField(default=0)),
+                ('due', models.IntegerField(default=0)),
+                ('order_due_date', models.DateTimeField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(null=True)),
+                ('updated_at', models.DateTimeField(null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.IntegerField(default=0)),
+                ('unitcost', models.IntegerField()),
+                ('total_amount', models.IntegerField()),
+                ('created_at', models.DateTimeField(null=True)),
+                ('updated_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['order_date'], name='api_order_order_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orderItems', to='api.archivedorder'),
+        ),
+        migrations.AddField(
+            model_name='archivedorderitem',
+            name='product',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.product'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='customer',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='archived_orders', to='api.customer'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='customer_user',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.user'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='from_warehouse',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.warehouse'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='to_warehouse',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.warehouse'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['order_date'], name='api_archorder_order_date_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-19 17:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_order_archive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='sub_total',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='total_amount',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='total_items',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='vat',
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.16 on 2026-10-19 17:57
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_occupancy(apps, schema_editor):
+    # One UPDATE with a correlated SUM over each warehouse's placements.
+    Warehouse = apps.get_model('api', 'Warehouse')
+    WarehouseProduct = apps.get_model('api', 'WarehouseProduct')
+    held = (
+        WarehouseProduct.objects.filter(warehouse=OuterRef('pk'))
+        .order_by().values('warehouse').annotate(total=Sum('quantity')).values('total')
+    )
+    Warehouse.objects.update(occupancy=Coalesce(Subquery(held), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_order_totals_defaults'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='warehouse',
+            name='occupancy',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_occupancy, migrations.RunPython.noop),
+    ]
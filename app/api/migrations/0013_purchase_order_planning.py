@@ -0,0 +1,38 @@
+# Generated by Django 4.2.16 on 2026-10-19 18:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_warehouse_occupancy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='supplier',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.supplier'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='supplier',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='purchase_orders', to='api.supplier'),
+        ),
+        migrations.AlterField(
+            model_name='archivedorder',
+            name='order_status',
+            field=models.CharField(choices=[('draft', 'Draft'), ('pending', 'Pending'), ('processing', 'Processsing'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=150),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_status',
+            field=models.CharField(choices=[('draft', 'Draft'), ('pending', 'Pending'), ('processing', 'Processsing'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=150),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['order_type', 'order_date'], name='api_order_type_date_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-19 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_purchase_order_planning'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['supplier', 'sku'], name='api_product_supplier_sku_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['supplier', 'name', 'id'], name='api_product_supplier_name_idx'),
+        ),
+    ]
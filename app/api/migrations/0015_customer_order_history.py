@@ -0,0 +1,59 @@
+# Generated by Django 4.2.16 on 2026-10-19 18:08
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def backfill_customer_summaries(apps, schema_editor):
+    # Non-cancelled sales orders of the hot and archive tables, grouped per customer.
+    Customer = apps.get_model('api', 'Customer')
+    CustomerSummary = apps.get_model('api', 'CustomerSummary')
+    totals = {}
+    for name in ('Order', 'ArchivedOrder'):
+        rows = (
+            apps.get_model('api', name).objects
+            .filter(order_type='sale_order', customer__isnull=False).exclude(order_status='cancelled')
+            .order_by().values('customer_id')
+            .annotate(count=Count('pk'), revenue=Sum('total_amount'), due=Sum('due'))
+            .values_list('customer_id', 'count', 'revenue', 'due')
+        )
+        for customer_id, count, revenue, due in rows:
+            old = totals.get(customer_id, (0, 0, 0))
+            totals[customer_id] = (old[0] + count, old[1] + revenue, old[2] + due)
+    existing = set(Customer.objects.filter(pk__in=totals).values_list('pk', flat=True))
+    CustomerSummary.objects.bulk_create(
+        [
+            CustomerSummary(customer_id=customer_id, order_count=count, revenue=revenue, due=due)
+            for customer_id, (count, revenue, due) in totals.items() if customer_id in existing
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_product_supplier_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerSummary',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='api.customer')),
+                ('order_count', models.IntegerField(default=0)),
+                ('revenue', models.FloatField(default=0)),
+                ('due', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['customer', 'order_date'], name='api_archorder_cust_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', 'order_date'], name='api_order_customer_date_idx'),
+        ),
+        migrations.RunPython(backfill_customer_summaries, migrations.RunPython.noop),
+    ]
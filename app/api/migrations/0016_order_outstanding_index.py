@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-19 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_customer_order_history'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('due__gt', 0), ('order_type', 'sale_order')), fields=['customer', 'order_due_date', 'due', 'order_status'], name='api_order_outstanding_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.16 on 2026-10-19 19:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_order_outstanding_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quotation',
+            name='order',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='quotation', to='api.order'),
+        ),
+        migrations.AddField(
+            model_name='quotation',
+            name='sub_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='quotation',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('in_progress', 'In Progress'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('converted', 'Converted')], max_length=150),
+        ),
+        migrations.AlterField(
+            model_name='quotation',
+            name='total_amount',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='QuotationItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('quantity', models.IntegerField(default=0)),
+                ('unitcost', models.IntegerField()),
+                ('total_amount', models.IntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.product')),
+                ('quotation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='api.quotation')),
+            ],
+            options={
+                'unique_together': {('quotation', 'product')},
+            },
+        ),
+    ]
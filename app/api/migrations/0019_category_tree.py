@@ -0,0 +1,56 @@
+# Generated by Django 4.2.16 on 2026-10-19 19:31
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def backfill_category_tree(apps, schema_editor):
+    # Existing categories are flat: every one is a root counting its own products.
+    Category = apps.get_model('api', 'Category')
+    Product = apps.get_model('api', 'Product')
+    counts = dict(
+        Product.objects.filter(category__isnull=False).order_by().values('category_id')
+        .annotate(count=Count('pk')).values_list('category_id', 'count')
+    )
+    categories = list(Category.objects.only('pk'))
+    for category in categories:
+        category.path = f"{category.pk}/"
+        category.depth = 0
+        category.product_count = counts.get(category.pk, 0)
+    Category.objects.bulk_update(categories, ['path', 'depth', 'product_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_price_lists'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='api.category'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='api_category_path_idx'),
+        ),
+        migrations.RunPython(backfill_category_tree, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-19 19:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_category_tree'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='warehouse',
+            name='staff',
+            field=models.ManyToManyField(blank=True, related_name='staffed_warehouses', to='api.user'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.16 on 2026-10-19 19:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_user_token_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShipmentManifest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('shipment_type', models.CharField(choices=[('incoming', 'Incoming (Supplier → Warehouse)'), ('outgoing', 'Outgoing (Warehouse → Customer)')], default='incoming', max_length=10)),
+                ('reference', models.CharField(blank=True, max_length=255, null=True)),
+                ('shipped_from', models.CharField(blank=True, max_length=255, null=True)),
+                ('shipped_to', models.CharField(blank=True, max_length=255, null=True)),
+                ('total_lines', models.IntegerField(default=0, editable=False)),
+                ('total_quantity', models.IntegerField(default=0, editable=False)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='manifests', to='api.order')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='manifests', to='api.warehouse')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='shipment',
+            name='manifest',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='shipments', to='api.shipmentmanifest'),
+        ),
+    ]
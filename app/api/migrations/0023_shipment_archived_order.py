@@ -0,0 +1,24 @@
+# Generated by Django 4.2.16 on 2026-10-19 19:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_shipment_manifests'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='archived_order',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='shipments', to='api.archivedorder'),
+        ),
+        migrations.AddField(
+            model_name='shipmentmanifest',
+            name='archived_order',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='manifests', to='api.archivedorder'),
+        ),
+    ]
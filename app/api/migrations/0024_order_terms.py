@@ -0,0 +1,43 @@
+# Generated by Django 4.2.16 on 2026-10-19 19:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_shipment_archived_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='discount_amount',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='shipping_amount',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='vat_rate',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='discount_amount',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='shipping_amount',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='vat_rate',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-19 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_cacheversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='received_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='received_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
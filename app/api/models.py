@@ -1,7 +1,13 @@
+from collections import defaultdict
 from typing import Iterable
 import uuid
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, Max, Sum, Value
+from django.db.models.functions import Coalesce, Concat, Length, Substr
 from datetime import datetime
+from django.utils import timezone
+from .events import publish_stock_change
 
 class TimeStampedModel(models.Model):
     """Abstract base class that adds created_at and updated_at fields to models."""
@@ -12,6 +18,29 @@ class TimeStampedModel(models.Model):
         abstract = True  
         app_label = "api"      
 
+class LoadedValuesMixin:
+    """
+    Remembers the database values of ``tracked_fields`` (attnames) when an
+    instance is loaded or saved, so signal receivers can compute deltas
+    without re-reading the row.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded_values()
+        return instance
+
+    def remember_loaded_values(self):
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            name: getattr(self, name) for name in self.tracked_fields if name not in deferred
+        }
+
+    def loaded_value(self, name, default=None):
+        return getattr(self, '_loaded_values', {}).get(name, default)
+
 class Country(TimeStampedModel):
     uuid = models.UUIDField(unique=True, default=uuid.uuid4)
     name = models.CharField(max_length=250, blank=False, null=False)
@@ -48,6 +77,12 @@ class User(TimeStampedModel):
     name = models.CharField(max_length=250, blank=False, null=False)
     email = models.EmailField(max_length=250, unique=True, blank=False, null=False)
     age = models.IntegerField(null=True, blank=True)
+    # Incremented to revoke every API token issued so far, see api/authentication.py
+    token_version = models.IntegerField(default=0)
+
+    # Request users authenticated by api.authentication
+    is_authenticated = True
+    is_anonymous = False
 
     def __str__(self):
         role_display = [role[1] for role in self.USER_ROLES if role[0] == self.role][0]
@@ -65,7 +100,16 @@ class UserProfile(TimeStampedModel):
     phone = models.CharField(max_length=250, unique=False, blank=True, null=True)
     photo = models.FileField(max_length=250, unique=False, blank=True, null=True)
 
-class Category(TimeStampedModel):
+class Category(LoadedValuesMixin, TimeStampedModel):
+    """
+    Node of the category tree. ``path`` is the materialized path of ids from
+    the root (``"1/5/12/"``) so a subtree is one index range scan, see
+    ``subtree_filter()``. ``product_count`` counts the products of the
+    category and all of its descendants, maintained from product changes
+    (``apply_category_deltas``) and category moves.
+    """
+    tracked_fields = ('parent_id',)
+
     name = models.CharField(max_length=255, blank=False, null=False)   
     slug = models.SlugField(max_length=255)
     description = models.CharField(max_length=255, blank=True, null=True, default='') 
@@ -75,10 +119,105 @@ class Category(TimeStampedModel):
         on_delete=models.DO_NOTHING, 
         null=True
     )
+    parent = models.ForeignKey(
+        'self',
+        related_name='children',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True
+    )
+    path = models.CharField(max_length=255, default='', editable=False)
+    depth = models.IntegerField(default=0, editable=False)
+    product_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['path'], name='api_category_path_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        moved = self._state.adding or self.parent_id != self.loaded_value('parent_id')
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if moved:
+                self.place()
+        self.remember_loaded_values()
+
+    def place(self):
+        """
+        Recompute the path and depth of the category and its descendants
+        from ``parent`` and move its product count to the new ancestors.
+        Raises ValueError when the parent lies in the category's own subtree
+        or a path of the subtree would outgrow ``path``'s max_length.
+        """
+        old_path, old_depth, count = Category.objects.filter(pk=self.pk).values_list(
+            'path', 'depth', 'product_count'
+        ).get()
+        parent_path, parent_depth = '', -1
+        if self.parent_id is not None:
+            parent_path, parent_depth = Category.objects.filter(pk=self.parent_id).values_list('path', 'depth').get()
+            if old_path and parent_path.startswith(old_path):
+                raise ValueError("A category cannot be moved below itself")
+        new_path = f"{parent_path}{self.pk}/"
+        longest = len(new_path)
+        if old_path:
+            longest += Category.objects.filter(**subtree_filter(old_path, prefix='')).aggregate(
+                longest=Max(Length('path'))
+            )['longest'] - len(old_path)
+        if longest > Category._meta.get_field('path').max_length:
+            raise ValueError("The category tree cannot be nested this deep")
+        if old_path:
+            Category.objects.filter(**subtree_filter(old_path, prefix='')).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1), output_field=models.CharField()),
+                depth=F('depth') + (parent_depth + 1 - old_depth),
+            )
+            if count:
+                _add_to_categories(ancestor_ids(old_path)[:-1], -count)
+                _add_to_categories(ancestor_ids(parent_path), count)
+        else:
+            Category.objects.filter(pk=self.pk).update(path=new_path, depth=parent_depth + 1)
+        self.path, self.depth = new_path, parent_depth + 1
 
     def __str__(self):
         return self.name
 
+def subtree_filter(path, prefix='category__'):
+    """
+    Filter kwargs matching the category with ``path`` and its descendants
+    (through ``prefix``). Paths only hold digits and "/", so the subtree is
+    the range [path, path + ":"), which uses the index on every backend,
+    unlike LIKE 'path%'.
+    """
+    if not path:
+        raise ValueError("Category has no path, run verify_category_tree --repair")
+    return {f'{prefix}path__gte': path, f'{prefix}path__lt': path + ':'}
+
+def ancestor_ids(path):
+    """Ids on a materialized path, root first (the category itself last)."""
+    return [int(pk) for pk in path.split('/') if pk]
+
+def _add_to_categories(category_ids, delta):
+    if category_ids and delta:
+        Category.objects.filter(pk__in=category_ids).update(product_count=F('product_count') + delta)
+
+def apply_category_deltas(deltas):
+    """
+    Apply ``{category_id: product_count_delta}`` to the categories and all of
+    their ancestors, with one UPDATE per distinct resulting delta.
+    """
+    deltas = {category_id: delta for category_id, delta in deltas.items() if category_id is not None and delta}
+    if not deltas:
+        return
+    totals = defaultdict(int)
+    for category_id, path in Category.objects.filter(pk__in=deltas).values_list('pk', 'path'):
+        for ancestor in ancestor_ids(path):
+            totals[ancestor] += deltas[category_id]
+    by_delta = defaultdict(list)
+    for category_id, delta in totals.items():
+        by_delta[delta].append(category_id)
+    for delta, category_ids in by_delta.items():
+        _add_to_categories(category_ids, delta)
+
 class Supplier(TimeStampedModel):
     uuid = models.UUIDField(unique=True, default=uuid.uuid4)
     created_by = models.ForeignKey(
@@ -112,7 +251,9 @@ class Supplier(TimeStampedModel):
     def __str__(self):
         return f"Supplier {self.name}"  
 
-class Product(models.Model):
+class Product(LoadedValuesMixin, TimeStampedModel):
+    tracked_fields = ('supplier_id', 'category_id')
+
     PRODUCT_STATUS = [
         ('active', 'Active'),
         ('pending', 'Pending'),
@@ -160,6 +301,13 @@ class Product(models.Model):
     # class Meta:
     #     unique_together = ['created_by']
 
+    class Meta:
+        # Keyset pagination of the supplier product listing.
+        indexes = [
+            models.Index(fields=['supplier', 'sku'], name='api_product_supplier_sku_idx'),
+            models.Index(fields=['supplier', 'name', 'id'], name='api_product_supplier_name_idx'),
+        ]
+
     def __str__(self):
         return self.name        
 
@@ -181,6 +329,22 @@ class Customer(TimeStampedModel):
     def __str__(self):
         return f"Customer {self.name}" 
     
+class CustomerSummary(models.Model):
+    """
+    Lifetime totals of a customer's sales orders (cancelled ones excluded,
+    archived ones included), maintained incrementally from order saves and
+    item deltas so the order history never scans the orders.
+    """
+    customer = models.OneToOneField(
+        Customer,
+        primary_key=True,
+        related_name='summary',
+        on_delete=models.CASCADE
+    )
+    order_count = models.IntegerField(default=0)
+    revenue = models.FloatField(default=0)
+    due = models.IntegerField(default=0)
+
 class CustomerUser(TimeStampedModel):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -200,12 +364,18 @@ class Warehouse(TimeStampedModel):
     produtcs = models.ManyToManyField(Product, through='WarehouseProduct')
     name = models.CharField(max_length=255, null=False, blank=False)
     capacity = models.IntegerField(null=False, blank=False, default=0)
+    # Units held across all placements, maintained by api.stock.apply_warehouse_deltas
+    occupancy = models.IntegerField(null=False, blank=False, default=0)
     email = models.EmailField(max_length = 254)
+    # Staff users working at the warehouse, see api/scoping.py
+    staff = models.ManyToManyField(User, related_name='staffed_warehouses', blank=True)
 
     def __str__(self):   
         return f"Warehouse {self.name}"
     
-class Order(TimeStampedModel):
+class Order(LoadedValuesMixin, TimeStampedModel):
+    tracked_fields = ('customer_id', 'order_type', 'order_status', 'due', 'order_due_date')
+
     products = models.ManyToManyField(Product, through='OrderItem')
     uuid = models.UUIDField(unique=True, default=uuid.uuid4)
     customer_user = models.ForeignKey(
@@ -222,6 +392,7 @@ class Order(TimeStampedModel):
     order_date = models.DateTimeField(auto_now_add=True)
     #delivery_date = models.DateTimeField(auto_now_add=False)
     class OrderStatus(models.TextChoices):
+        DRAFT = 'draft'
         PENDING = 'pending'
         PROCESSSING = 'processing'
         # SHIPPED = 'shipped'
@@ -234,10 +405,17 @@ class Order(TimeStampedModel):
         PURCHASE_ORDER = 'purchase_order'
         TRANSFER_ORDER = 'transfer_order'
     order_type = models.CharField(choices=OrderType.choices, max_length=150)
-    total_items = models.IntegerField(null=False, blank=False)
-    sub_total = models.FloatField(null=False, blank=False)
-    vat = models.FloatField(null=False, blank=False)
-    total_amount = models.FloatField(null=False, blank=False)
+    # Order level terms, e.g. carried over from a quotation: VAT is charged on
+    # the items less the discount at vat_rate (ORDER_VAT_RATE when null), and
+    # the shipping is added on top.
+    discount_amount = models.FloatField(null=False, blank=False, default=0)
+    shipping_amount = models.FloatField(null=False, blank=False, default=0)
+    vat_rate = models.FloatField(null=True, blank=True)
+    # Maintained from OrderItem changes, see apply_order_deltas()
+    total_items = models.IntegerField(null=False, blank=False, default=0)
+    sub_total = models.FloatField(null=False, blank=False, default=0)
+    vat = models.FloatField(null=False, blank=False, default=0)
+    total_amount = models.FloatField(null=False, blank=False, default=0)
     invoice_no = models.CharField(max_length=255, null=True)
     payment_type = models.CharField(max_length=255, null=True)
     pay = models.IntegerField(null=False, blank=False, default=0)
@@ -257,6 +435,31 @@ class Order(TimeStampedModel):
         null=True
     )
     quantity = models.IntegerField(default=0)
+    # Supplier of a purchase order
+    supplier = models.ForeignKey(
+        Supplier,
+        related_name='purchase_orders',
+        on_delete=models.DO_NOTHING,
+        null=True
+    )
+    # Set when a completed purchase order's items were added to stock, see receive()
+    received_at = models.DateTimeField(null=True, blank=True)
+
+    TOTAL_FIELDS = ['total_items', 'sub_total', 'vat', 'total_amount']
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order_date'], name='api_order_order_date_idx'),
+            models.Index(fields=['order_type', 'order_date'], name='api_order_type_date_idx'),
+            models.Index(fields=['customer', 'order_date'], name='api_order_customer_date_idx'),
+            # Outstanding sales orders only, covering the receivables ageing
+            # report so it never reads the table.
+            models.Index(
+                fields=['customer', 'order_due_date', 'due', 'order_status'],
+                name='api_order_outstanding_idx',
+                condition=models.Q(order_type='sale_order', due__gt=0),
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         # if self.order_type == 'purchaser_order':
@@ -264,21 +467,176 @@ class Order(TimeStampedModel):
         #     self.sub_total = sum([item.total_amount for item in self.orderItems.all()])
         #     self.vat = self.sub_total * 0.16
         #     self.total_amount = self.sub_total + self.vat
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Totals are maintained in the database by item deltas; writing back
+            # the in-memory values could undo concurrent item changes.
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.TOTAL_FIELDS + ['received_at']
+            ]
+        # Item prices are settled when the items are written. Sales orders
+        # take their stock when reserved (quotation conversion), shipments
+        # and manifests move warehouse stock, and purchase orders add theirs
+        # once, when first saved as completed (receive()).
         try:
-            super().save(*args, **kwargs)
-            for item in self.orderItems.all():
-                item.product.stock += item.quantity
-                item.unitcost = item.product.price
-                item.total_amount = item.unitcost * item.quantity
-                item.product.save()
-                item.save()
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                if (
+                    self.order_type == self.OrderType.PURCHASE_ORDER
+                    and self.order_status == self.OrderStatus.COMPLETED
+                ):
+                    self.receive()
+            self.refresh_from_db(fields=self.TOTAL_FIELDS)
         except Exception as e:
             raise ValueError("Unable to create order: " + str(e))
 
+    def receive(self):
+        """
+        Add the items of a purchase order to ``Product.stock``, once: the row
+        is claimed by setting ``received_at``, so later or concurrent saves
+        of the completed order do not receive it again.
+        """
+        from .stock import receive_product_stock
+        quantities = dict(self.orderItems.values_list('product_id', 'quantity'))
+        # An order completed before its items are added is received on a later save.
+        if not quantities:
+            return
+        received_at = timezone.now()
+        if not Order.objects.filter(pk=self.pk, received_at__isnull=True).update(received_at=received_at):
+            return
+        self.received_at = received_at
+        receive_product_stock(quantities)
+
     def __str__(self):
         return f"Order {self.uuid}"
 
-class OrderItem(TimeStampedModel):
+def apply_order_deltas(deltas):
+    """
+    Apply ``{order_id: (quantity_delta, amount_delta)}`` to the denormalized
+    order totals with one in-place UPDATE per order, so totals never require
+    scanning the items. Revenue changes of sales orders are passed on to the
+    customer summaries.
+    """
+    default_rate = getattr(settings, 'ORDER_VAT_RATE', 0.16)
+    rate = Coalesce(F('vat_rate'), Value(default_rate))
+    deltas = {order_id: delta for order_id, delta in deltas.items() if any(delta)}
+    for order_id, (quantity, amount) in deltas.items():
+        Order.objects.filter(pk=order_id).update(
+            total_items=F('total_items') + quantity,
+            sub_total=F('sub_total') + amount,
+            vat=F('vat') + amount * rate,
+            total_amount=F('total_amount') + amount * (1 + rate),
+        )
+    amounts = {order_id: amount for order_id, (_, amount) in deltas.items() if amount}
+    if amounts:
+        customer_deltas = defaultdict(lambda: (0, 0, 0))
+        orders = counted_orders(Order.objects.filter(pk__in=amounts)).values_list('pk', 'customer_id', 'vat_rate')
+        for order_id, customer_id, vat_rate in orders:
+            count, revenue, due = customer_deltas[customer_id]
+            order_rate = default_rate if vat_rate is None else vat_rate
+            customer_deltas[customer_id] = (count, revenue + amounts[order_id] * (1 + order_rate), due)
+        apply_customer_deltas(customer_deltas)
+
+def counted_orders(orders):
+    """Restrict ``orders`` to those counted in the customer summaries."""
+    return orders.filter(
+        order_type=Order.OrderType.SALE_ORDER, customer__isnull=False
+    ).exclude(order_status=Order.OrderStatus.CANCELLED)
+
+def counted_customer(customer_id, order_type, order_status):
+    """Return the customer an order with these values counts for, or None."""
+    if order_type != Order.OrderType.SALE_ORDER or order_status == Order.OrderStatus.CANCELLED:
+        return None
+    return customer_id
+
+def apply_customer_deltas(deltas):
+    """
+    Apply ``{customer_id: (order_count_delta, revenue_delta, due_delta)}`` to
+    the customer summaries, creating missing summaries on the way.
+    """
+    for customer_id, (count, revenue, due) in deltas.items():
+        if customer_id is None or not (count or revenue or due):
+            continue
+        changes = dict(order_count=F('order_count') + count, revenue=F('revenue') + revenue, due=F('due') + due)
+        if not CustomerSummary.objects.filter(pk=customer_id).update(**changes):
+            CustomerSummary.objects.bulk_create([CustomerSummary(customer_id=customer_id)], ignore_conflicts=True)
+            CustomerSummary.objects.filter(pk=customer_id).update(**changes)
+
+def _item_totals_by_order(queryset):
+    rows = queryset.order_by().values('order_id').annotate(
+        quantity=Sum('quantity'), amount=Sum('total_amount')
+    ).values_list('order_id', 'quantity', 'amount')
+    return {order_id: (quantity or 0, amount or 0) for order_id, quantity, amount in rows}
+
+def _lock_rows(queryset):
+    """Lock the rows of ``queryset`` and return a plain queryset over them."""
+    pks = list(queryset.select_for_update().values_list('pk', flat=True))
+    return queryset.model._base_manager.filter(pk__in=pks)
+
+def _subtract_totals(after, before):
+    return {
+        order_id: (
+            after.get(order_id, (0, 0))[0] - before.get(order_id, (0, 0))[0],
+            after.get(order_id, (0, 0))[1] - before.get(order_id, (0, 0))[1],
+        )
+        for order_id in after.keys() | before.keys()
+    }
+
+class OrderItemQuerySet(models.QuerySet):
+    """
+    Bulk operations bypass the OrderItem signal receivers, so they apply the
+    order total deltas themselves, grouped per order.
+    """
+    TOTAL_SOURCE_FIELDS = {'order', 'order_id', 'quantity', 'total_amount'}
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+            # Which rows were written is unknown, measure the orders instead.
+            objs = list(objs)
+            with transaction.atomic(using=self.db):
+                affected = self.model._base_manager.filter(order_id__in={obj.order_id for obj in objs})
+                before = _item_totals_by_order(affected)
+                objs = super().bulk_create(objs, *args, **kwargs)
+                apply_order_deltas(_subtract_totals(_item_totals_by_order(affected), before))
+            return objs
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            deltas = {}
+            for obj in objs:
+                quantity, amount = deltas.get(obj.order_id, (0, 0))
+                deltas[obj.order_id] = (quantity + obj.quantity, amount + obj.total_amount)
+                obj.remember_loaded_values()
+            apply_order_deltas(deltas)
+        return objs
+
+    def update(self, **kwargs):
+        # Also covers bulk_update(), which is implemented on top of update().
+        if not self.TOTAL_SOURCE_FIELDS & kwargs.keys():
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            affected = _lock_rows(self)
+            before = _item_totals_by_order(affected)
+            rows = super().update(**kwargs)
+            apply_order_deltas(_subtract_totals(_item_totals_by_order(affected), before))
+        return rows
+    update.alters_data = True
+
+    def delete(self):
+        # Per-row post_delete receivers skip deletes originating from a
+        # queryset; the removed totals are subtracted here in one pass.
+        with transaction.atomic(using=self.db):
+            before = _item_totals_by_order(_lock_rows(self))
+            result = super().delete()
+            apply_order_deltas({
+                order_id: (-quantity, -amount) for order_id, (quantity, amount) in before.items()
+            })
+        return result
+    delete.alters_data = True
+    delete.queryset_only = True
+
+class OrderItem(LoadedValuesMixin, TimeStampedModel):
+    tracked_fields = ('order_id', 'quantity', 'total_amount')
+
     order = models.ForeignKey(
         Order, 
         related_name='orderItems', 
@@ -292,6 +650,8 @@ class OrderItem(TimeStampedModel):
     unitcost = models.IntegerField(null=False, blank=False)
     total_amount = models.IntegerField(null=False, blank=False)
 
+    objects = OrderItemQuerySet.as_manager()
+
     class Meta:
         unique_together = ['order', 'product']
 
@@ -327,12 +687,15 @@ class Quotation(TimeStampedModel):
     discount_percentage = models.IntegerField(null=False, blank=False, default=0)
     discount_amount = models.IntegerField(null=False, blank=False, default=0)
     shipping_amount = models.IntegerField(null=False, blank=False, default=0)
-    total_amount = models.IntegerField(null=False, blank=False)
+    # Maintained from the items, see Quotation.recalculate()
+    sub_total = models.IntegerField(null=False, blank=False, default=0)
+    total_amount = models.IntegerField(null=False, blank=False, default=0)
     class QuotationStatus(models.TextChoices):
         PENDING = 'pending'
         IN_PROGRESS = 'in_progress'
         APPROVED = 'approved'
         REJECTED = 'rejected'
+        CONVERTED = 'converted'
     status = models.CharField(choices=QuotationStatus.choices, max_length=150)
     note = models.TextField()
     created_by = models.ForeignKey(
@@ -342,9 +705,88 @@ class Quotation(TimeStampedModel):
          null=True
     )
 
+    # Sales order created from the quotation, see api/quotations.py
+    order = models.OneToOneField(
+        Order,
+        related_name='quotation',
+        on_delete=models.SET_NULL,
+        null=True
+    )
+
+    def recalculate(self, sub_total):
+        """Set the totals for an items sub total; percentages win over fixed amounts."""
+        self.sub_total = sub_total
+        if self.discount_percentage:
+            self.discount_amount = round(sub_total * self.discount_percentage / 100)
+        if self.tax_percentage:
+            self.tax_amount = round((sub_total - self.discount_amount) * self.tax_percentage / 100)
+        self.total_amount = sub_total - self.discount_amount + self.tax_amount + self.shipping_amount
+
     def __str__(self):
         return f"Quotation {self.uuid}"
 
+class QuotationItem(TimeStampedModel):
+    quotation = models.ForeignKey(
+        Quotation,
+        related_name='items',
+        on_delete=models.CASCADE
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE
+    )
+    quantity = models.IntegerField(null=False, blank=False, default=0)
+    unitcost = models.IntegerField(null=False, blank=False)
+    total_amount = models.IntegerField(null=False, blank=False)
+
+    class Meta:
+        unique_together = ['quotation', 'product']
+
+class TaxType(TimeStampedModel):
+    """Tax rule of the products whose ``tax_type`` is its id, see api/pricing.py"""
+    name = models.CharField(max_length=255, null=False)
+    # Percent
+    rate = models.FloatField(null=False, blank=False, default=0)
+    # Prices already include the tax
+    inclusive = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"TaxType {self.name}"
+
+class PriceList(TimeStampedModel):
+    """
+    Unit prices overriding ``Product.selling_price``. A list without customer
+    applies to everyone; a customer's own list wins over it.
+    """
+    name = models.CharField(max_length=255, null=False)
+    customer = models.ForeignKey(
+        Customer,
+        related_name='price_lists',
+        on_delete=models.CASCADE,
+        null=True
+    )
+    active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"PriceList {self.name}"
+
+class PriceListItem(TimeStampedModel):
+    price_list = models.ForeignKey(
+        PriceList,
+        related_name='items',
+        on_delete=models.CASCADE
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE
+    )
+    # Quantity break: the price applies from this many units per line
+    min_quantity = models.IntegerField(null=False, blank=False, default=1)
+    unit_price = models.IntegerField(null=False, blank=False)
+
+    class Meta:
+        unique_together = ['price_list', 'product', 'min_quantity']
+
 class Unit(TimeStampedModel):
     name = models.CharField(max_length=255, null=False, blank=False)
     slug = models.CharField(max_length=255, null=False, blank=False)
@@ -382,14 +824,51 @@ class WarehouseProduct(TimeStampedModel):
          on_delete=models.DO_NOTHING, 
          null=True
     )
+    quantity = models.IntegerField(null=False, blank=False, default=0)
 
-# Shipment Model (Tracks shipments from suppliers to warehouses and warehouses to customers)
-class Shipment(models.Model):
+class ShipmentManifest(TimeStampedModel):
+    """
+    A batch of shipment lines for one warehouse (e.g. a truck receipt),
+    recorded by api.shipments.create_manifest with one stock movement for all
+    of its lines. Its ``shipments`` are the lines.
+    """
     SHIPMENT_TYPES = [
         ('incoming', 'Incoming (Supplier → Warehouse)'),
         ('outgoing', 'Outgoing (Warehouse → Customer)'),
     ]
 
+    shipment_type = models.CharField(max_length=10, choices=SHIPMENT_TYPES, default='incoming')
+    warehouse = models.ForeignKey(Warehouse, related_name='manifests', on_delete=models.PROTECT)
+    reference = models.CharField(max_length=255, null=True, blank=True)  # Delivery note, truck or seal number
+    shipped_from = models.CharField(max_length=255, null=True, blank=True)
+    shipped_to = models.CharField(max_length=255, null=True, blank=True)
+    order = models.ForeignKey(
+        Order,
+        related_name='manifests',
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True
+    )
+    # The order once it moved to the archive (api/archive.py).
+    archived_order = models.ForeignKey(
+        'ArchivedOrder',
+        related_name='manifests',
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True,
+        db_constraint=False
+    )
+    total_lines = models.IntegerField(default=0, editable=False)
+    total_quantity = models.IntegerField(default=0, editable=False)
+
+    def __str__(self):
+        return f"Manifest {self.pk} ({self.shipment_type}, {self.total_lines} lines)"
+
+
+# Shipment Model (Tracks shipments from suppliers to warehouses and warehouses to customers)
+class Shipment(models.Model):
+    SHIPMENT_TYPES = ShipmentManifest.SHIPMENT_TYPES
+
     shipment_type = models.CharField(max_length=10, choices=SHIPMENT_TYPES, default='incoming')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True)
     warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, null=True)
@@ -403,20 +882,43 @@ class Shipment(models.Model):
          on_delete=models.DO_NOTHING, 
          null=True
     )
+    # The order once it moved to the archive (api/archive.py).
+    archived_order = models.ForeignKey(
+        'ArchivedOrder',
+        related_name='shipments',
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True,
+        db_constraint=False
+    )
+    # Set on the lines of a manifest, whose stock moved with the manifest.
+    manifest = models.ForeignKey(
+        ShipmentManifest,
+        related_name='shipments',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
 
     def save(self, *args, **kwargs):
+        from .stock import apply_warehouse_deltas
+
+        # Stock moves once, when the shipment is recorded; the warehouse
+        # occupancy and capacity checks are handled by apply_warehouse_deltas.
+        moves = (
+            self._state.adding and self.quantity
+            and self.product_id is not None and self.warehouse_id is not None
+        )
         if self.shipment_type == 'incoming':  # Supplier → Warehouse
-            stock, created = Stock.objects.get_or_create(product=self.product, warehouse=self.warehouse)
-            stock.quantity += self.quantity  # Increase stock
-            stock.save()
-        elif self.shipment_type == 'outgoing':  # Warehouse → Customer
-            stock = Stock.objects.get(product=self.product, warehouse=self.warehouse)
-            if stock.quantity >= self.quantity:
-                stock.quantity -= self.quantity  # Decrease stock
-                stock.save()
-            else:
-                raise ValueError("Not enough stock available!")
-        super().save(*args, **kwargs)              
+            delta = self.quantity
+        else:  # Warehouse → Customer
+            delta = -self.quantity
+        with transaction.atomic():
+            if moves:
+                stock, = apply_warehouse_deltas({(self.warehouse_id, self.product_id): delta}).values()
+            super().save(*args, **kwargs)
+        if moves:
+            publish_stock_change(self.product_id, stock, delta, self.warehouse_id)
 
 # class Shipment(TimeStampedModel):
 #     shipment_date = models.DateTimeField(auto_now_add=False)
@@ -437,3 +939,133 @@ class Shipment(models.Model):
     #photo = models.ImageField(upload_to='images/', blank=True, null=True, null=True)
 
 
+class ChangeLog(models.Model):
+    """
+    Append-only log of upserts and deletes for models exposed through the
+    change feed. The auto-incrementing id doubles as the sync token.
+    """
+    class Action(models.TextChoices):
+        UPSERT = 'upsert'
+        DELETE = 'delete'
+
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=50)
+    object_id = models.CharField(max_length=64)
+    action = models.CharField(choices=Action.choices, max_length=10)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'id'], name='api_changelog_model_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.model}:{self.object_id}"
+
+
+class CacheVersion(models.Model):
+    """
+    Version counter of a cache namespace kept in the database, for caches
+    whose invalidation must reach every process even when the cache itself
+    is local to each one (see api/caching.py).
+    """
+    namespace = models.CharField(max_length=100, primary_key=True)
+    version = models.CharField(max_length=32)
+
+    def __str__(self):
+        return f"{self.namespace} {self.version}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    Cold storage for completed and cancelled orders older than
+    settings.ORDER_ARCHIVE_AFTER_DAYS, moved here by `manage.py archive_orders`.
+    Mirrors the concrete fields of Order and keeps the original ids; relations
+    are not enforced by the database so archived rows never block deletes.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    uuid = models.UUIDField(unique=True)
+    customer_user = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.DO_NOTHING,
+        null=True,
+        db_constraint=False
+    )
+    customer = models.ForeignKey(
+        Customer,
+        related_name='archived_orders',
+        on_delete=models.DO_NOTHING,
+        null=True,
+        db_constraint=False
+    )
+    order_date = models.DateTimeField()
+    order_status = models.CharField(choices=Order.OrderStatus.choices, max_length=150)
+    order_type = models.CharField(choices=Order.OrderType.choices, max_length=150)
+    discount_amount = models.FloatField(default=0)
+    shipping_amount = models.FloatField(default=0)
+    vat_rate = models.FloatField(null=True, blank=True)
+    total_items = models.IntegerField()
+    sub_total = models.FloatField()
+    vat = models.FloatField()
+    total_amount = models.FloatField()
+    invoice_no = models.CharField(max_length=255, null=True)
+    payment_type = models.CharField(max_length=255, null=True)
+    pay = models.IntegerField(default=0)
+    due = models.IntegerField(default=0)
+    order_due_date = models.DateTimeField()
+    from_warehouse = models.ForeignKey(
+        Warehouse,
+        related_name='+',
+        on_delete=models.DO_NOTHING,
+        null=True,
+        db_constraint=False
+    )
+    to_warehouse = models.ForeignKey(
+        Warehouse,
+        related_name='+',
+        on_delete=models.DO_NOTHING,
+        null=True,
+        db_constraint=False
+    )
+    quantity = models.IntegerField(default=0)
+    supplier = models.ForeignKey(
+        Supplier,
+        related_name='+',
+        on_delete=models.DO_NOTHING,
+        null=True,
+        db_constraint=False
+    )
+    received_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order_date'], name='api_archorder_order_date_idx'),
+            models.Index(fields=['customer', 'order_date'], name='api_archorder_cust_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.uuid}"
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(
+        ArchivedOrder,
+        related_name='orderItems',
+        on_delete=models.CASCADE
+    )
+    product = models.ForeignKey(
+        Product,
+        related_name='+',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False
+    )
+    quantity = models.IntegerField(default=0)
+    unitcost = models.IntegerField()
+    total_amount = models.IntegerField()
+    created_at = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(null=True)
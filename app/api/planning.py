@@ -0,0 +1,145 @@
+"""
+Reorder-point planning for purchase orders.
+
+For every product the planner compares the stock position (``Product.stock``
+plus units on open purchase orders) with its reorder point::
+
+    velocity      = units sold over the sales window / window days
+    reorder point = min_stock + velocity * lead time days
+    target        = reorder point + velocity * cover days
+
+and suggests ``target - position`` units, rounded up, when the position is
+at or below the reorder point. Sales velocity and open purchase quantities
+are computed for the whole catalog with one grouped aggregate query each,
+and the catalog is streamed as value tuples, so a run costs three queries
+regardless of catalog size. Suggestions become one draft purchase order per
+supplier, created with two ``bulk_create`` calls. Draft orders count as open,
+so running the planner again does not duplicate them.
+"""
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Order, OrderItem, Product
+
+DEFAULTS = {
+    "SALES_WINDOW_DAYS": 30,
+    "LEAD_TIME_DAYS": 7,
+    "COVER_DAYS": 14,
+}
+
+OPEN_PURCHASE_STATUSES = [Order.OrderStatus.DRAFT, Order.OrderStatus.PENDING, Order.OrderStatus.PROCESSSING]
+
+CATALOG_CHUNK_SIZE = 10000
+
+
+def get_setting(name):
+    return getattr(settings, "REORDER_PLANNING", {}).get(name, DEFAULTS[name])
+
+
+@dataclass
+class Suggestion:
+    product_id: object
+    supplier_id: int
+    quantity: int
+    stock: int
+    on_order: int
+    velocity: float
+    reorder_point: float
+    unitcost: int
+
+    def as_dict(self):
+        return {
+            "product": self.product_id,
+            "supplier": self.supplier_id,
+            "quantity": self.quantity,
+            "stock": self.stock,
+            "on_order": self.on_order,
+            "velocity": round(self.velocity, 4),
+            "reorder_point": round(self.reorder_point, 2),
+        }
+
+
+def _quantities_by_product(items):
+    return dict(items.order_by().values("product_id").annotate(total=Sum("quantity")).values_list("product_id", "total"))
+
+
+def sales_velocity(window_days, now=None):
+    """Return ``{product_id: units sold per day}`` over the trailing window."""
+    since = (now or timezone.now()) - timedelta(days=window_days)
+    sold = _quantities_by_product(OrderItem.objects.filter(
+        order__order_type=Order.OrderType.SALE_ORDER,
+        order__order_date__gte=since,
+    ).exclude(order__order_status=Order.OrderStatus.CANCELLED))
+    return {product_id: total / window_days for product_id, total in sold.items()}
+
+
+def open_purchase_quantities():
+    """Return ``{product_id: units on open purchase orders}``."""
+    return _quantities_by_product(OrderItem.objects.filter(
+        order__order_type=Order.OrderType.PURCHASE_ORDER,
+        order__order_status__in=OPEN_PURCHASE_STATUSES,
+    ))
+
+
+def suggest_reorders(suppliers=None, window_days=None, lead_time_days=None, cover_days=None):
+    """Return the list of ``Suggestion`` for the catalog (optionally only ``suppliers``)."""
+    window_days = window_days or get_setting("SALES_WINDOW_DAYS")
+    lead_time_days = get_setting("LEAD_TIME_DAYS") if lead_time_days is None else lead_time_days
+    cover_days = get_setting("COVER_DAYS") if cover_days is None else cover_days
+    velocity = sales_velocity(window_days)
+    on_order = open_purchase_quantities()
+
+    catalog = Product.objects.all()
+    if suppliers:
+        catalog = catalog.filter(supplier_id__in=suppliers)
+    suggestions = []
+    for product_id, supplier_id, stock, min_stock, price in catalog.order_by().values_list(
+        "id", "supplier_id", "stock", "min_stock", "price"
+    ).iterator(chunk_size=CATALOG_CHUNK_SIZE):
+        rate = velocity.get(product_id, 0.0)
+        reorder_point = min_stock + rate * lead_time_days
+        incoming = on_order.get(product_id, 0)
+        position = stock + incoming
+        if position > reorder_point:
+            continue
+        quantity = math.ceil(reorder_point + rate * cover_days - position)
+        if quantity > 0:
+            suggestions.append(Suggestion(
+                product_id, supplier_id, quantity, stock, incoming, rate, reorder_point, price
+            ))
+    return suggestions
+
+
+def create_draft_orders(suggestions):
+    """Create one draft purchase order per supplier and return the orders."""
+    by_supplier = defaultdict(list)
+    for suggestion in suggestions:
+        by_supplier[suggestion.supplier_id].append(suggestion)
+    if not by_supplier:
+        return []
+    with transaction.atomic():
+        orders = Order.objects.bulk_create([
+            Order(
+                order_type=Order.OrderType.PURCHASE_ORDER,
+                order_status=Order.OrderStatus.DRAFT,
+                supplier_id=supplier_id,
+            )
+            for supplier_id in by_supplier
+        ])
+        # OrderItemQuerySet.bulk_create maintains the order totals.
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order, product_id=suggestion.product_id, quantity=suggestion.quantity,
+                unitcost=suggestion.unitcost, total_amount=suggestion.unitcost * suggestion.quantity,
+            )
+            for order, supplier_suggestions in zip(orders, by_supplier.values())
+            for suggestion in supplier_suggestions
+        ], batch_size=5000)
+    return orders
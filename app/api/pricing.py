@@ -0,0 +1,274 @@
+"""
+Server-side pricing of baskets.
+
+A line's unit price is the first quantity break of the customer's own price
+list, then of the default (customer-less) price list, that the line quantity
+reaches, falling back to ``Product.selling_price``. Tax follows the product's
+``tax_type`` (a ``TaxType`` id; inclusive rates are taken out of the price)
+or, without one, ``Product.tax`` as an exclusive percentage::
+
+    amount = unit price * quantity
+    net    = amount                          (exclusive)
+           = round(amount * 100 / (100 + rate))  (inclusive)
+    tax    = round(net * rate / 100)         (exclusive)
+           = amount - net                    (inclusive)
+
+Price lists and tax types are precomputed into a ``PriceBook`` of plain
+lookup tables (per product: sorted quantity breaks and their prices) which is
+cached per price list and invalidated as a whole when any list, item or tax
+type changes; each process also keeps the tables of the current version in
+memory. The version lives in the database (``get_db_version``), so a change
+reaches every process on its next quote even when the cache is per process.
+Pricing a basket is then one query for the basket's products and a single
+pass over the lines with a binary search per quantity break.
+"""
+from bisect import bisect_right
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .caching import bump_db_version, get_db_version
+from .models import PriceList, PriceListItem, Product, TaxType
+
+NAMESPACE = "pricing"
+
+# Product ids per IN (...) query.
+PRODUCT_BATCH_SIZE = 5000
+
+BULK_BATCH_SIZE = 500
+
+# (version, {price list id: table}): tables already loaded by this process,
+# kept until the version changes so large lists are not unpickled per quote.
+_local_tables = (None, {})
+
+
+def parse_integer(line, name, minimum, errors):
+    """Return ``line[name]`` as an int of at least ``minimum``, or record the error in ``errors``."""
+    value = line.get(name)
+    if isinstance(value, bool) or not str(value).lstrip("-").isdigit():
+        errors[name] = ["A valid integer is required."]
+        return None
+    if int(value) < minimum:
+        errors[name] = [f"Ensure this value is greater than or equal to {minimum}."]
+        return None
+    return int(value)
+
+
+def parse_product(line, errors):
+    """Return ``line["product"]`` as a product pk, or record the error in ``errors``."""
+    try:
+        product_id = Product._meta.pk.to_python(line.get("product"))
+    except DjangoValidationError:
+        product_id = None
+    if product_id is None:
+        errors["product"] = ["A valid product id is required."]
+    return product_id
+
+
+def parse_basket(lines):
+    """
+    Validate ``[{"product", "quantity"}]`` and return ``[(product_id, quantity)]``.
+    Raises ValidationError with per-line errors.
+    """
+    if not isinstance(lines, list):
+        raise ValidationError({"items": ["Expected a list of items."]})
+    parsed, errors = [], []
+    for line in lines:
+        line_errors = {}
+        if not isinstance(line, dict):
+            line_errors["non_field_errors"] = ["Expected an object."]
+        else:
+            parsed.append((parse_product(line, line_errors), parse_integer(line, "quantity", 1, line_errors)))
+        errors.append(line_errors)
+    if any(errors):
+        raise ValidationError({"items": errors})
+    return parsed
+
+
+def cache_key(version, name):
+    return f"{NAMESPACE}:{version}:{name}"
+
+
+def build_price_table(price_list_id):
+    """Return ``{product_id: (min quantities, unit prices)}`` of a price list, breaks ascending."""
+    table = {}
+    for product_id, min_quantity, unit_price in PriceListItem.objects.filter(
+        price_list_id=price_list_id
+    ).order_by("product_id", "min_quantity").values_list("product_id", "min_quantity", "unit_price"):
+        quantities, prices = table.setdefault(product_id, ([], []))
+        quantities.append(min_quantity)
+        prices.append(unit_price)
+    return {product_id: (tuple(quantities), tuple(prices)) for product_id, (quantities, prices) in table.items()}
+
+
+def customer_price_lists(customer_id):
+    """Return the ids of the active price lists applying to ``customer_id``, most specific first."""
+    lists = PriceList.objects.filter(active=True, customer__isnull=True)
+    if customer_id is not None:
+        lists = lists | PriceList.objects.filter(active=True, customer_id=customer_id)
+    chosen = {}
+    # The newest active list of each scope wins.
+    for pk, owner in lists.order_by("-pk").values_list("pk", "customer_id"):
+        chosen.setdefault(owner, pk)
+    return [chosen[owner] for owner in (customer_id, None) if owner in chosen]
+
+
+@dataclass
+class PriceBook:
+    # [(price list id, {product_id: (min quantities, unit prices)})], most specific first
+    lists: list
+    # {tax type id: (rate, inclusive)}
+    taxes: dict
+
+    def unit_price(self, product_id, quantity, base_price):
+        """Return ``(unit price, price list id or None)`` for ``quantity`` units of a product."""
+        for price_list_id, table in self.lists:
+            breaks = table.get(product_id)
+            if breaks is None:
+                continue
+            index = bisect_right(breaks[0], quantity) - 1
+            if index >= 0:
+                return breaks[1][index], price_list_id
+        return base_price, None
+
+    def tax_rule(self, tax, tax_type):
+        """Return ``(rate, inclusive)`` for a product's ``tax`` and ``tax_type``."""
+        return self.taxes.get(tax_type) or (tax or 0, False)
+
+
+def get_price_book(customer_id=None):
+    """Return the ``PriceBook`` of ``customer_id`` (None: the default prices) from the cache."""
+    version = get_db_version(NAMESPACE)
+    timeout = settings.PRICE_BOOK_CACHE_TIMEOUT
+    lists_key, taxes_key = cache_key(version, f"customer:{customer_id}"), cache_key(version, "taxes")
+    cached = cache.get_many([lists_key, taxes_key])
+    if lists_key not in cached:
+        cached[lists_key] = customer_price_lists(customer_id)
+        cache.set(lists_key, cached[lists_key], timeout)
+    if taxes_key not in cached:
+        cached[taxes_key] = {pk: (rate, inclusive) for pk, rate, inclusive in TaxType.objects.values_list(
+            "pk", "rate", "inclusive"
+        )}
+        cache.set(taxes_key, cached[taxes_key], timeout)
+
+    global _local_tables
+    if _local_tables[0] != version:
+        _local_tables = (version, {})
+    tables = _local_tables[1]
+    missing = {cache_key(version, f"list:{pk}"): pk for pk in cached[lists_key] if pk not in tables}
+    if missing:
+        found = cache.get_many(list(missing))
+        for key, pk in missing.items():
+            if key not in found:
+                found[key] = build_price_table(pk)
+                cache.set(key, found[key], timeout)
+            tables[pk] = found[key]
+    return PriceBook([(pk, tables[pk]) for pk in cached[lists_key]], cached[taxes_key])
+
+
+def product_prices(product_ids):
+    """Return ``{product_id: (selling_price, tax, tax_type)}``."""
+    product_ids = list(product_ids)
+    prices = {}
+    for offset in range(0, len(product_ids), PRODUCT_BATCH_SIZE):
+        for pk, *row in Product.objects.filter(pk__in=product_ids[offset:offset + PRODUCT_BATCH_SIZE]).values_list(
+            "pk", "selling_price", "tax", "tax_type"
+        ):
+            prices[pk] = row
+    return prices
+
+
+def price_basket(lines, customer_id=None):
+    """
+    Price ``[(product_id, quantity)]`` for ``customer_id`` and return
+    ``(rows, totals)``. Raises ValidationError naming the lines whose product
+    does not exist.
+    """
+    book = get_price_book(customer_id)
+    products = product_prices({product_id for product_id, _ in lines})
+    errors = [
+        {} if product_id in products else {"product": [f"Invalid pk \"{product_id}\" - object does not exist."]}
+        for product_id, _ in lines
+    ]
+    if any(errors):
+        raise ValidationError({"items": errors})
+
+    rows = []
+    total_items = total_net = total_tax = 0
+    for product_id, quantity in lines:
+        selling_price, tax, tax_type = products[product_id]
+        unit_price, price_list_id = book.unit_price(product_id, quantity, selling_price)
+        rate, inclusive = book.tax_rule(tax, tax_type)
+        amount = unit_price * quantity
+        if inclusive:
+            net = round(amount * 100 / (100 + rate))
+            line_tax = amount - net
+        else:
+            net = amount
+            line_tax = round(amount * rate / 100)
+        rows.append({
+            "product": product_id,
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "price_list": price_list_id,
+            "tax_rate": rate,
+            "net": net,
+            "tax": line_tax,
+            "total": net + line_tax,
+        })
+        total_items += quantity
+        total_net += net
+        total_tax += line_tax
+    totals = {"total_items": total_items, "net": total_net, "tax": total_tax, "total": total_net + total_tax}
+    return rows, totals
+
+
+def invalidate_price_books():
+    """Drop every cached price book once the transaction commits."""
+    bump_db_version(NAMESPACE)
+
+
+def set_price_list_items(price_list, lines):
+    """
+    Replace the items of ``price_list`` with ``[{"product", "unit_price",
+    "min_quantity"?}]`` (min_quantity defaults to 1). Raises ValidationError
+    with per-line errors.
+    """
+    if not isinstance(lines, list):
+        raise ValidationError({"items": ["Expected a list of items."]})
+    parsed, errors, seen = [], [], set()
+    for line in lines:
+        line_errors = {}
+        if not isinstance(line, dict):
+            errors.append({"non_field_errors": ["Expected an object."]})
+            continue
+        product_id = parse_product(line, line_errors)
+        min_quantity = parse_integer(line, "min_quantity", 1, line_errors) if "min_quantity" in line else 1
+        unit_price = parse_integer(line, "unit_price", 0, line_errors)
+        if product_id is not None and (product_id, min_quantity) in seen:
+            line_errors["min_quantity"] = ["Duplicate quantity break for this product."]
+        seen.add((product_id, min_quantity))
+        errors.append(line_errors)
+        parsed.append((product_id, min_quantity, unit_price))
+    if not any(errors):
+        existing = set(product_prices({product_id for product_id, _, _ in parsed}))
+        errors = [
+            {} if product_id in existing else {"product": [f"Invalid pk \"{product_id}\" - object does not exist."]}
+            for product_id, _, _ in parsed
+        ]
+    if any(errors):
+        raise ValidationError({"items": errors})
+
+    with transaction.atomic():
+        price_list = PriceList.objects.select_for_update().get(pk=price_list.pk)
+        price_list.items.all().delete()
+        PriceListItem.objects.bulk_create([
+            PriceListItem(price_list=price_list, product_id=product_id, min_quantity=min_quantity, unit_price=unit_price)
+            for product_id, min_quantity, unit_price in parsed
+        ], batch_size=BULK_BATCH_SIZE)
+        invalidate_price_books()
+    return price_list
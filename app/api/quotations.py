@@ -0,0 +1,146 @@
+"""
+Quotation line items and conversion to sales orders.
+
+``set_quotation_items`` replaces all lines of a quotation from one payload:
+products are looked up with one query, the lines are written with one
+``bulk_create`` and the quotation totals are recalculated once.
+``convert_quotation`` turns an approved quotation into a pending sales order
+in one transaction: it reserves the stock of every line with one ``UPDATE``
+(``reserve_product_stock``), creates the order and all of its items with one
+``bulk_create`` at the quoted unit prices, carries the quoted discount, tax
+and shipping into the order's terms so its totals match the quotation, and
+links the quotation to the order. Either way the cost is a fixed number of
+queries, not one per line.
+"""
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import Order, OrderItem, Product, Quotation, QuotationItem
+from .pricing import get_price_book, parse_integer
+from .stock import reserve_product_stock
+from .totals import expected_totals
+
+# Rows per INSERT, keeps large baskets under SQLite's parameter limit.
+BULK_BATCH_SIZE = 500
+
+
+def parse_lines(lines, customer_id=None):
+    """
+    Validate ``[{"product", "quantity", "unitcost"?}]`` and return
+    ``[(product_id, quantity, unitcost)]``. A missing unitcost defaults to
+    the customer's price (see api/pricing.py). Raises ValidationError with
+    per-line errors.
+    """
+    if not isinstance(lines, list):
+        raise ValidationError({"items": ["Expected a list of items."]})
+    pk_to_python = Product._meta.pk.to_python
+    parsed, errors, seen = [], [], set()
+    for line in lines:
+        line_errors = {}
+        if not isinstance(line, dict):
+            errors.append({"non_field_errors": ["Expected an object."]})
+            parsed.append(None)
+            continue
+        try:
+            product_id = pk_to_python(line.get("product"))
+        except DjangoValidationError:
+            product_id = None
+        if product_id is None:
+            line_errors["product"] = ["A valid product id is required."]
+        elif product_id in seen:
+            line_errors["product"] = ["Duplicate product, merge the lines."]
+        seen.add(product_id)
+        quantity = parse_integer(line, "quantity", 1, line_errors)
+        unitcost = parse_integer(line, "unitcost", 0, line_errors) if line.get("unitcost") is not None else None
+        errors.append(line_errors)
+        parsed.append((product_id, quantity, unitcost))
+
+    prices = dict(
+        Product.objects.filter(pk__in={line[0] for line in parsed if line and line[0]})
+        .values_list("pk", "selling_price")
+    )
+    for index, line in enumerate(parsed):
+        if line and line[0] is not None and line[0] not in prices and "product" not in errors[index]:
+            errors[index]["product"] = [f"Invalid pk \"{line[0]}\" - object does not exist."]
+    if any(errors):
+        raise ValidationError({"items": errors})
+    book = get_price_book(customer_id)
+    return [
+        (
+            product_id, quantity,
+            book.unit_price(product_id, quantity, prices[product_id])[0] if unitcost is None else unitcost
+        )
+        for product_id, quantity, unitcost in parsed
+    ]
+
+
+def set_quotation_items(quotation, lines):
+    """Replace the items of ``quotation`` with ``lines`` and recalculate its totals."""
+    lines = parse_lines(lines, quotation.customer_id)
+    with transaction.atomic():
+        quotation = Quotation.objects.select_for_update().get(pk=quotation.pk)
+        if quotation.order_id is not None:
+            raise ValueError("Converted quotations cannot be changed")
+        quotation.items.all().delete()
+        items = QuotationItem.objects.bulk_create([
+            QuotationItem(
+                quotation=quotation, product_id=product_id, quantity=quantity,
+                unitcost=unitcost, total_amount=unitcost * quantity,
+            )
+            for product_id, quantity, unitcost in lines
+        ], batch_size=BULK_BATCH_SIZE)
+        quotation.recalculate(sum(item.total_amount for item in items))
+        quotation.save(update_fields=[
+            "sub_total", "discount_amount", "tax_amount", "total_amount", "updated_at"
+        ])
+    return quotation
+
+
+def convert_quotation(quotation_id):
+    """
+    Create a pending sales order from an approved quotation and return it.
+    The order's ``due`` is the quoted total (after discount, tax and
+    shipping). Raises ValueError, writing nothing, when the quotation is not
+    approved, has no items or the stock does not cover them.
+    """
+    with transaction.atomic():
+        quotation = Quotation.objects.select_for_update().get(pk=quotation_id)
+        if quotation.order_id is not None:
+            raise ValueError(f"Quotation already converted to order {quotation.order_id}")
+        if quotation.status != Quotation.QuotationStatus.APPROVED:
+            raise ValueError("Only approved quotations can be converted")
+        items = list(quotation.items.order_by("pk").values_list("product_id", "quantity", "unitcost", "total_amount"))
+        if not items:
+            raise ValueError("Quotation has no items")
+
+        reserve_product_stock({product_id: quantity for product_id, quantity, _, _ in items})
+        # The quoted tax becomes the order's VAT rate on the discounted items.
+        taxable = quotation.sub_total - quotation.discount_amount
+        terms = {
+            "discount_amount": quotation.discount_amount,
+            "shipping_amount": quotation.shipping_amount,
+            "vat_rate": quotation.tax_amount / taxable if taxable else 0,
+        }
+        order = Order.objects.create(
+            order_type=Order.OrderType.SALE_ORDER,
+            order_status=Order.OrderStatus.PENDING,
+            customer_id=quotation.customer_id,
+            due=quotation.total_amount,
+            **terms,
+            # The totals without items, the items add to them.
+            **expected_totals(0, 0, **terms),
+        )
+        # OrderItemQuerySet.bulk_create maintains the order totals.
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order, product_id=product_id, quantity=quantity,
+                unitcost=unitcost, total_amount=total_amount,
+            )
+            for product_id, quantity, unitcost, total_amount in items
+        ], batch_size=BULK_BATCH_SIZE)
+        quotation.order = order
+        quotation.status = Quotation.QuotationStatus.CONVERTED
+        quotation.save(update_fields=["order", "status", "updated_at"])
+    order.refresh_from_db(fields=Order.TOTAL_FIELDS)
+    return order
@@ -0,0 +1,80 @@
+"""
+Faster JSON and MessagePack renderers/parsers, selected by content negotiation.
+
+``FastJSONRenderer`` keeps DRF's stdlib JSON output byte for byte unless the
+client asks for the orjson encoder with ``Accept: application/json;
+encoder=orjson``. MessagePack is served for ``Accept: application/msgpack``
+(or ``?format=msgpack``). Values the native encoders do not know (Decimal,
+lazy strings, querysets, ...) go through DRF's JSON encoder ``default`` so
+every format carries the same values as the JSON output.
+"""
+import msgpack
+import orjson
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.mediatypes import _MediaType
+
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME
+
+_encoder = JSONEncoder()
+
+
+def encode_default(obj):
+    """Fallback for types the orjson/msgpack encoders do not handle natively."""
+    return _encoder.default(obj)
+
+
+def wants_orjson(media_type):
+    return bool(media_type) and _MediaType(media_type).params.get("encoder") == "orjson"
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    DRF's JSONRenderer, switching to orjson when the accepted media type
+    carries ``encoder=orjson``. Datetimes still go through DRF's encoder so
+    both encoders format them identically.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or not wants_orjson(accepted_media_type):
+            return super().render(data, accepted_media_type, renderer_context)
+        options = ORJSON_OPTIONS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=encode_default, option=options)
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=encode_default, use_bin_type=True, datetime=False)
+
+
+class FastJSONParser(parsers.JSONParser):
+    """Parse UTF-8 JSON bodies with orjson, other charsets with the stdlib."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", "utf-8")
+        if encoding.lower().replace("-", "") != "utf8":
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
+
+
+class MessagePackParser(parsers.BaseParser):
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as exc:
+            raise ParseError("MessagePack parse error - %s" % str(exc))
@@ -0,0 +1,141 @@
+"""
+Accounts-receivable ageing.
+
+Outstanding balances (``Order.due``) of open sales orders are bucketed per
+customer by how many days they are past ``order_due_date``: current (not yet
+due), 1-30, 31-60, 61-90 and over 90 days with the default buckets. The
+report is a single grouped aggregate with one conditional ``SUM`` per bucket,
+answered from the partial covering ``api_order_outstanding_idx`` index
+alone, so settled orders, however many, are never visited.
+
+Buckets are computed per calendar day and kept as a cached snapshot that the
+dashboard reads without touching the orders. Order changes patch the
+snapshot for the customers involved (one grouped query filtered to them);
+the snapshot is rebuilt on the first read of a new day and at the latest
+``SNAPSHOT_TIMEOUT`` seconds after it was built, which also bounds the
+effect of two writers patching it at the same time.
+"""
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Customer, Order
+
+DEFAULTS = {
+    # Upper bounds (days past due) of the overdue buckets; one more bucket
+    # holds everything older.
+    "BUCKETS": [30, 60, 90],
+    "SNAPSHOT_TIMEOUT": 300,
+}
+
+SNAPSHOT_KEY = "reports:receivables-ageing"
+
+NAME_BATCH_SIZE = 5000
+
+
+def get_setting(name):
+    return getattr(settings, "RECEIVABLES_AGEING", {}).get(name, DEFAULTS[name])
+
+
+def bucket_labels(bounds=None):
+    bounds = bounds or get_setting("BUCKETS")
+    lower = [1] + [bound + 1 for bound in bounds[:-1]]
+    return ["current"] + [f"{start}-{end}" for start, end in zip(lower, bounds)] + [f"{bounds[-1]}+"]
+
+
+def outstanding_orders():
+    # Matches the condition of api_order_outstanding_idx.
+    return Order.objects.filter(order_type=Order.OrderType.SALE_ORDER, due__gt=0).exclude(
+        order_status=Order.OrderStatus.CANCELLED
+    )
+
+
+def ageing_rows(as_of, customers=None):
+    """
+    Return ``{customer_id: row}`` of balances aged at the start of ``as_of``
+    (a date) for every customer with an outstanding balance, or only
+    ``customers``. Rows hold the customer name, one entry per bucket and
+    the total.
+    """
+    bounds = get_setting("BUCKETS")
+    labels = bucket_labels(bounds)
+    start = timezone.make_aware(datetime.combine(as_of, datetime.min.time()))
+    # Bucket i holds orders due in [start - edges[i + 1], start - edges[i]).
+    edges = [0] + list(bounds)
+
+    def bucket_sum(condition):
+        return Coalesce(Sum(Case(When(condition, then=F("due")), default=Value(0), output_field=IntegerField())), 0)
+
+    sums = {labels[0]: bucket_sum(Q(order_due_date__gte=start))}
+    for index, label in enumerate(labels[1:-1]):
+        sums[label] = bucket_sum(Q(
+            order_due_date__lt=start - timedelta(days=edges[index]),
+            order_due_date__gte=start - timedelta(days=edges[index + 1]),
+        ))
+    sums[labels[-1]] = bucket_sum(Q(order_due_date__lt=start - timedelta(days=edges[-1])))
+
+    orders = outstanding_orders().filter(customer__isnull=False)
+    if customers is not None:
+        orders = orders.filter(customer_id__in=customers)
+    rows = {
+        row["customer_id"]: {
+            "customer": row["customer_id"],
+            "name": None,
+            **{label: row[label] for label in labels},
+            "total": row["total"],
+        }
+        for row in orders.order_by().values("customer_id").annotate(total=Sum("due"), **sums)
+    }
+    # Names are joined in separately so the aggregate stays an index-only scan.
+    customer_ids = list(rows)
+    for offset in range(0, len(customer_ids), NAME_BATCH_SIZE):
+        for customer_id, name in Customer.objects.filter(
+            pk__in=customer_ids[offset:offset + NAME_BATCH_SIZE]
+        ).values_list("pk", "name"):
+            rows[customer_id]["name"] = name
+    return rows
+
+
+def snapshot_timeout(built_at):
+    return max(1, int(built_at + get_setting("SNAPSHOT_TIMEOUT") - time.time()))
+
+
+def get_snapshot(refresh=False):
+    """Return the cached snapshot for today, building it when missing or stale."""
+    today = timezone.localdate()
+    snapshot = None if refresh else cache.get(SNAPSHOT_KEY)
+    if snapshot is None or snapshot["as_of"] != today.isoformat():
+        built_at = time.time()
+        snapshot = {"as_of": today.isoformat(), "built_at": built_at, "rows": ageing_rows(today)}
+        cache.set(SNAPSHOT_KEY, snapshot, snapshot_timeout(built_at))
+    return snapshot
+
+
+def refresh_customers(customer_ids):
+    """Recompute the snapshot rows of ``customer_ids`` if a current snapshot exists."""
+    snapshot = cache.get(SNAPSHOT_KEY)
+    today = timezone.localdate()
+    if snapshot is None or snapshot["as_of"] != today.isoformat():
+        # Rebuilt in full by the next read.
+        return
+    rows = ageing_rows(today, customers=customer_ids)
+    for customer_id in customer_ids:
+        snapshot["rows"].pop(customer_id, None)
+    snapshot["rows"].update(rows)
+    cache.set(SNAPSHOT_KEY, snapshot, snapshot_timeout(snapshot["built_at"]))
+
+
+def ageing_report(customer=None, refresh=False):
+    """Return ``(as_of, rows, totals)`` from the snapshot, rows sorted by total balance."""
+    snapshot = get_snapshot(refresh)
+    rows = snapshot["rows"]
+    if customer is not None:
+        rows = {customer: rows[customer]} if customer in rows else {}
+    rows = sorted(rows.values(), key=lambda row: (-row["total"], row["customer"]))
+    totals = {label: sum(row[label] for row in rows) for label in [*bucket_labels(), "total"]}
+    return snapshot["as_of"], rows, totals
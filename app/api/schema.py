@@ -0,0 +1,249 @@
+"""
+OpenAPI schema for the documentation view.
+
+drf_yasg is only imported from here, and this module is only imported when
+the documentation URL is hit or the schema is generated, so API workers never
+pay for it. The generated schema is kept in-process per base URL; when a
+schema file precomputed at deploy time (``manage.py generate_schema``) carries
+a checksum matching the current source, it is served as is.
+"""
+import hashlib
+import json
+import threading
+from functools import lru_cache
+from importlib import import_module
+from pathlib import Path
+
+import drf_yasg
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg.views import get_schema_view
+from rest_framework.response import Response
+
+from . import views
+
+API_INFO = openapi.Info(
+    title="Miinventory API",
+    default_version="v1",
+    description="Miinventory API built in Django REST API",
+)
+
+# (view name in api.views, swagger_auto_schema arguments)
+SWAGGER_OVERRIDES = [
+    (
+        "get_products",
+        dict(
+            method="get",
+            operation_summary="Lists all products",
+            operation_description="API endpoint that retrieves all products and returns them in JSON "
+            "format.",
+            responses={
+                200: "All products in JSON format",
+                400: "Bad request: Check error message for details",
+                500: "Internal server error: Unexpected error",
+            },
+        ),
+    ),
+    (
+        "get_users",
+        dict(
+            method="get",
+            operation_summary="Lists all users or a single user by email",
+            operation_description="API endpoint that retrieves all users or a single user by email and returns them in JSON "
+            "format.",
+            manual_parameters=[
+                openapi.Parameter(
+                    "email",
+                    openapi.IN_QUERY,
+                    description="User is searched by this email and returned if found. Optional, if not "
+                    "present, all users are returned.",
+                    type=openapi.TYPE_STRING,
+                )
+            ],
+            responses={
+                200: "One or all users in JSON format",
+                400: "Bad request: Check error message for details",
+                404: "If user was requested by email but not found",
+                500: "Internal server error: Unexpected error",
+            },
+        ),
+    ),
+    (
+        "add_user",
+        dict(
+            method="post",
+            operation_summary="Creates new user",
+            operation_description="API endpoint that creates a new user and returns the created user in JSON format.",
+            request_body=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "name": openapi.Schema(type=openapi.TYPE_STRING, description="Name of the user"),
+                    "email": openapi.Schema(type=openapi.TYPE_STRING, description="Email of the user"),
+                    "username": openapi.Schema(type=openapi.TYPE_STRING, description="Username of the user"),
+                    "age": openapi.Schema(type=openapi.TYPE_INTEGER, description="Age of the user"),
+                },
+                required=["name", "email", "age"],
+            ),
+            responses={
+                201: "Return the created user in JSON format",
+                400: "Bad request: Check error message for details",
+                500: "Internal server error: Unexpected error",
+            },
+        ),
+    ),
+    (
+        "update_user",
+        dict(
+            method="put",
+            operation_summary="Updates existing user",
+            operation_description="API endpoint that updates an existing users name and age by provided email and returns "
+            "updated user in JSON format.",
+            request_body=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "name": openapi.Schema(type=openapi.TYPE_STRING, description="Update the name of the user"),
+                    "age": openapi.Schema(type=openapi.TYPE_INTEGER, description="Update the age of the user"),
+                },
+                required=["name", "age"],
+            ),
+            manual_parameters=[
+                openapi.Parameter(
+                    "email", openapi.IN_QUERY, description="Email of the user to update", type=openapi.TYPE_STRING
+                )
+            ],
+            responses={
+                200: "Return the created user in JSON format",
+                400: "Bad request: Check error message for details",
+                404: "No user found with the provided email address",
+                500: "Internal server error: Unexpected error",
+            },
+        ),
+    ),
+    (
+        "delete_user",
+        dict(
+            method="delete",
+            operation_summary="Deletes existing user",
+            operation_description="API endpoint that deletes an existing user record by email",
+            manual_parameters=[
+                openapi.Parameter(
+                    "email", openapi.IN_QUERY, description="Email of the user to be deleted", type=openapi.TYPE_STRING
+                )
+            ],
+            responses={
+                204: "Success: User deleted",
+                400: "Bad request: Check error message for details",
+                404: "No user found with the provided email address",
+                500: "Internal server error: Unexpected error",
+            },
+        ),
+    ),
+]
+
+_lock = threading.Lock()
+_schemas = {}
+
+
+@lru_cache(maxsize=None)
+def apply_overrides():
+    for name, overrides in SWAGGER_OVERRIDES:
+        swagger_auto_schema(**overrides)(getattr(views, name))
+
+
+@lru_cache(maxsize=None)
+def source_checksum():
+    """
+    Checksum of everything the schema is generated from: the api package, the
+    root URLconf and the drf_yasg version.
+    """
+    digest = hashlib.sha256(drf_yasg.__version__.encode())
+    sources = sorted(path for path in Path(__file__).parent.glob("*.py") if path.name != "tests.py")
+    sources.append(Path(import_module(settings.ROOT_URLCONF).__file__))
+    for source in sources:
+        digest.update(source.name.encode())
+        digest.update(source.read_bytes())
+    return digest.hexdigest()
+
+
+def generate_schema(request=None, public=True):
+    """Generate the schema; without a request the spec carries no host."""
+    apply_overrides()
+    generator = OpenAPISchemaGenerator(API_INFO)
+    return generator.get_schema(request, public)
+
+
+def encode_schema(schema):
+    return OpenAPICodecJson(validators=[]).encode(schema)
+
+
+def write_schema_file(path):
+    """Precompute the schema into ``path`` together with the source checksum."""
+    document = {"checksum": source_checksum(), "schema": json.loads(encode_schema(generate_schema()))}
+    Path(path).write_text(json.dumps(document, ensure_ascii=False))
+
+
+def load_schema_file(path):
+    """Return the encoded schema stored in ``path`` if it matches the current source."""
+    try:
+        document = json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return None
+    if document.get("checksum") != source_checksum():
+        return None
+    return json.dumps(document["schema"], ensure_ascii=False).encode()
+
+
+def get_cached_schema(request, public=True):
+    """
+    Return ``(schema, body, etag)`` for the request's base URL, generating it
+    at most once per process.
+    """
+    key = request.build_absolute_uri("/")
+    cached = _schemas.get(key)
+    if cached is None:
+        with _lock:
+            cached = _schemas.get(key)
+            if cached is None:
+                schema = generate_schema(request, public)
+                body = encode_schema(schema)
+                cached = _schemas[key] = (schema, body, _etag(body))
+    return cached
+
+
+@lru_cache(maxsize=None)
+def get_precomputed_schema():
+    path = getattr(settings, "SWAGGER_SCHEMA_FILE", None)
+    body = load_schema_file(path) if path else None
+    return (body, _etag(body)) if body is not None else None
+
+
+def _etag(body):
+    return f'"{hashlib.sha256(body).hexdigest()}"'
+
+
+class CachedSchemaView(get_schema_view(API_INFO, public=True)):
+    """
+    Schema view serving the precomputed or in-process cached schema. JSON
+    spec requests are answered with the encoded bytes directly and honour
+    If-None-Match.
+    """
+
+    def get(self, request, version="", format=None):
+        renderer = request.accepted_renderer
+        if renderer.format in ("openapi", ".json"):
+            body, etag = get_precomputed_schema() or get_cached_schema(request, self.public)[1:]
+            # Weak comparison: the compression middleware weakens the ETag.
+            if etag in (tag.removeprefix("W/") for tag in parse_etags(request.headers.get("If-None-Match", ""))):
+                return HttpResponseNotModified(headers={"ETag": etag})
+            return HttpResponse(body, content_type=renderer.media_type, headers={"ETag": etag})
+        return Response(get_cached_schema(request, self.public)[0])
+
+
+@lru_cache(maxsize=None)
+def swagger_ui_view():
+    return CachedSchemaView.with_ui("swagger", cache_timeout=0)
@@ -0,0 +1,159 @@
+"""
+Role-scoped querysets.
+
+ViewSets list, per ``User.role``, the lookups that restrict their rows to the
+user's memberships: a customer user's customers (``CustomerUser`` links) and
+a staff user's warehouses (``Warehouse.staff``)::
+
+    class SalesOrderViewSet(RoleScopedQuerysetMixin, ...):
+        role_scopes = {"customer": "customer_id"}
+
+Rows match when any of a role's lookups is in the membership ids, a role
+mapped to None sees no rows, and roles that are not listed (as well as
+admins and super admins) are not restricted. Memberships are resolved at
+most once per request, with one indexed query each, and applied as
+``lookup IN (ids)`` so scoping adds no query per row or per queryset.
+
+Writes are scoped as well by ``RoleScopedWritesMixin``: the row a user creates
+or updates must match one of the role's lookups (plain fields such as
+``customer_id``), and a role mapped to None cannot write. Views over every
+customer's data that have no per-row scope refuse customer users with the
+``NotCustomerUser`` permission.
+
+Scoped views require a request authenticated as an API ``User``
+(``IsApiUser``); anonymous requests are refused with 401 rather than left
+unscoped.
+"""
+from functools import cached_property
+
+from django.db.models import Q
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import BasePermission
+
+from .models import CustomerUser, User, Warehouse
+
+UNRESTRICTED_ROLES = ("admin", "super_admin")
+
+
+class Scope:
+    """Role and memberships of the user making a request."""
+
+    def __init__(self, user):
+        self.user = user
+        self.role = user.role if user is not None else None
+
+    @cached_property
+    def customer_ids(self):
+        return list(
+            CustomerUser.objects.filter(user_id=self.user.pk).order_by().values_list("customer_id", flat=True).distinct()
+        )
+
+    @cached_property
+    def warehouse_ids(self):
+        return list(Warehouse.staff.through.objects.filter(user_id=self.user.pk).values_list("warehouse_id", flat=True))
+
+    def memberships(self):
+        """Return the ids the user's role is scoped to."""
+        return self.customer_ids if self.role == "customer" else self.warehouse_ids
+
+
+def get_scope(request):
+    """Return the ``Scope`` of ``request``, resolved once per request."""
+    scope = getattr(request, "_role_scope", None)
+    if scope is None:
+        user = getattr(request, "user", None)
+        scope = Scope(user if isinstance(user, User) else None)
+        request._role_scope = scope
+    return scope
+
+
+def is_scoped(scope, role_scopes):
+    return scope.user is not None and scope.role not in UNRESTRICTED_ROLES and scope.role in role_scopes
+
+
+def scope_queryset(queryset, scope, role_scopes):
+    """Restrict ``queryset`` to the rows ``scope`` may see under ``role_scopes``."""
+    if not is_scoped(scope, role_scopes):
+        return queryset
+    lookups = role_scopes[scope.role]
+    if lookups is None:
+        return queryset.none()
+    if isinstance(lookups, str):
+        lookups = (lookups,)
+    ids = scope.memberships()
+    condition = Q()
+    for lookup in lookups:
+        condition |= Q(**{f"{lookup}__in": ids})
+    return queryset.filter(condition)
+
+
+class IsApiUser(BasePermission):
+    """Refuses requests not authenticated as an API ``User``, which could not be scoped."""
+
+    def has_permission(self, request, view):
+        return get_scope(request).user is not None
+
+
+class RoleScopedQuerysetMixin:
+    """Restricts ``get_queryset`` to the rows the requesting user's role may see."""
+    permission_classes = [IsApiUser]
+    # {role: lookup, tuple of lookups or None}, see the module docstring.
+    role_scopes = {}
+
+    def scope_queryset(self, queryset):
+        return scope_queryset(queryset, get_scope(self.request), self.role_scopes)
+
+    def get_queryset(self):
+        return self.scope_queryset(super().get_queryset())
+
+
+def check_write_scope(scope, role_scopes, values):
+    """
+    Raise PermissionDenied unless ``scope`` may write a row with ``values``
+    (``{lookup: value}`` for the lookups of ``role_scopes``).
+    """
+    if not is_scoped(scope, role_scopes):
+        return
+    lookups = role_scopes[scope.role]
+    if lookups is None:
+        raise PermissionDenied("Your role cannot change these records.")
+    if isinstance(lookups, str):
+        lookups = (lookups,)
+    ids = scope.memberships()
+    if not any(values.get(lookup) in ids for lookup in lookups):
+        raise PermissionDenied("The record must belong to one of your customers or warehouses.")
+
+
+class RoleScopedWritesMixin(RoleScopedQuerysetMixin):
+    """Also checks that created and updated rows stay within the requesting user's scope."""
+
+    def written_values(self, serializer):
+        """Return ``{lookup: value}`` of the row ``serializer`` is about to save."""
+        lookups = set()
+        for role_lookups in self.role_scopes.values():
+            lookups.update((role_lookups,) if isinstance(role_lookups, str) else role_lookups or ())
+        values = {}
+        for lookup in lookups:
+            name = lookup.removesuffix("_id")
+            if name in serializer.validated_data:
+                value = serializer.validated_data[name]
+                values[lookup] = getattr(value, "pk", value)
+            else:
+                values[lookup] = getattr(serializer.instance, lookup, None)
+        return values
+
+    def perform_create(self, serializer):
+        check_write_scope(get_scope(self.request), self.role_scopes, self.written_values(serializer))
+        super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        check_write_scope(get_scope(self.request), self.role_scopes, self.written_values(serializer))
+        super().perform_update(serializer)
+
+
+class NotCustomerUser(BasePermission):
+    """Refuses customer users, for views over every customer's data."""
+    message = "Not available to customer users."
+
+    def has_permission(self, request, view):
+        return get_scope(request).role != "customer"
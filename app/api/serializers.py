@@ -4,8 +4,9 @@ from .models import Product
 from .models import UserProfile
 from .models import Customer, CustomerUser
 from .models import Order
-from .models import Supplier, Quotation
-from .models import Shipment
+from .models import Supplier, Quotation, QuotationItem
+from .models import PriceList, PriceListItem, TaxType
+from .models import Shipment, ShipmentManifest
 from .models import Warehouse, WarehouseProduct
 from .models import Location
 
@@ -59,11 +60,24 @@ class CustomerSerialiser(serializers.ModelSerializer):
     sale_orders = serializers.PrimaryKeyRelatedField(
         many=True, queryset=Order.objects.all(), required=False
     )
+    # Unbounded, only rendered with ?include=sale_orders. Page through
+    # /api/customers/<id>/orders/ instead.
+    OPTIONAL_FIELDS = {'sale_orders'}
+
     class Meta:
         model = Customer
         fields = '__all__'
         read_only_fields = ["id", "created_at", "updated_at"]
 
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        included = set(request.query_params.get('include', '').split(',')) if request is not None else set()
+        for name in self.OPTIONAL_FIELDS - included:
+            # Still accepted on writes.
+            fields[name].write_only = True
+        return fields
+
     def get_users(self, obj:User):
         users = obj.customeruser_set.all()
         return CustomerUserSerialiser(users, many=True).data      
@@ -77,17 +91,32 @@ class OrderSerialiser(serializers.ModelSerializer):
         fields = [
             'id',
             'uuid',
+            'customer',
+            'order_date',
             'order_status',
             'sub_total',
+            'discount_amount',
+            'shipping_amount',
             'vat',
             'total_amount',
             'total_items',
             'invoice_no',
             'payment_type',
             'pay',
-            'order_due_date'
+            'order_due_date',
+            'supplier'
+        ]
+        read_only_fields = [
+            "id",
+            "sub_total",
+            "discount_amount",
+            "shipping_amount",
+            "vat",
+            "total_amount",
+            "total_items",
+            "created_at",
+            "updated_at"
         ]
-        read_only_fields = ["id", "created_at", "updated_at"]
 
 class SupplierSerializer(serializers.ModelSerializer):
     class Meta:
@@ -117,18 +146,54 @@ class QuotationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Quotation
         fields = [
+            'id',
             'customer',
             'date',
             'status',
             "reference",
             'note',
+            'tax_percentage',
+            'tax_amount',
+            'discount_percentage',
+            'discount_amount',
+            'shipping_amount',
+            'sub_total',
+            'total_amount',
+            'order',
         ]
         read_only_fields = [
             "id", 
+            "sub_total",
+            "total_amount",
+            "order",
             "created_at", 
             "updated_at"
         ]
 
+class QuotationItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = QuotationItem
+        fields = ['id', 'product', 'quantity', 'unitcost', 'total_amount']
+        read_only_fields = ["id", "total_amount"]
+
+class TaxTypeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TaxType
+        fields = ['id', 'name', 'rate', 'inclusive']
+        read_only_fields = ["id"]
+
+class PriceListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PriceList
+        fields = ['id', 'name', 'customer', 'active']
+        read_only_fields = ["id"]
+
+class PriceListItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PriceListItem
+        fields = ['id', 'product', 'min_quantity', 'unit_price']
+        read_only_fields = ["id"]
+
 class WarehouseSerializer(serializers.ModelSerializer):
     products = serializers.SerializerMethodField()
     class Meta:
@@ -136,15 +201,20 @@ class WarehouseSerializer(serializers.ModelSerializer):
         fields = [
             'name',
             'capacity',
+            'occupancy',
             'email',
            'products',
         ]
         read_only_fields = [
             "id",
+            "occupancy",
             "created_at", 
             "updated_at"
         ]
 
+    def get_products(self, obj:Warehouse):
+        return [placement.product_id for placement in obj.warehouse_products.all()]
+
 class WarehouseProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = WarehouseProduct
@@ -178,4 +248,32 @@ class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
-        #read_only_fields = ["id", "created_at", "updated_at"]
\ No newline at end of file
+        #read_only_fields = ["id", "created_at", "updated_at"]
+
+    def validate_parent(self, parent):
+        if parent is not None and self.instance is not None and parent.path.startswith(self.instance.path):
+            raise serializers.ValidationError("A category cannot be moved below itself.")
+        return parent
+
+
+class ShipmentManifestSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ShipmentManifest
+        fields = [
+            'id',
+            'shipment_type',
+            'warehouse',
+            'reference',
+            'shipped_from',
+            'shipped_to',
+            'order',
+            'total_lines',
+            'total_quantity',
+            'created_at',
+        ]
+        read_only_fields = [
+            "id",
+            "total_lines",
+            "total_quantity",
+            "created_at",
+        ]
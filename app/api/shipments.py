@@ -0,0 +1,78 @@
+"""
+Shipment manifests: many shipment lines recorded as one stock movement.
+
+``create_manifest`` validates every line before writing anything (one query
+for the products), then in one transaction moves the stock of all lines with
+``apply_warehouse_deltas`` (row locks, one ``UPDATE`` per table), creates the
+manifest and writes its lines with one ``bulk_create``. An outgoing line
+without enough stock, or an incoming manifest over the warehouse capacity,
+raises ValueError and nothing is recorded. Recording 2,000 lines costs a
+fixed number of queries instead of three per line through ``Shipment.save``.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .events import publish_stock_change
+from .models import Product, Shipment, ShipmentManifest
+from .pricing import parse_basket
+from .stock import apply_warehouse_deltas
+
+# Rows per INSERT, keeps large manifests under SQLite's parameter limit.
+BULK_BATCH_SIZE = 500
+
+
+def parse_manifest_lines(lines):
+    """
+    Validate ``[{"product", "quantity"}]`` and return ``[(product_id,
+    quantity)]``. Raises ValidationError with per-line errors, including
+    products that do not exist.
+    """
+    parsed = parse_basket(lines)
+    if not parsed:
+        raise ValidationError({"items": ["A manifest needs at least one item."]})
+    existing = set(Product.objects.filter(pk__in={product_id for product_id, _ in parsed}).values_list("pk", flat=True))
+    errors = [
+        {} if product_id in existing else {"product": [f"Invalid pk \"{product_id}\" - object does not exist."]}
+        for product_id, _ in parsed
+    ]
+    if any(errors):
+        raise ValidationError({"items": errors})
+    return parsed
+
+
+def create_manifest(lines, warehouse, shipment_type="incoming", **fields):
+    """
+    Record a manifest of ``lines`` (see ``parse_manifest_lines``) into or out
+    of ``warehouse`` and return it. ``fields`` are further ShipmentManifest
+    fields (reference, shipped_from, shipped_to, order). Raises
+    ValidationError for invalid lines and ValueError, writing nothing, when
+    the stock cannot move.
+    """
+    lines = parse_manifest_lines(lines)
+    sign = 1 if shipment_type == "incoming" else -1
+    deltas = defaultdict(int)
+    for product_id, quantity in lines:
+        deltas[(warehouse.pk, product_id)] += sign * quantity
+
+    with transaction.atomic():
+        stock = apply_warehouse_deltas(deltas)
+        manifest = ShipmentManifest.objects.create(
+            shipment_type=shipment_type,
+            warehouse=warehouse,
+            total_lines=len(lines),
+            total_quantity=sum(quantity for _, quantity in lines),
+            **fields,
+        )
+        Shipment.objects.bulk_create([
+            Shipment(
+                manifest=manifest, shipment_type=shipment_type, warehouse=warehouse,
+                product_id=product_id, quantity=quantity, order=manifest.order,
+                shipped_from=manifest.shipped_from, shipped_to=manifest.shipped_to,
+            )
+            for product_id, quantity in lines
+        ], batch_size=BULK_BATCH_SIZE)
+        for (warehouse_id, product_id), delta in deltas.items():
+            publish_stock_change(product_id, stock[(warehouse_id, product_id)], delta, warehouse_id)
+    return manifest
@@ -0,0 +1,183 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+
+from .archive import is_archiving
+from .authentication import user_tokens
+from .caching import bump_version, supplier_catalog
+from .changes import TRACKED_MODELS, record_changes
+from .models import (
+    ChangeLog, Order, OrderItem, PriceList, PriceListItem, Product, Supplier, TaxType, User, apply_category_deltas,
+    apply_customer_deltas, apply_order_deltas, counted_customer,
+)
+from .pricing import invalidate_price_books
+from .reports import refresh_customers
+from .sku_index import sku_index
+
+
+def log_upsert(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    record_changes(sender, [instance.pk], ChangeLog.Action.UPSERT)
+
+
+def log_delete(sender, instance, **kwargs):
+    record_changes(sender, [instance.pk], ChangeLog.Action.DELETE)
+
+
+for name, (model, _) in TRACKED_MODELS.items():
+    post_save.connect(log_upsert, sender=model, dispatch_uid=f"changes.upsert.{name}")
+    post_delete.connect(log_delete, sender=model, dispatch_uid=f"changes.delete.{name}")
+
+
+def update_order_totals_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old_order = instance.loaded_value('order_id')
+    deltas = {instance.order_id: (instance.quantity, instance.total_amount)}
+    if old_order is not None:
+        old = (-instance.loaded_value('quantity', 0), -instance.loaded_value('total_amount', 0))
+        if old_order == instance.order_id:
+            deltas[old_order] = (deltas[old_order][0] + old[0], deltas[old_order][1] + old[1])
+        else:
+            deltas[old_order] = old
+    apply_order_deltas(deltas)
+    instance.remember_loaded_values()
+
+
+def update_order_totals_on_delete(sender, instance, origin=None, **kwargs):
+    # Cascades from a deleted order need no totals; queryset deletes apply
+    # their deltas in bulk (OrderItemQuerySet.delete).
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model in (Order, OrderItem) and not isinstance(origin, OrderItem):
+        return
+    apply_order_deltas({instance.order_id: (-instance.quantity, -instance.total_amount)})
+
+
+post_save.connect(update_order_totals_on_save, sender=OrderItem, dispatch_uid="totals.order_item.save")
+post_delete.connect(update_order_totals_on_delete, sender=OrderItem, dispatch_uid="totals.order_item.delete")
+
+
+RECEIVABLE_FIELDS = ('customer_id', 'order_type', 'order_status', 'due', 'order_due_date')
+
+
+def refresh_receivables_on_save(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        changed = instance.due > 0
+    else:
+        changed = any(getattr(instance, name) != instance.loaded_value(name) for name in RECEIVABLE_FIELDS)
+    customers = {instance.customer_id, None if created else instance.loaded_value('customer_id')} - {None}
+    if changed and customers:
+        transaction.on_commit(lambda: refresh_customers(customers))
+
+
+def refresh_receivables_on_delete(sender, instance, **kwargs):
+    # Archiving moves closed orders; the snapshot expiry covers them.
+    if not is_archiving() and instance.customer_id is not None and instance.due > 0:
+        transaction.on_commit(lambda: refresh_customers({instance.customer_id}))
+
+
+def update_customer_summary_on_save(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    customer_id = counted_customer(instance.customer_id, instance.order_type, instance.order_status)
+    old_customer_id = None if created else counted_customer(
+        instance.loaded_value('customer_id'), instance.loaded_value('order_type'), instance.loaded_value('order_status')
+    )
+    old_due = instance.loaded_value('due', 0)
+    if customer_id == old_customer_id:
+        deltas = {customer_id: (0, 0, instance.due - old_due)}
+    else:
+        # Totals are not written by Order.save, the stored ones are current.
+        amount = instance.total_amount if created else (
+            Order.objects.filter(pk=instance.pk).values_list('total_amount', flat=True).first() or 0
+        )
+        deltas = {customer_id: (1, amount, instance.due), old_customer_id: (-1, -amount, -old_due)}
+    apply_customer_deltas(deltas)
+    instance.remember_loaded_values()
+
+
+def update_customer_summary_on_delete(sender, instance, **kwargs):
+    # Archived orders stay in the lifetime totals, every other delete removes the order.
+    if is_archiving():
+        return
+    customer_id = counted_customer(instance.customer_id, instance.order_type, instance.order_status)
+    apply_customer_deltas({customer_id: (-1, -instance.total_amount, -instance.due)})
+
+
+# Connected before the summary receiver, which resets the loaded values.
+post_save.connect(refresh_receivables_on_save, sender=Order, dispatch_uid="receivables.order.save")
+post_delete.connect(refresh_receivables_on_delete, sender=Order, dispatch_uid="receivables.order.delete")
+post_save.connect(update_customer_summary_on_save, sender=Order, dispatch_uid="summary.order.save")
+post_delete.connect(update_customer_summary_on_delete, sender=Order, dispatch_uid="summary.order.delete")
+
+
+def update_category_counts_on_save(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    old_category = None if created else instance.loaded_value('category_id')
+    if instance.category_id != old_category:
+        apply_category_deltas({instance.category_id: 1, old_category: -1})
+
+
+def update_category_counts_on_delete(sender, instance, **kwargs):
+    apply_category_deltas({instance.category_id: -1})
+
+
+# Connected before the catalog receiver, which resets the loaded values.
+post_save.connect(update_category_counts_on_save, sender=Product, dispatch_uid="categories.product.save")
+post_delete.connect(update_category_counts_on_delete, sender=Product, dispatch_uid="categories.product.delete")
+
+
+def invalidate_supplier_catalog_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    suppliers = {instance.supplier_id, instance.loaded_value('supplier_id', instance.supplier_id)}
+    bump_version(*(supplier_catalog(supplier_id) for supplier_id in suppliers))
+    instance.remember_loaded_values()
+
+
+def invalidate_supplier_catalog_on_delete(sender, instance, **kwargs):
+    supplier_id = instance.pk if sender is Supplier else instance.supplier_id
+    bump_version(supplier_catalog(supplier_id))
+
+
+post_save.connect(invalidate_supplier_catalog_on_save, sender=Product, dispatch_uid="catalog.product.save")
+post_delete.connect(invalidate_supplier_catalog_on_delete, sender=Product, dispatch_uid="catalog.product.delete")
+post_delete.connect(invalidate_supplier_catalog_on_delete, sender=Supplier, dispatch_uid="catalog.supplier.delete")
+
+
+def invalidate_price_books_on_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_price_books()
+
+
+for model in (PriceList, PriceListItem, TaxType):
+    post_save.connect(
+        invalidate_price_books_on_change, sender=model, dispatch_uid=f"pricing.{model.__name__}.save"
+    )
+    post_delete.connect(
+        invalidate_price_books_on_change, sender=model, dispatch_uid=f"pricing.{model.__name__}.delete"
+    )
+
+
+def invalidate_user_tokens(sender, instance, raw=False, **kwargs):
+    # Cached token users are reloaded, so role changes apply immediately.
+    if not raw:
+        bump_version(user_tokens(instance.pk))
+
+
+post_save.connect(invalidate_user_tokens, sender=User, dispatch_uid="tokens.user.save")
+post_delete.connect(invalidate_user_tokens, sender=User, dispatch_uid="tokens.user.delete")
+
+
+def expire_sku_index(sender, instance, raw=False, **kwargs):
+    # The change log entry commits with the product, so the refresh finds it.
+    if not raw:
+        transaction.on_commit(sku_index.expire)
+
+
+post_save.connect(expire_sku_index, sender=Product, dispatch_uid="sku_index.product.save")
+post_delete.connect(expire_sku_index, sender=Product, dispatch_uid="sku_index.product.delete")
@@ -0,0 +1,131 @@
+"""
+In-process SKU -> product index for scanner lookups (/api/products/by-sku/).
+
+Each process keeps every product, serialized with ``ProductSerializer``, in
+a dict keyed by SKU, so a scan is a dict lookup. The index is built once
+(``warm``, at startup from wsgi.py/asgi.py or on the first lookup) and then
+follows the change feed: ``refresh`` reloads only the products logged after
+its token, with indexed queries for the safe token and the log and one for
+the products. The
+token only advances to the feed's safe token (see api/changes.py), never
+past entries that may still commit out of order, so the entries of the last
+``CHANGE_FEED_COMMIT_LAG`` seconds are applied again on each refresh until
+they are known to be complete. Lookups refresh at most
+every ``REFRESH_INTERVAL`` seconds, and product saves and deletes in this
+process expire the interval once they commit, so local writes show up on
+the next scan and other processes' writes within the interval.
+"""
+import logging
+import threading
+from time import monotonic
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .changes import feed_name, safe_token
+from .fast_serializers import serialize_many
+from .models import ChangeLog, Product
+from .serializers import ProductSerializer
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "REFRESH_INTERVAL": 1.0,
+    "WARM_ON_STARTUP": True,
+}
+
+# Product ids per IN (...) query.
+PRODUCT_BATCH_SIZE = 5000
+
+# SKUs per batch lookup request.
+MAX_BATCH_SIZE = 5000
+
+
+def get_setting(name):
+    return getattr(settings, "SKU_INDEX", {}).get(name, DEFAULTS[name])
+
+
+def normalize_sku(sku):
+    return str(sku).strip()
+
+
+class SkuIndex:
+    """SKU -> serialized product of this process, see the module docstring."""
+
+    def __init__(self):
+        self.products = None
+        # product id -> SKU, to drop the old key when a SKU changes
+        self.skus = {}
+        self.token = 0
+        self.refreshed = 0.0
+        self.lock = threading.Lock()
+
+    def warm(self):
+        """(Re)build the index from the products table."""
+        with self.lock:
+            # Read before the products, changes in between are applied twice at worst.
+            token = safe_token()
+            products, skus = {}, {}
+            for data in serialize_many(ProductSerializer, Product.objects.order_by()):
+                products[normalize_sku(data["sku"])] = data
+                skus[str(data["id"])] = normalize_sku(data["sku"])
+            self.products, self.skus, self.token = products, skus, token
+            self.refreshed = monotonic()
+
+    def refresh(self):
+        """Apply the product changes logged since the last refresh."""
+        with self.lock:
+            self.refreshed = monotonic()
+            # Every entry up to the safe token has committed, later ones are read again next time.
+            token = max(self.token, safe_token())
+            object_ids = list(set(
+                ChangeLog.objects.filter(model=feed_name(Product), id__gt=self.token).values_list("object_id", flat=True)
+            ))
+            self.token = token
+            for offset in range(0, len(object_ids), PRODUCT_BATCH_SIZE):
+                batch = object_ids[offset:offset + PRODUCT_BATCH_SIZE]
+                for object_id in batch:
+                    self.products.pop(self.skus.pop(object_id, None), None)
+                for data in serialize_many(ProductSerializer, Product.objects.filter(pk__in=batch)):
+                    self.products[normalize_sku(data["sku"])] = data
+                    self.skus[str(data["id"])] = normalize_sku(data["sku"])
+
+    def expire(self):
+        """Make the next lookup refresh."""
+        self.refreshed = 0.0
+
+    def clear(self):
+        """Drop the index, the next lookup rebuilds it."""
+        with self.lock:
+            self.products, self.skus, self.token = None, {}, 0
+
+    def ensure_fresh(self):
+        if self.products is None:
+            self.warm()
+        elif monotonic() - self.refreshed >= get_setting("REFRESH_INTERVAL"):
+            self.refresh()
+
+    def get(self, sku):
+        """Return the serialized product with ``sku``, or None."""
+        self.ensure_fresh()
+        return self.products.get(normalize_sku(sku))
+
+    def get_many(self, skus):
+        """Return ``{sku: serialized product or None}`` for ``skus``."""
+        self.ensure_fresh()
+        products = self.products
+        return {sku: products.get(normalize_sku(sku)) for sku in skus}
+
+
+sku_index = SkuIndex()
+
+
+def warm_sku_index():
+    """Warm the index at startup when SKU_INDEX["WARM_ON_STARTUP"] is set."""
+    if not get_setting("WARM_ON_STARTUP"):
+        return
+    try:
+        sku_index.warm()
+    except DatabaseError:
+        # Not migrated yet; the first lookup builds the index.
+        logger.warning("SKU index not warmed", exc_info=True)
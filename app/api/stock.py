@@ -0,0 +1,161 @@
+"""
+Set-based warehouse stock movements.
+
+``apply_warehouse_deltas`` moves stock for any number of (warehouse, product)
+placements in one transaction: it locks the warehouses and placements
+involved, checks stock and capacity, creates missing placements in bulk and
+applies the changes with one ``UPDATE`` per table. ``reserve_product_stock``
+and ``receive_product_stock`` do the same for the catalog level
+``Product.stock``. ``Warehouse.occupancy`` (units held, the sum of its
+placement quantities) is maintained here, so utilization reads never
+aggregate placements.
+
+A capacity of 0 means unlimited.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .caching import bump_version, supplier_catalog
+from .changes import record_changes
+from .events import publish_stock_change
+from .models import Product, Warehouse, WarehouseProduct
+
+
+def _increment(model, column, deltas):
+    """``UPDATE model SET column = column + CASE pk ... END`` for {pk: delta}."""
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    model.objects.filter(pk__in=deltas).update(**{
+        column: F(column) + Case(
+            *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    })
+
+
+def apply_warehouse_deltas(deltas):
+    """
+    Apply ``{(warehouse_id, product_id): quantity_delta}`` atomically and
+    return ``{(warehouse_id, product_id): new_quantity}``.
+
+    Raises ValueError, leaving everything unchanged, when a placement would
+    go negative or a warehouse's net inbound movement exceeds its capacity.
+    """
+    warehouse_pk = Warehouse._meta.pk.to_python
+    product_pk = WarehouseProduct._meta.get_field("product").target_field.to_python
+    normalized = defaultdict(int)
+    for (warehouse_id, product_id), delta in deltas.items():
+        normalized[(warehouse_pk(warehouse_id), product_pk(product_id))] += delta
+    deltas = {key: delta for key, delta in normalized.items() if delta}
+    if not deltas:
+        return {}
+    warehouse_ids = sorted({warehouse_id for warehouse_id, _ in deltas})
+    product_ids = {product_id for _, product_id in deltas}
+
+    with transaction.atomic():
+        # Lock in primary key order so concurrent movements cannot deadlock.
+        warehouses = {
+            warehouse.pk: warehouse
+            for warehouse in Warehouse.objects.select_for_update()
+            .filter(pk__in=warehouse_ids).order_by("pk").only("pk", "name", "capacity", "occupancy")
+        }
+        missing = set(warehouse_ids) - set(warehouses)
+        if missing:
+            raise ValueError(f"Unknown warehouse(s): {', '.join(map(str, sorted(missing)))}")
+
+        placements = {}
+        for placement_id, warehouse_id, product_id, quantity in (
+            WarehouseProduct.objects.select_for_update()
+            .filter(warehouse_id__in=warehouse_ids, product_id__in=product_ids)
+            .order_by("pk").values_list("pk", "warehouse_id", "product_id", "quantity")
+        ):
+            # The oldest placement wins if a pair was ever duplicated.
+            placements.setdefault((warehouse_id, product_id), (placement_id, quantity))
+
+        net = defaultdict(int)
+        result = {}
+        for (warehouse_id, product_id), delta in deltas.items():
+            quantity = placements.get((warehouse_id, product_id), (None, 0))[1] + delta
+            if quantity < 0:
+                raise ValueError(
+                    f"Not enough stock available! {warehouses[warehouse_id]} holds "
+                    f"{quantity - delta} of product {product_id}, {-delta} requested"
+                )
+            net[warehouse_id] += delta
+            result[(warehouse_id, product_id)] = quantity
+
+        for warehouse_id, change in net.items():
+            warehouse = warehouses[warehouse_id]
+            if change > 0 and warehouse.capacity and warehouse.occupancy + change > warehouse.capacity:
+                raise ValueError(
+                    f"{warehouse} is over capacity: {warehouse.occupancy} of {warehouse.capacity} "
+                    f"units used, {change} incoming"
+                )
+
+        WarehouseProduct.objects.bulk_create([
+            WarehouseProduct(warehouse_id=warehouse_id, product_id=product_id, quantity=delta)
+            for (warehouse_id, product_id), delta in deltas.items()
+            if (warehouse_id, product_id) not in placements
+        ])
+        _increment(WarehouseProduct, "quantity", {
+            placements[key][0]: delta for key, delta in deltas.items() if key in placements
+        })
+        _increment(Warehouse, "occupancy", net)
+        record_changes(Warehouse, [warehouse_id for warehouse_id, change in net.items() if change])
+    return result
+
+
+def reserve_product_stock(quantities):
+    """
+    Take ``{product_id: quantity}`` off ``Product.stock`` atomically with one
+    ``UPDATE`` and return ``{product_id: new_stock}``.
+
+    Raises ValueError, leaving everything unchanged, when a product is
+    unknown or holds less than requested.
+    """
+    return _move_product_stock({product_id: -quantity for product_id, quantity in quantities.items()})
+
+
+def receive_product_stock(quantities):
+    """
+    Add ``{product_id: quantity}`` to ``Product.stock`` atomically with one
+    ``UPDATE`` and return ``{product_id: new_stock}``, e.g. for the items of
+    a received purchase order.
+
+    Raises ValueError, leaving everything unchanged, when a product is unknown.
+    """
+    return _move_product_stock(quantities)
+
+
+def _move_product_stock(deltas):
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    with transaction.atomic():
+        # Lock in primary key order so concurrent movements cannot deadlock.
+        products = {
+            product_id: (stock, supplier_id)
+            for product_id, stock, supplier_id in Product.objects.select_for_update()
+            .filter(pk__in=deltas).order_by("pk").values_list("pk", "stock", "supplier_id")
+        }
+        missing = set(deltas) - set(products)
+        if missing:
+            raise ValueError(f"Unknown product(s): {', '.join(sorted(map(str, missing)))}")
+        short = [
+            f"{product_id} holds {products[product_id][0]}, {-delta} requested"
+            for product_id, delta in deltas.items() if products[product_id][0] + delta < 0
+        ]
+        if short:
+            raise ValueError(f"Not enough stock available! {'; '.join(short)}")
+
+        _increment(Product, "stock", deltas)
+        # QuerySet.update bypasses the signal receivers.
+        record_changes(Product, list(deltas))
+        bump_version(*{supplier_catalog(supplier_id) for _, supplier_id in products.values()})
+        result = {}
+        for product_id, delta in deltas.items():
+            result[product_id] = products[product_id][0] + delta
+            publish_stock_change(product_id, result[product_id], delta)
+    return result
@@ -1,7 +1,57 @@
+import io
+import json
+import subprocess
+import sys
+import time
+import zlib
+from datetime import timedelta
+import tempfile
+from pathlib import Path
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.signals import request_finished
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncClient, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework.test import APITestCase
 from rest_framework import status
-from api.models import User
+from api.models import User, Customer, CustomerUser, Category, Product, Supplier
+from api.models import Location, Shipment, Warehouse, WarehouseProduct
+from api.models import ArchivedOrder, ChangeLog, CustomerSummary, Order, OrderItem, Quotation
+from api.models import PriceList, PriceListItem, ShipmentManifest, TaxType
+from api.events import get_backend
+from api import schema
+from api.allocation import allocate_orders
+from api.checks import check_shared_cache
+from api.authentication import SignedTokenAuthentication, issue_token, revoke_tokens, verified_tokens
+from api.throttling import CacheStore, get_store
+from api.sku_index import sku_index, warm_sku_index
+from api.stock import reserve_product_stock
+from api.archive import archive_chunk
+from api.imports import ProductImporter, read_csv
+from api.totals import find_drift, verify_category_tree, verify_customer_summaries
+from api.planning import create_draft_orders, suggest_reorders
+from api.reports import ageing_report
+from api.fast_serializers import compile_serializer, serialize_many
+from api.serializers import CustomerSerialiser, OrderSerialiser, ProductSerializer
+from api.middleware import CompressionMiddleware, ThrottleMiddleware
+import brotli
+import zstandard
+from rest_framework.renderers import JSONRenderer
+import msgpack
+import openpyxl
+import orjson
+
+
+def api_admin():
+    """Creates an admin API user; role-scoped views refuse anonymous requests."""
+    return User.objects.create(name="API Admin", email="api-admin@example.com", role="admin")
 
 
 class UserTestCase(APITestCase):
@@ -309,9 +359,2482 @@ class DocsTestCase(APITestCase):
         response = self.client.get("/")
         self.assertEqual(response.status_code, status.HTTP_200_OK),
 
+    def test_schema_is_cached_with_etag(self):
+        """
+        Test API: The JSON spec carries an ETag and conditional requests return 304.
+        """
+        response = self.client.get("/?format=openapi")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("/products/", json.loads(response.content)["paths"])
+        etag = response["ETag"]
+        response = self.client.get("/?format=openapi", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_precomputed_schema_is_served_when_checksum_matches(self):
+        """
+        Test API: A precomputed schema file is served only while its checksum matches the source.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "openapi.json"
+            schema.write_schema_file(path)
+            document = json.loads(path.read_text())
+            document["schema"]["info"]["title"] = "Precomputed"
+            path.write_text(json.dumps(document))
+
+            with override_settings(SWAGGER_SCHEMA_FILE=path):
+                schema.get_precomputed_schema.cache_clear()
+                response = self.client.get("/?format=openapi")
+                self.assertEqual(json.loads(response.content)["info"]["title"], "Precomputed")
+
+                document["checksum"] = "stale"
+                path.write_text(json.dumps(document))
+                schema.get_precomputed_schema.cache_clear()
+                response = self.client.get("/?format=openapi")
+                self.assertEqual(json.loads(response.content)["info"]["title"], "Miinventory API")
+            schema.get_precomputed_schema.cache_clear()
+
     # def test_docs_title(self):
     #     """
     #     Test API: Test docs title
     #     """
     #     response = self.client.get("/")
     #     self.assertContains(response, "<title>Django REST API</title>")
+
+
+class ChangeFeedTestCase(APITestCase):
+
+    """
+    Test suite for the /changes delta sync feed
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+
+    def create_product(self, sku):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(
+                name=f"Product {sku}", slug=sku, sku=sku, stock=1, supplier=self.supplier
+            )
+
+    def test_feed_returns_upserts_in_order(self):
+        """
+        Test API: Upserts are returned in token order with serialized payloads.
+        """
+        first = self.create_product("sku-1")
+        second = self.create_product("sku-2")
+        response = self.client.get("/api/changes/?since=0")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        events = response.data["data"]
+        self.assertEqual([event["id"] for event in events], [str(first.pk), str(second.pk)])
+        self.assertEqual(events[0]["action"], "upsert")
+        self.assertEqual(events[0]["data"]["sku"], "sku-1")
+        self.assertEqual(response.data["next"], events[-1]["token"])
+
+    def test_feed_is_incremental_and_records_deletes(self):
+        """
+        Test API: Only changes after the token are returned and deletes leave a tombstone.
+        """
+        product = self.create_product("sku-1")
+        token = self.client.get("/api/changes/?since=0").data["next"]
+        product_id = product.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+            Customer.objects.create(name="Jane")
+
+        events = self.client.get(f"/api/changes/?since={token}").data["data"]
+        self.assertEqual([(event["model"], event["action"]) for event in events],
+                         [("product", "delete"), ("customer", "upsert")])
+        self.assertEqual(events[0]["id"], str(product_id))
+        self.assertIsNone(events[0]["data"])
+
+    def test_feed_collapses_repeated_changes(self):
+        """
+        Test API: Repeated saves of one object collapse into its latest event.
+        """
+        product = self.create_product("sku-1")
+        with self.captureOnCommitCallbacks(execute=True):
+            product.stock = 5
+            product.save()
+        response = self.client.get("/api/changes/?since=0&limit=1")
+        self.assertTrue(response.data["has_more"])
+        events = self.client.get("/api/changes/?since=0").data["data"]
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["data"]["stock"], 5)
+
+    def test_entries_commit_with_their_data(self):
+        """
+        Test: Log entries are written in the data transaction and roll back with it.
+        """
+        product = self.create_product("sku-1")
+        self.assertTrue(ChangeLog.objects.filter(object_id=str(product.pk)).exists())
+        try:
+            with transaction.atomic():
+                Customer.objects.create(name="Jane")
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertFalse(ChangeLog.objects.filter(model="customer").exists())
+
+    @override_settings(CHANGE_FEED_COMMIT_LAG=5)
+    def test_feed_holds_back_entries_within_commit_lag(self):
+        """
+        Test API: Entries younger than the commit lag are not served until it passes.
+        """
+        product = self.create_product("sku-1")
+        response = self.client.get("/api/changes/?since=0")
+        self.assertEqual((response.data["data"], response.data["next"]), ([], 0))
+        later = timezone.now() + timedelta(seconds=6)
+        with mock.patch("api.changes.timezone.now", return_value=later):
+            events = self.client.get("/api/changes/?since=0").data["data"]
+        self.assertEqual([event["id"] for event in events], [str(product.pk)])
+
+    def test_feed_rejects_invalid_parameters(self):
+        """
+        Test API: Invalid tokens and unknown models return 400.
+        """
+        self.assertEqual(self.client.get("/api/changes/?since=abc").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get("/api/changes/?models=orders").status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StockEventsTestCase(APITestCase):
+
+    """
+    Test suite for the live stock events stream
+    """
+
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+        self.product = Product.objects.create(name="Widget", slug="widget", sku="w-1", stock=0, supplier=self.supplier)
+        self.warehouse = Warehouse.objects.create(name="North", email="north@example.com")
+        self.headers = {"Authorization": f"Token {issue_token(api_admin())}"}
+
+    def test_shipments_update_warehouse_stock_and_publish(self):
+        """
+        Test: Incoming and outgoing shipments move warehouse stock and publish events on commit.
+        """
+        with mock.patch.object(get_backend(), "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                Shipment.objects.create(product=self.product, warehouse=self.warehouse, quantity=10)
+                Shipment.objects.create(
+                    shipment_type="outgoing", product=self.product, warehouse=self.warehouse, quantity=4
+                )
+        published = [call.args[0] for call in publish.call_args_list]
+        placement = WarehouseProduct.objects.get(product=self.product, warehouse=self.warehouse)
+        self.assertEqual(placement.quantity, 6)
+        self.assertEqual([(event["stock"], event["delta"]) for event in published], [(10, 10), (6, -4)])
+        self.assertEqual(published[0]["warehouse"], self.warehouse.pk)
+
+    def test_outgoing_shipment_without_stock_fails(self):
+        """
+        Test: Outgoing shipments cannot take more than the warehouse holds.
+        """
+        with self.assertRaises(ValueError):
+            Shipment.objects.create(shipment_type="outgoing", product=self.product, warehouse=self.warehouse, quantity=1)
+
+    async def test_stream_pushes_matching_events(self):
+        """
+        Test API: The SSE stream only delivers events matching the subscription.
+        """
+        response = await AsyncClient().get(f"/api/stock-events/?products={self.product.pk}", headers=self.headers)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b"retry: 3000\n\n")
+
+        backend = get_backend()
+        backend.publish({"id": 1, "product": "other", "warehouse": None, "stock": 1, "delta": 1})
+        backend.publish({"id": 2, "product": str(self.product.pk), "warehouse": None, "stock": 3, "delta": 3})
+        chunk = (await anext(stream)).decode()
+        self.assertTrue(chunk.startswith("id: 2\nevent: stock\n"))
+        self.assertEqual(json.loads(chunk.split("data: ")[1])["stock"], 3)
+        await stream.aclose()
+
+    def test_stream_rejects_invalid_filters(self):
+        """
+        Test API: Invalid subscription filters return 400.
+        """
+        response = self.client.get("/api/stock-events/?warehouses=north", headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_stream_requires_token(self):
+        """
+        Test API: Anonymous and invalid tokens are refused with 401 before the stream opens.
+        """
+        for headers in ({}, {"Authorization": "Token invalid"}):
+            with mock.patch.object(get_backend(), "subscribe") as subscribe:
+                response = await AsyncClient().get("/api/stock-events/", headers=headers)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertFalse(response.streaming)
+            subscribe.assert_not_called()
+
+
+class StartupProfileTestCase(APITestCase):
+
+    """
+    Test suite for the lean API settings profile and the startup profiler
+    """
+
+    def test_lean_profile_skips_unused_apps(self):
+        """
+        Test: The API-only profile boots without admin, sessions, messages or swagger.
+        """
+        script = (
+            "import sys, django; django.setup();"
+            "from django.apps import apps; from django.urls import resolve; resolve('/api/products/');"
+            "apps_left = [a for a in ('django.contrib.admin', 'django.contrib.sessions', 'django.contrib.messages')"
+            " if apps.is_installed(a)];"
+            "print(','.join(apps_left + [m for m in ('drf_yasg',) if m in sys.modules]))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=settings.BASE_DIR,
+            env={"DJANGO_SETTINGS_MODULE": "django-rest-api.settings_api", "PATH": ""},
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_lean_profile_authenticates_tokens(self):
+        """
+        Test: The API-only profile authenticates signed tokens, so its requests are scoped.
+        """
+        script = (
+            "import django; django.setup();"
+            "from rest_framework.settings import api_settings;"
+            "print(','.join(f'{c.__module__}.{c.__name__}' for c in api_settings.DEFAULT_AUTHENTICATION_CLASSES))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=settings.BASE_DIR,
+            env={"DJANGO_SETTINGS_MODULE": "django-rest-api.settings_api", "PATH": ""},
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "api.authentication.SignedTokenAuthentication")
+
+    def test_profiler_reports_each_middleware(self):
+        """
+        Test: The profiler reports a per-request cost for every configured middleware.
+        """
+        out = io.StringIO()
+        call_command("profile_startup", "--skip-imports", "--requests", "10", stdout=out)
+        for middleware in settings.MIDDLEWARE:
+            self.assertIn(middleware, out.getvalue())
+
+
+@override_settings(REPLICA_DATABASES=["replica"])
+class ReadReplicaTestCase(APITestCase):
+
+    """
+    Test suite for read replica routing, with a second SQLite file as the replica
+    """
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+        Supplier.objects.using("replica").create(pk=self.supplier.pk, name="Acme", email="acme@example.com")
+        self.data = {"name": "Widget", "slug": "widget", "sku": "w-1", "stock": 1, "supplier": self.supplier.pk}
+
+    def test_safe_reads_go_to_replica(self):
+        """
+        Test API: List reads of opted-in ViewSets are served from the replica.
+        """
+        Product.objects.using("replica").create(name="Replica only", slug="r", sku="r", stock=1, supplier=self.supplier)
+        response = self.client.get("/api/products/")
+        self.assertEqual([product["name"] for product in response.data["data"]], ["Replica only"])
+
+    def test_reads_after_write_are_pinned_to_primary(self):
+        """
+        Test API: A client that wrote reads from the primary, other clients read the lagging replica.
+        """
+        response = self.client.post("/api/products/", self.data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+        response = self.client.get("/api/products/")
+        self.assertEqual([product["name"] for product in response.data["data"]], ["Widget"])
+
+        response = APIClient().get("/api/products/")
+        self.assertEqual(response.data["data"], [])
+
+    def test_views_without_opt_in_read_primary(self):
+        """
+        Test API: Views that do not opt in keep reading from the primary.
+        """
+        Supplier.objects.using("replica").all().delete()
+        self.assertEqual(len(self.client.get("/api/suppliers/").data), 1)
+
+
+class OrderArchiveTestCase(APITestCase):
+
+    """
+    Test suite for order archival and partition aware order endpoints
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(user=api_admin())
+        supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+        self.product = Product.objects.create(name="Widget", slug="widget", sku="w-1", stock=0, supplier=supplier)
+        self.old = self.create_order("completed", days_ago=400)
+        self.recent = self.create_order("completed", days_ago=10)
+        self.open = self.create_order("pending", days_ago=400)
+
+    def create_order(self, order_status, days_ago):
+        order = Order.objects.create(
+            order_status=order_status, order_type="sale_order",
+            total_items=0, sub_total=0, vat=0, total_amount=0,
+        )
+        OrderItem.objects.create(order=order, product=self.product, quantity=2, unitcost=5, total_amount=10)
+        Order.objects.filter(pk=order.pk).update(order_date=timezone.now() - timedelta(days=days_ago))
+        return order
+
+    def test_archive_moves_only_cold_closed_orders(self):
+        """
+        Test: Only completed/cancelled orders older than the cutoff move, items included.
+        """
+        call_command("archive_orders", "--batch-size", "1", stdout=io.StringIO())
+        self.assertEqual(list(ArchivedOrder.objects.values_list("id", flat=True)), [self.old.pk])
+        self.assertEqual(ArchivedOrder.objects.get().orderItems.get().total_amount, 10)
+        self.assertFalse(Order.objects.filter(pk=self.old.pk).exists())
+        self.assertFalse(OrderItem.objects.filter(order_id=self.old.pk).exists())
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_viewsets_read_archive_for_old_ranges(self):
+        """
+        Test API: Order lists include archived orders only when the range reaches past the cutoff.
+        """
+        call_command("archive_orders", stdout=io.StringIO())
+        response = self.client.get("/api/sales-orders/")
+        self.assertEqual({order["id"] for order in response.data["data"]}, {self.recent.pk, self.open.pk})
+
+        after = (timezone.now() - timedelta(days=500)).date().isoformat()
+        response = self.client.get(f"/api/sales-orders/?order_date_after={after}")
+        self.assertEqual(
+            {order["id"] for order in response.data["data"]}, {self.old.pk, self.recent.pk, self.open.pk}
+        )
+        self.assertEqual(self.client.get("/api/purchase-orders/?archived=true").data["data"], [])
+
+        response = self.client.get(f"/api/sales-orders/{self.old.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["uuid"], str(self.old.uuid))
+
+    def test_shipped_orders_are_archived(self):
+        """
+        Test: Orders with shipments are archived, their shipments point at the archived order.
+        """
+        warehouse = Warehouse.objects.create(name="North", email="north@example.com")
+        shipment = Shipment.objects.create(product=self.product, warehouse=warehouse, quantity=2, order=self.old)
+        call_command("archive_orders", stdout=io.StringIO())
+        self.assertTrue(ArchivedOrder.objects.filter(pk=self.old.pk).exists())
+        shipment.refresh_from_db()
+        self.assertEqual((shipment.order_id, shipment.archived_order_id), (None, self.old.pk))
+
+    def test_archived_orders_merge_by_date(self):
+        """
+        Test API: Hot and archived orders are listed together in order_date order.
+        """
+        call_command("archive_orders", stdout=io.StringIO())
+        Order.objects.filter(pk=self.open.pk).update(order_date=timezone.now() - timedelta(days=450))
+        response = self.client.get("/api/sales-orders/?archived=true")
+        self.assertEqual(
+            [order["id"] for order in response.data["data"]], [self.open.pk, self.old.pk, self.recent.pk]
+        )
+
+    def test_invalid_date_range_returns_400(self):
+        """
+        Test API: Unparseable date filters return 400.
+        """
+        response = self.client.get("/api/sales-orders/?order_date_after=yesterday")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OrderTotalsTestCase(APITestCase):
+
+    """
+    Test suite for order totals maintained from order item deltas
+    """
+
+    def setUp(self):
+        supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+        self.products = [
+            Product.objects.create(name=f"P{i}", slug=f"p{i}", sku=f"p{i}", stock=0, price=10, supplier=supplier)
+            for i in range(3)
+        ]
+        self.order = Order.objects.create(order_status="pending", order_type="sale_order")
+
+    def assertTotals(self, order, items, amount):
+        order.refresh_from_db()
+        self.assertEqual(order.total_items, items)
+        self.assertAlmostEqual(order.sub_total, amount)
+        self.assertAlmostEqual(order.vat, amount * 0.16)
+        self.assertAlmostEqual(order.total_amount, amount * 1.16)
+
+    def add_item(self, product, quantity, order=None):
+        return OrderItem.objects.create(
+            order=order or self.order, product=product, quantity=quantity, unitcost=10, total_amount=10 * quantity
+        )
+
+    def test_purchase_orders_are_received_once(self):
+        """
+        Test API: Completing a purchase order adds its items to stock once, later saves add nothing.
+        """
+        order = Order.objects.create(order_status="pending", order_type="purchase_order")
+        self.add_item(self.products[0], 3, order)
+        self.add_item(self.products[1], 2, order)
+        stale = Order.objects.get(pk=order.pk)
+        self.client.force_authenticate(user=api_admin())
+        for _ in range(2):
+            response = self.client.patch(
+                f"/api/purchase-orders/{order.pk}/", {"order_status": "completed"}, format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stale.order_status = "completed"
+        stale.save()
+        self.assertEqual([product.stock for product in Product.objects.order_by("sku")], [3, 2, 0])
+        self.assertIsNotNone(Order.objects.get(pk=order.pk).received_at)
+
+        self.add_item(self.products[2], 4)
+        self.order.order_status = "completed"
+        self.order.save()
+        self.assertEqual(Product.objects.get(pk=self.products[2].pk).stock, 0)
+
+    def test_single_item_changes_apply_deltas(self):
+        """
+        Test: Inserting, updating, moving and deleting items keep totals in sync.
+        """
+        item = self.add_item(self.products[0], 2)
+        self.add_item(self.products[1], 1)
+        self.assertTotals(self.order, 3, 30)
+
+        item.quantity, item.total_amount = 5, 50
+        item.save()
+        self.assertTotals(self.order, 6, 60)
+
+        other = Order.objects.create(order_status="pending", order_type="sale_order")
+        item.order = other
+        item.save()
+        self.assertTotals(self.order, 1, 10)
+        self.assertTotals(other, 5, 50)
+
+        item.delete()
+        self.assertTotals(other, 0, 0)
+
+    def test_bulk_operations_apply_deltas(self):
+        """
+        Test: bulk_create, queryset update/delete and bulk_update keep totals in sync.
+        """
+        items = OrderItem.objects.bulk_create([
+            OrderItem(order=self.order, product=product, quantity=1, unitcost=10, total_amount=10)
+            for product in self.products
+        ])
+        self.assertTotals(self.order, 3, 30)
+
+        OrderItem.objects.filter(product=self.products[0]).update(quantity=F("quantity") + 1, total_amount=20)
+        self.assertTotals(self.order, 4, 40)
+
+        items[1].quantity, items[1].total_amount = 4, 40
+        OrderItem.objects.bulk_update([items[1]], ["quantity", "total_amount"])
+        self.assertTotals(self.order, 7, 70)
+
+        OrderItem.objects.filter(product__in=self.products[:2]).delete()
+        self.assertTotals(self.order, 1, 10)
+
+    def test_order_save_does_not_overwrite_totals(self):
+        """
+        Test: Saving a stale order instance keeps the maintained totals.
+        """
+        stale = Order.objects.get(pk=self.order.pk)
+        self.add_item(self.products[0], 2)
+        stale.order_status = "processing"
+        stale.save()
+        self.assertTotals(self.order, 2, 20)
+        self.assertEqual(stale.total_items, 2)
+
+    def test_deleting_order_cascades_items(self):
+        """
+        Test: Deleting an order with items succeeds.
+        """
+        self.add_item(self.products[0], 2)
+        self.order.delete()
+        self.assertFalse(OrderItem.objects.exists())
+
+    def test_verify_command_detects_and_repairs_drift(self):
+        """
+        Test: The verification command reports drift and repairs it with --repair.
+        """
+        self.add_item(self.products[0], 2)
+        Order.objects.filter(pk=self.order.pk).update(total_items=99, sub_total=1)
+
+        out = io.StringIO()
+        call_command("verify_order_totals", stdout=out)
+        self.assertIn(f"Order {self.order.pk}: totals drifted", out.getvalue())
+
+        call_command("verify_order_totals", "--repair", "--batch-size", "1", stdout=io.StringIO())
+        self.assertTotals(self.order, 2, 20)
+
+
+class RendererTestCase(APITestCase):
+
+    """
+    Test suite for the negotiated orjson and MessagePack renderers and parsers
+    """
+
+    def setUp(self):
+        supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+        for i in range(3):
+            Product.objects.create(
+                name=f"Café {i}", slug=f"p{i}", sku=f"p{i}", stock=i, price=10, supplier=supplier
+            )
+        Order.objects.create(order_status="pending", order_type="sale_order")
+
+    def test_default_json_is_unchanged(self):
+        """
+        Test API: Plain JSON responses match DRF's stdlib JSON renderer byte for byte.
+        """
+        for url in ("/api/products/", "/api/sales-orders/"):
+            response = self.client.get(url, HTTP_ACCEPT="application/json")
+            self.assertEqual(response["Content-Type"], "application/json")
+            self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_orjson_encoder_is_negotiated(self):
+        """
+        Test API: Accept "application/json; encoder=orjson" renders the same values with orjson.
+        """
+        expected = self.client.get("/api/products/", HTTP_ACCEPT="application/json").json()
+        with mock.patch.object(orjson, "dumps", wraps=orjson.dumps) as dumps:
+            response = self.client.get("/api/products/", HTTP_ACCEPT="application/json; encoder=orjson")
+        dumps.assert_called_once()
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(orjson.loads(response.content), expected)
+
+    def test_msgpack_is_negotiated(self):
+        """
+        Test API: MessagePack is served via the Accept header and the format suffix.
+        """
+        expected = self.client.get("/api/sales-orders/", HTTP_ACCEPT="application/json").json()
+        response = self.client.get("/api/sales-orders/", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content), expected)
+
+        response = self.client.get("/api/sales-orders/?format=msgpack")
+        self.assertEqual(msgpack.unpackb(response.content), expected)
+
+    def test_msgpack_request_body(self):
+        """
+        Test API: MessagePack request bodies are parsed.
+        """
+        body = msgpack.packb(
+            {"name": "Globex", "email": "globex@example.com", "supplier_type": "distributor"}
+        )
+        response = self.client.post("/api/suppliers/", body, content_type="application/msgpack")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Supplier.objects.filter(name="Globex").exists())
+
+        response = self.client.post("/api/suppliers/", b"\xc1", content_type="application/msgpack")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_benchmark_reports_each_format(self):
+        """
+        Test: The renderer benchmark reports every format for both lists.
+        """
+        out = io.StringIO()
+        call_command("bench_renderers", "--rows", "10", "--repeat", "1", stdout=out)
+        for label in ("products", "orders", "json", "orjson", "msgpack"):
+            self.assertIn(label, out.getvalue())
+
+
+class CompressionTestCase(APITestCase):
+
+    """
+    Test suite for the negotiated response compression middleware
+    """
+
+    def setUp(self):
+        supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+        for i in range(30):
+            Product.objects.create(name=f"Product {i}", slug=f"p{i}", sku=f"p{i}", stock=i, supplier=supplier)
+        self.plain = self.client.get("/api/products/").content
+
+    def compressed(self, accept_encoding):
+        return self.client.get("/api/products/", HTTP_ACCEPT_ENCODING=accept_encoding)
+
+    def test_encodings_are_negotiated(self):
+        """
+        Test API: Brotli, zstd and gzip are picked from Accept-Encoding including q-values.
+        """
+        decoders = {
+            "br": brotli.decompress,
+            "zstd": lambda body: zstandard.ZstdDecompressor().decompressobj().decompress(body),
+            "gzip": lambda body: zlib.decompress(body, zlib.MAX_WBITS | 16),
+        }
+        for header, expected in [
+            ("gzip, deflate, br, zstd", "br"),
+            ("gzip, zstd", "zstd"),
+            ("gzip;q=1.0, br;q=0.5", "gzip"),
+            ("*", "br"),
+        ]:
+            response = self.compressed(header)
+            self.assertEqual(response["Content-Encoding"], expected, header)
+            self.assertIn("Accept-Encoding", response["Vary"])
+            self.assertEqual(int(response["Content-Length"]), len(response.content))
+            self.assertEqual(decoders[expected](response.content), self.plain)
+
+    def test_uncompressed_responses(self):
+        """
+        Test API: Identity requests and bodies under the threshold are sent as they are.
+        """
+        for header in ("", "identity", "br;q=0, gzip;q=0, zstd;q=0"):
+            self.assertFalse(self.compressed(header).has_header("Content-Encoding"), header)
+        with override_settings(RESPONSE_COMPRESSION={"MIN_SIZE": len(self.plain) + 1}):
+            self.assertFalse(self.compressed("gzip").has_header("Content-Encoding"))
+
+    def test_etag_is_weakened(self):
+        """
+        Test: Compressed responses carry a weak ETag.
+        """
+        response = HttpResponse(b"{}" * 1000, content_type="application/json", headers={"ETag": '"abc"'})
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+        response = CompressionMiddleware(lambda request: response)(request)
+        self.assertEqual(response["ETag"], 'W/"abc"')
+
+    def test_streaming_flushes_each_chunk(self):
+        """
+        Test: Streaming responses are compressed chunk by chunk without buffering.
+        """
+        chunks = [b'{"rows": [', b'{"id": 1},', b'{"id": 2}]}']
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+        response = CompressionMiddleware(
+            lambda request: StreamingHttpResponse(iter(chunks), content_type="application/json")
+        )(request)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        stream = iter(response.streaming_content)
+        for chunk in chunks:
+            self.assertEqual(decompressor.decompress(next(stream)), chunk)
+
+    async def test_event_stream_is_compressed_per_event(self):
+        """
+        Test API: The async stock event stream is compressed and delivered event by event.
+        """
+        token = issue_token(await User.objects.acreate(name="API Admin", email="api-admin@example.com", role="admin"))
+        response = await AsyncClient().get(
+            "/api/stock-events/", headers={"Accept-Encoding": "br", "Authorization": f"Token {token}"}
+        )
+        self.assertEqual(response["Content-Encoding"], "br")
+        decompressor = brotli.Decompressor()
+        self.assertEqual(decompressor.process(await anext(response.streaming_content)), b"retry: 3000\n\n")
+        await response.streaming_content.aclose()
+
+    def test_benchmark_reports_each_encoding(self):
+        """
+        Test: The compression benchmark reports every available encoding.
+        """
+        out = io.StringIO()
+        call_command("bench_compression", "--rows", "10", "--repeat", "1", stdout=out)
+        for label in ("products", "gzip", "br", "zstd"):
+            self.assertIn(label, out.getvalue())
+
+
+class FastSerializerTestCase(APITestCase):
+
+    """
+    Test suite for the compiled read-only serialization path
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(user=api_admin())
+        supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+        user = User.objects.create(name="Jane", email="jane@example.com")
+        category = Category.objects.create(name="Tools", slug="tools", created_by=user)
+        warehouses = [Warehouse.objects.create(name=f"W{i}", email=f"w{i}@example.com") for i in range(2)]
+        self.products = [
+            Product.objects.create(
+                name="Hammer", slug="hammer", sku="h-1", stock=3, supplier=supplier,
+                category=category, created_by=user, tax=16, description="Steel",
+            ),
+            Product.objects.create(name="Nail", slug="nail", sku="n-1", stock=0, supplier=supplier),
+        ]
+        for warehouse in warehouses:
+            WarehouseProduct.objects.create(product=self.products[0], warehouse=warehouse, quantity=1)
+        self.orders = [
+            Order.objects.create(order_status="completed", order_type="sale_order", invoice_no="INV-1", pay=5),
+            Order.objects.create(order_status="pending", order_type="sale_order"),
+        ]
+        OrderItem.objects.create(order=self.orders[0], product=self.products[0], quantity=2, unitcost=5, total_amount=10)
+
+    def assertParity(self, serializer_class, queryset):
+        self.assertIsNotNone(compile_serializer(serializer_class, queryset.model))
+        expected = serializer_class(queryset, many=True).data
+        fast = serialize_many(serializer_class, queryset)
+        self.assertEqual(fast, expected)
+        self.assertEqual(JSONRenderer().render(fast), JSONRenderer().render(expected))
+
+    def test_product_parity(self):
+        """
+        Test: Products serialize identically, including nulls, relations and many-to-many ids.
+        """
+        self.assertParity(ProductSerializer, Product.objects.order_by("name"))
+
+    def test_order_parity(self):
+        """
+        Test: Hot and archived orders serialize identically.
+        """
+        self.assertParity(OrderSerialiser, Order.objects.order_by("id"))
+        Order.objects.filter(pk=self.orders[0].pk).update(order_date=timezone.now() - timedelta(days=400))
+        archive_chunk([self.orders[0].pk])
+        self.assertParity(OrderSerialiser, ArchivedOrder.objects.order_by("id"))
+
+    def test_unsupported_serializer_falls_back(self):
+        """
+        Test: Serializers with method fields or reverse relations use DRF.
+        """
+        Customer.objects.create(name="Globex")
+        self.assertIsNone(compile_serializer(CustomerSerialiser, Customer))
+        queryset = Customer.objects.all()
+        self.assertEqual(serialize_many(CustomerSerialiser, queryset), CustomerSerialiser(queryset, many=True).data)
+
+    def test_list_endpoints_use_fast_path(self):
+        """
+        Test API: Product and order lists return the serializer output with one query per table.
+        """
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/products/")
+        self.assertEqual(response.data["data"], ProductSerializer(Product.objects.all(), many=True).data)
+        response = self.client.get("/api/sales-orders/")
+        self.assertEqual(response.data["total"], 2)
+
+    def test_benchmark_reports_speedup(self):
+        """
+        Test: The serializer benchmark reports both paths for both lists.
+        """
+        out = io.StringIO()
+        call_command("bench_serializers", "--repeat", "1", stdout=out)
+        self.assertIn("products", out.getvalue())
+        self.assertIn("orders", out.getvalue())
+
+
+class WarehouseCapacityTestCase(APITestCase):
+
+    """
+    Test suite for warehouse occupancy, capacity checks, transfers and utilization
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(user=api_admin())
+        supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+        self.products = [
+            Product.objects.create(name=f"P{i}", slug=f"p{i}", sku=f"p{i}", stock=0, supplier=supplier)
+            for i in range(2)
+        ]
+        self.north = Warehouse.objects.create(name="North", email="north@example.com", capacity=100)
+        self.south = Warehouse.objects.create(name="South", email="south@example.com", capacity=20)
+
+    def ship(self, warehouse, product, quantity, shipment_type="incoming"):
+        return Shipment.objects.create(
+            shipment_type=shipment_type, product=product, warehouse=warehouse, quantity=quantity
+        )
+
+    def occupancy(self, warehouse):
+        warehouse.refresh_from_db()
+        return warehouse.occupancy
+
+    def test_shipments_maintain_occupancy(self):
+        """
+        Test: Incoming and outgoing shipments keep occupancy equal to the units held.
+        """
+        self.ship(self.north, self.products[0], 30)
+        self.ship(self.north, self.products[1], 10)
+        self.ship(self.north, self.products[0], 5, "outgoing")
+        self.assertEqual(self.occupancy(self.north), 35)
+        self.assertEqual(
+            WarehouseProduct.objects.get(warehouse=self.north, product=self.products[0]).quantity, 25
+        )
+
+    def test_inbound_over_capacity_is_rejected(self):
+        """
+        Test: Inbound shipments beyond capacity fail without changing stock.
+        """
+        self.ship(self.south, self.products[0], 15)
+        with self.assertRaises(ValueError):
+            self.ship(self.south, self.products[1], 6)
+        self.assertEqual(self.occupancy(self.south), 15)
+        self.assertFalse(WarehouseProduct.objects.filter(warehouse=self.south, product=self.products[1]).exists())
+        self.assertEqual(Shipment.objects.count(), 1)
+
+        unlimited = Warehouse.objects.create(name="Depot", email="depot@example.com")
+        self.ship(unlimited, self.products[0], 10_000)
+        self.assertEqual(self.occupancy(unlimited), 10_000)
+
+    def test_transfer_moves_stock_between_warehouses(self):
+        """
+        Test API: Transferring an order moves its items and completes it.
+        """
+        self.ship(self.north, self.products[0], 30)
+        order = Order.objects.create(
+            order_status="pending", order_type="transfer_order", from_warehouse=self.north, to_warehouse=self.south
+        )
+        OrderItem.objects.create(order=order, product=self.products[0], quantity=12, unitcost=1, total_amount=12)
+
+        response = self.client.post(f"/api/transfer-orders/{order.pk}/transfer/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["order_status"], "completed")
+        self.assertEqual(self.occupancy(self.north), 18)
+        self.assertEqual(self.occupancy(self.south), 12)
+
+        response = self.client.post(f"/api/transfer-orders/{order.pk}/transfer/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_concurrent_transfer_moves_stock_once(self):
+        """
+        Test API: A transfer that read the order before another one completed it moves nothing.
+        """
+        self.ship(self.north, self.products[0], 30)
+        order = Order.objects.create(
+            order_status="pending", order_type="transfer_order", from_warehouse=self.north, to_warehouse=self.south
+        )
+        OrderItem.objects.create(order=order, product=self.products[0], quantity=12, unitcost=1, total_amount=12)
+        stale = Order.objects.get(pk=order.pk)
+        self.client.post(f"/api/transfer-orders/{order.pk}/transfer/")
+
+        with mock.patch("api.views.TransferOrderViewSet.get_object", return_value=stale):
+            response = self.client.post(f"/api/transfer-orders/{order.pk}/transfer/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual((self.occupancy(self.north), self.occupancy(self.south)), (18, 12))
+
+    def test_transfer_over_capacity_is_rejected(self):
+        """
+        Test API: A transfer exceeding the destination's capacity returns 400 and moves nothing.
+        """
+        self.ship(self.north, self.products[0], 30)
+        order = Order.objects.create(
+            order_status="pending", order_type="transfer_order", from_warehouse=self.north, to_warehouse=self.south
+        )
+        OrderItem.objects.create(order=order, product=self.products[0], quantity=25, unitcost=1, total_amount=25)
+
+        response = self.client.post(f"/api/transfer-orders/{order.pk}/transfer/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("capacity", response.data["message"])
+        self.assertEqual(self.occupancy(self.north), 30)
+        self.assertEqual(self.occupancy(self.south), 0)
+
+    def test_utilization_is_one_query(self):
+        """
+        Test API: Utilization for all warehouses is read with a single query.
+        """
+        self.ship(self.north, self.products[0], 25)
+        Warehouse.objects.create(name="Depot", email="depot@example.com")
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/warehouses/utilization/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        north, south, depot = response.data["data"]
+        self.assertEqual((north["occupancy"], north["available"], north["utilization"]), (25, 75, 0.25))
+        self.assertEqual(south["utilization"], 0)
+        self.assertIsNone(depot["utilization"])
+
+    def test_warehouse_list_prefetches_products(self):
+        """
+        Test API: Listing warehouses does not query products per warehouse.
+        """
+        self.ship(self.north, self.products[0], 1)
+        self.ship(self.south, self.products[1], 1)
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/warehouses/")
+        self.assertEqual(response.data[0]["products"], [self.products[0].pk])
+
+
+class AllocationTestCase(APITestCase):
+
+    """
+    Test suite for allocating sales orders across warehouses
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(user=api_admin())
+        supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+        self.products = [
+            Product.objects.create(name=f"P{i}", slug=f"p{i}", sku=f"p{i}", stock=0, supplier=supplier)
+            for i in range(3)
+        ]
+        self.city = Location.objects.create(name="City", address="1 Main St")
+        self.coast = Location.objects.create(name="Coast", address="2 Harbour Rd")
+        self.central = Warehouse.objects.create(name="Central", email="central@example.com", location=self.city)
+        self.port = Warehouse.objects.create(name="Port", email="port@example.com", location=self.coast)
+        self.annex = Warehouse.objects.create(name="Annex", email="annex@example.com", location=self.coast)
+
+    def stock(self, warehouse, product, quantity):
+        Shipment.objects.create(product=product, warehouse=warehouse, quantity=quantity)
+
+    def order(self, *lines):
+        order = Order.objects.create(order_status="pending", order_type="sale_order")
+        for product, quantity in lines:
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, unitcost=1, total_amount=quantity)
+        return order
+
+    def shipments(self, order):
+        return sorted(
+            (shipment.warehouse.name, shipment.product.name, shipment.quantity)
+            for shipment in Shipment.objects.filter(order=order)
+        )
+
+    def test_single_warehouse_follows_location_preference(self):
+        """
+        Test: A line goes to one warehouse that holds it all, preferring the requested location.
+        """
+        self.stock(self.central, self.products[0], 10)
+        self.stock(self.port, self.products[0], 10)
+        first, second = self.order((self.products[0], 5)), self.order((self.products[0], 5))
+
+        allocate_orders([first.pk], preferred_locations=[self.coast.pk])
+        allocate_orders([second.pk], preferred_locations=[self.city.pk])
+        self.assertEqual(self.shipments(first), [("Port", "P0", 5)])
+        self.assertEqual(self.shipments(second), [("Central", "P0", 5)])
+        first.refresh_from_db()
+        self.assertEqual(first.order_status, "processing")
+        self.port.refresh_from_db()
+        self.assertEqual(self.port.occupancy, 5)
+
+    def test_split_uses_fewest_warehouses(self):
+        """
+        Test: Lines no warehouse can fill alone are split largest stock first.
+        """
+        self.stock(self.central, self.products[0], 2)
+        self.stock(self.port, self.products[0], 6)
+        self.stock(self.annex, self.products[0], 5)
+        order = self.order((self.products[0], 10))
+        allocate_orders([order.pk])
+        self.assertEqual(self.shipments(order), [("Annex", "P0", 4), ("Port", "P0", 6)])
+
+    def test_short_orders_take_no_stock(self):
+        """
+        Test: An order that cannot be filled reports shortages and leaves stock to later orders.
+        """
+        self.stock(self.central, self.products[0], 5)
+        short = self.order((self.products[0], 3), (self.products[1], 1))
+        filled = self.order((self.products[0], 5))
+        allocations = allocate_orders([short.pk, filled.pk])
+        self.assertEqual(allocations[0].shortages, {self.products[1].pk: 1})
+        self.assertFalse(Shipment.objects.filter(order=short).exists())
+        self.assertEqual(self.shipments(filled), [("Central", "P0", 5)])
+
+    def test_orders_are_checked_again_before_allocating(self):
+        """
+        Test: Orders another allocation already shipped or moved on are not allocated twice.
+        """
+        self.stock(self.central, self.products[0], 10)
+        order = self.order((self.products[0], 4))
+        allocate_orders([order.pk])
+        self.assertEqual(allocate_orders([order.pk]), [])
+        # Shipped by an allocation that committed after this one read the status.
+        Order.objects.filter(pk=order.pk).update(order_status="pending")
+        self.assertEqual(allocate_orders([order.pk]), [])
+        self.assertEqual(self.shipments(order), [("Central", "P0", 4)])
+        self.central.refresh_from_db()
+        self.assertEqual(self.central.occupancy, 6)
+
+    def test_allocation_refreshes_customer_aggregates(self):
+        """
+        Test: Allocated orders refresh their customers' receivables rows and keep the summary in step.
+        """
+        cache.clear()
+        customer = Customer.objects.create(name="Initech", contact_email="buyer@initech.example")
+        self.stock(self.central, self.products[0], 10)
+        order = self.order((self.products[0], 4))
+        order.customer, order.due = customer, 4
+        order.save()
+        ageing_report()
+        # Unseen by the snapshot, the allocation's refresh picks it up.
+        Order.objects.filter(pk=order.pk).update(due=9)
+        with self.captureOnCommitCallbacks(execute=True):
+            allocate_orders([order.pk])
+        as_of, rows, totals = ageing_report()
+        self.assertEqual(totals["total"], 9)
+        summary = CustomerSummary.objects.get(customer=customer)
+        self.assertEqual((summary.order_count, summary.revenue), (1, Order.objects.get(pk=order.pk).total_amount))
+
+    def test_query_count_does_not_grow_with_orders(self):
+        """
+        Test: Availability and items are loaded in batches, not per order or line.
+        """
+        for warehouse in (self.central, self.port):
+            for product in self.products:
+                self.stock(warehouse, product, 1000)
+
+        def queries(count):
+            orders = [self.order(*[(product, 3) for product in self.products]) for _ in range(count)]
+            with self.captureOnCommitCallbacks(execute=False):
+                with CaptureQueriesContext(connection) as context:
+                    allocate_orders([order.pk for order in orders])
+            return len(context.captured_queries)
+
+        self.assertEqual(queries(2), queries(20))
+
+    def test_allocate_endpoints(self):
+        """
+        Test API: Orders are allocated one at a time or in batches; shipped orders are skipped.
+        """
+        self.stock(self.central, self.products[0], 10)
+        first, second = self.order((self.products[0], 4)), self.order((self.products[0], 4))
+
+        response = self.client.post(f"/api/sales-orders/{first.pk}/allocate/", {}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["data"][0]["allocated"])
+
+        response = self.client.post(
+            "/api/sales-orders/allocate/", {"orders": [first.pk, second.pk], "locations": [self.city.pk]}, format="json"
+        )
+        self.assertEqual(response.data["skipped"], [first.pk])
+        self.assertEqual(response.data["data"][0]["order"], second.pk)
+
+        response = self.client.post("/api/sales-orders/allocate/", {"orders": ["x"]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ReorderPlanningTestCase(APITestCase):
+
+    """
+    Test suite for reorder suggestions and draft purchase orders
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(user=api_admin())
+        self.acme = Supplier.objects.create(name="Acme", email="acme@example.com")
+        self.globex = Supplier.objects.create(name="Globex", email="globex@example.com")
+        self.low = self.product("low", self.acme, stock=4, min_stock=10)
+        self.selling = self.product("selling", self.globex, stock=5)
+        self.plenty = self.product("plenty", self.acme, stock=500, min_stock=10)
+        self.ordered = self.product("ordered", self.acme, stock=4, min_stock=10)
+
+        sale = Order.objects.create(order_status="completed", order_type="sale_order")
+        OrderItem.objects.create(order=sale, product=self.selling, quantity=30, unitcost=1, total_amount=30)
+        OrderItem.objects.create(order=sale, product=self.plenty, quantity=30, unitcost=1, total_amount=30)
+        old_sale = Order.objects.create(order_status="completed", order_type="sale_order")
+        OrderItem.objects.create(order=old_sale, product=self.low, quantity=300, unitcost=1, total_amount=300)
+        Order.objects.filter(pk=old_sale.pk).update(order_date=timezone.now() - timedelta(days=90))
+        purchase = Order.objects.create(order_status="pending", order_type="purchase_order", supplier=self.acme)
+        OrderItem.objects.create(order=purchase, product=self.ordered, quantity=6, unitcost=1, total_amount=6)
+
+    def product(self, name, supplier, stock, min_stock=0):
+        return Product.objects.create(
+            name=name, slug=name, sku=name, stock=stock, min_stock=min_stock, price=2, supplier=supplier
+        )
+
+    def test_suggestions(self):
+        """
+        Test: Suggestions cover min_stock, lead time sales and open purchase orders.
+        """
+        suggestions = {
+            suggestion.product_id: suggestion
+            for suggestion in suggest_reorders(window_days=30, lead_time_days=7, cover_days=14)
+        }
+        self.assertEqual(set(suggestions), {self.low.pk, self.selling.pk})
+        self.assertEqual(suggestions[self.low.pk].quantity, 6)
+        # 1 unit/day: reorder point 7, target 21
+        self.assertEqual(suggestions[self.selling.pk].quantity, 16)
+        self.assertEqual(suggestions[self.selling.pk].velocity, 1)
+
+    def test_draft_orders_per_supplier(self):
+        """
+        Test: One draft purchase order per supplier is created and not suggested again.
+        """
+        orders = create_draft_orders(suggest_reorders(window_days=30, lead_time_days=7, cover_days=14))
+        self.assertEqual({order.supplier_id for order in orders}, {self.acme.pk, self.globex.pk})
+        draft = Order.objects.get(supplier=self.globex, order_status="draft")
+        self.assertEqual(draft.order_type, "purchase_order")
+        self.assertEqual(draft.total_items, 16)
+        self.assertEqual(draft.sub_total, 32)
+        self.assertEqual(suggest_reorders(window_days=30, lead_time_days=7, cover_days=14), [])
+
+    def test_plan_endpoint_and_command(self):
+        """
+        Test API: The plan endpoint dry-runs per supplier; the command creates drafts.
+        """
+        response = self.client.post(
+            "/api/purchase-orders/plan/", {"suppliers": [self.acme.pk], "dry_run": True}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row["product"] for row in response.data["data"]], [self.low.pk])
+        self.assertEqual(response.data["orders"], [])
+
+        out = io.StringIO()
+        call_command("plan_reorders", stdout=out)
+        self.assertIn("Created 2 draft purchase orders", out.getvalue())
+
+
+class SupplierProductsTestCase(APITestCase):
+
+    """
+    Test suite for the supplier product listing
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+        other = Supplier.objects.create(name="Globex", email="globex@example.com")
+        for index, stock in enumerate([5, 50, 0, 20, 8]):
+            Product.objects.create(
+                name=f"widget {index}", slug=f"widget-{index}", sku=f"ACME-{index}",
+                stock=stock, min_stock=10, price=3, supplier=self.supplier,
+            )
+        Product.objects.create(name="gadget", slug="gadget", sku="GLOBEX-1", stock=1, supplier=other)
+        self.url = f"/api/suppliers/{self.supplier.pk}/products/"
+
+    def test_pages_and_aggregates(self):
+        """
+        Test API: Pages follow the cursor in SKU order and carry the supplier aggregates.
+        """
+        skus, url = [], f"{self.url}?page_size=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            skus += [row["sku"] for row in response.data["data"]]
+            url = response.data["next"]
+        self.assertEqual(skus, [f"ACME-{index}" for index in range(5)])
+        self.assertEqual(
+            response.data["supplier"],
+            {"id": self.supplier.pk, "name": "Acme", "sku_count": 5, "stock_units": 83, "stock_value": 249},
+        )
+
+    def test_filters_and_ordering(self):
+        """
+        Test API: Search, low_stock and descending ordering narrow and sort the listing.
+        """
+        response = self.client.get(self.url, {"low_stock": "true", "ordering": "-stock"})
+        self.assertEqual([row["stock"] for row in response.data["data"]], [8, 5, 0])
+        response = self.client.get(self.url, {"search": "acme-3"})
+        self.assertEqual([row["sku"] for row in response.data["data"]], ["ACME-3"])
+        response = self.client.get(self.url, {"ordering": "-stock", "page_size": 2})
+        response = self.client.get(response.data["next"])
+        self.assertEqual([row["stock"] for row in response.data["data"]], [8, 5])
+
+    def test_unknown_supplier_and_bad_parameters(self):
+        """
+        Test API: Unknown suppliers 404 in one query; bad cursors and orderings are rejected.
+        """
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/suppliers/999/products")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(self.url, {"cursor": "nope"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {"ordering": "slug"}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cached_until_product_changes(self):
+        """
+        Test API: Pages are served from cache, revalidate by ETag and refresh on product saves.
+        """
+        response = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+        self.assertEqual(cached.data, response.data)
+        etag = response.headers["ETag"]
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=f"W/{etag}").status_code, status.HTTP_304_NOT_MODIFIED
+        )
+
+        product = Product.objects.get(sku="ACME-0")
+        product.stock = 100
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"][0]["stock"], 100)
+        self.assertEqual(response.data["supplier"]["stock_units"], 178)
+
+    @override_settings(ALLOWED_HOSTS=["one.example", "two.example"])
+    def test_cached_page_builds_next_url_per_request(self):
+        """
+        Test API: A cached page links to the next page on the host of each request.
+        """
+        first = self.client.get(self.url, {"page_size": 2}, HTTP_HOST="one.example")
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url, {"page_size": 2}, HTTP_HOST="two.example")
+        self.assertTrue(first.data["next"].startswith("http://one.example/"))
+        self.assertTrue(second.data["next"].startswith("http://two.example/"))
+        self.assertEqual(second.data["data"], first.data["data"])
+
+    def test_deploy_check_warns_about_process_local_cache(self):
+        """
+        Test: The deploy checks warn while the default cache is local to each process.
+        """
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ["api.W001"])
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class CustomerOrderHistoryTestCase(APITestCase):
+
+    """
+    Test suite for customer order history and summaries
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(user=api_admin())
+        self.customer = Customer.objects.create(name="Initech", contact_email="buyer@initech.example")
+        supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+        self.product = Product.objects.create(
+            name="widget", slug="widget", sku="W-1", stock=100, price=100, supplier=supplier
+        )
+        self.orders = []
+        for days in range(5):
+            order = Order.objects.create(
+                order_status="pending", order_type="sale_order", customer=self.customer, due=10
+            )
+            OrderItem.objects.create(order=order, product=self.product, quantity=1, unitcost=100, total_amount=100)
+            Order.objects.filter(pk=order.pk).update(order_date=timezone.now() - timedelta(days=days))
+            self.orders.append(order)
+        Order.objects.create(order_status="pending", order_type="purchase_order", customer=self.customer, due=99)
+        self.url = f"/api/customers/{self.customer.pk}/orders/"
+
+    def summary(self):
+        summary = CustomerSummary.objects.get(customer=self.customer)
+        return summary.order_count, round(summary.revenue, 2), summary.due
+
+    def test_summary_follows_orders(self):
+        """
+        Test: Summaries follow item totals, due, cancellation and single or queryset deletes, but not archiving.
+        """
+        self.assertEqual(self.summary(), (5, 580, 50))
+        order = Order.objects.get(pk=self.orders[0].pk)
+        order.due = 0
+        order.save()
+        self.assertEqual(self.summary(), (5, 580, 40))
+        order.order_status = "cancelled"
+        order.save()
+        self.assertEqual(self.summary(), (4, 464, 40))
+
+        archive_chunk([self.orders[1].pk])
+        self.assertEqual(self.summary(), (4, 464, 40))
+        Order.objects.get(pk=self.orders[2].pk).delete()
+        self.assertEqual(self.summary(), (3, 348, 30))
+        Order.objects.filter(pk=self.orders[3].pk).delete()
+        self.assertEqual(self.summary(), (2, 232, 20))
+        self.assertEqual(verify_customer_summaries(), {})
+
+    def test_verify_repairs_drift(self):
+        """
+        Test: Drifted summaries are reported and repaired from the orders.
+        """
+        CustomerSummary.objects.filter(customer=self.customer).update(order_count=1, revenue=0)
+        drifted = verify_customer_summaries(repair=True)
+        self.assertEqual(list(drifted), [self.customer.pk])
+        self.assertEqual(self.summary(), (5, 580, 50))
+        out = io.StringIO()
+        call_command("verify_customer_summaries", stdout=out)
+        self.assertIn("Found 0 drifted customer summaries", out.getvalue())
+
+    def test_order_pages(self):
+        """
+        Test API: Orders page newest first on (order_date, id) with the lifetime totals.
+        """
+        ids, url = [], f"{self.url}?page_size=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [row["id"] for row in response.data["data"]]
+            url = response.data["next"]
+        self.assertEqual(ids, [order.pk for order in self.orders])
+        self.assertEqual(response.data["summary"], {"order_count": 5, "revenue": 580, "due": 50})
+
+        archive_chunk([self.orders[3].pk])
+        response = self.client.get(self.url, {"archived": "true"})
+        self.assertEqual([row["id"] for row in response.data["data"]], [self.orders[3].pk])
+        self.assertEqual(self.client.get("/api/customers/999/orders/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_sale_orders_only_on_request(self):
+        """
+        Test API: The customer payload embeds sale_orders only with ?include=sale_orders.
+        """
+        response = self.client.get(f"/api/customers/{self.customer.pk}/")
+        self.assertNotIn("sale_orders", response.data)
+        response = self.client.get(f"/api/customers/{self.customer.pk}/", {"include": "sale_orders"})
+        self.assertEqual(len(response.data["sale_orders"]), 6)
+
+
+class ReceivablesAgeingTestCase(APITestCase):
+
+    """
+    Test suite for the receivables ageing report
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.acme = Customer.objects.create(name="Acme", contact_email="ap@acme.example")
+        self.globex = Customer.objects.create(name="Globex", contact_email="ap@globex.example")
+        for days, due in [(-5, 10), (10, 20), (45, 30), (75, 40), (200, 50)]:
+            self.order(self.acme, due, days)
+        self.order(self.acme, 0, 20)
+        self.order(self.acme, 99, 20, status="cancelled")
+        self.order(self.acme, 99, 20, order_type="purchase_order")
+        self.globex_order = self.order(self.globex, 7, 1)
+
+    def order(self, customer, due, days_overdue, status="pending", order_type="sale_order"):
+        return Order.objects.create(
+            customer=customer, due=due, order_status=status, order_type=order_type,
+            order_due_date=timezone.now() - timedelta(days=days_overdue),
+        )
+
+    def test_buckets(self):
+        """
+        Test: Outstanding sales orders are bucketed by days past due, per customer.
+        """
+        as_of, rows, totals = ageing_report()
+        self.assertEqual(as_of, timezone.localdate().isoformat())
+        self.assertEqual([row["customer"] for row in rows], [self.acme.pk, self.globex.pk])
+        self.assertEqual(
+            rows[0],
+            {
+                "customer": self.acme.pk, "name": "Acme", "current": 10, "1-30": 20,
+                "31-60": 30, "61-90": 40, "90+": 50, "total": 150,
+            },
+        )
+        self.assertEqual(totals["1-30"], 27)
+        self.assertEqual(totals["total"], 157)
+
+    def test_unpaid_orders_are_not_archived(self):
+        """
+        Test: Completed orders past the archive cutoff stay in the report while an amount is due.
+        """
+        unpaid = self.order(self.globex, 5, 400, status="completed")
+        paid = self.order(self.globex, 0, 400, status="completed")
+        Order.objects.filter(pk__in=[unpaid.pk, paid.pk]).update(order_date=timezone.now() - timedelta(days=400))
+        call_command("archive_orders", stdout=io.StringIO())
+        self.assertEqual(list(ArchivedOrder.objects.values_list("id", flat=True)), [paid.pk])
+        as_of, rows, totals = ageing_report()
+        self.assertEqual(rows[1]["90+"], 5)
+        self.assertEqual(totals["total"], 162)
+
+    def test_snapshot_is_patched(self):
+        """
+        Test API: The report is served from the snapshot, which order changes patch.
+        """
+        url = "/api/reports/receivables-ageing/"
+        self.assertEqual(self.client.get(url).data["totals"]["total"], 157)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {"customer": self.globex.pk})
+        self.assertEqual(response.data["data"][0]["1-30"], 7)
+
+        order = Order.objects.get(pk=self.globex_order.pk)
+        order.due = 0
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+        response = self.client.get(url)
+        self.assertEqual([row["customer"] for row in response.data["data"]], [self.acme.pk])
+        self.assertEqual(response.data["totals"]["total"], 150)
+        self.assertEqual(self.client.get(url, {"customer": "x"}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ImportTestCase(APITestCase):
+
+    """
+    Test suite for bulk product and customer imports
+    """
+
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+        self.category = Category.objects.create(name="Tools", slug="tools")
+        Product.objects.create(name="old", slug="old", sku="OLD-1", stock=1, supplier=self.supplier)
+
+    def csv_file(self, rows):
+        lines = ["name,slug,sku,stock,price,category,supplier"]
+        lines += [",".join(str(value) for value in row) for row in rows]
+        return io.BytesIO("\n".join(lines).encode())
+
+    def product_rows(self, count, start=0):
+        return [
+            (f"item {index}", f"item-{index}", f"SKU-{index}", 5, 10, "tools", self.supplier.uuid)
+            for index in range(start, start + count)
+        ]
+
+    def test_rows_are_validated_and_reported(self):
+        """
+        Test: Valid rows are created in batches and failures are reported by line.
+        """
+        rows = self.product_rows(3) + [
+            ("bad stock", "bad-stock", "SKU-X", "abc", 1, "", self.supplier.uuid),
+            ("dup", "dup", "OLD-1", 1, 1, "", self.supplier.uuid),
+            ("dup in file", "dup-in-file", "SKU-0", 1, 1, "", self.supplier.uuid),
+            ("no supplier", "no-supplier", "SKU-Y", 1, 1, "tools", "00000000-0000-0000-0000-000000000000"),
+            ("no category", "no-category", "SKU-Z", 1, 1, "nope", self.supplier.uuid),
+        ]
+        result = ProductImporter(batch_size=4).run(read_csv(self.csv_file(rows)))
+        self.assertEqual(result.created, 3)
+        self.assertEqual(
+            {error["line"]: sorted(error["errors"]) for error in result.errors},
+            {5: ["stock"], 6: ["sku"], 7: ["sku"], 8: ["supplier"], 9: ["category"]},
+        )
+        product = Product.objects.get(sku="SKU-2")
+        self.assertEqual((product.category_id, product.supplier_id, product.stock), (self.category.pk, self.supplier.pk, 5))
+
+    def test_queries_do_not_grow_with_rows(self):
+        """
+        Test: A batch costs the same number of reads for 10 or 100 rows.
+        """
+        counts = []
+        for start, count in [(0, 10), (100, 100)]:
+            rows = read_csv(self.csv_file(self.product_rows(count, start)))
+            with CaptureQueriesContext(connection) as queries:
+                result = ProductImporter(batch_size=500).run(rows)
+            self.assertEqual(result.created, count)
+            # bulk_create may split its INSERT to fit the backend's parameter limit.
+            counts.append(sum(not query["sql"].startswith("INSERT") for query in queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_missing_unique_fields_use_model_defaults(self):
+        """
+        Test: Rows without a SKU take the default SKU, which only one of them may have.
+        """
+        lines = ["name,slug,stock,supplier"] + [f"item {index},item-{index},1,{self.supplier.uuid}" for index in range(2)]
+        result = ProductImporter().run(read_csv(io.BytesIO("\n".join(lines).encode())))
+        self.assertEqual((result.created, [error["line"] for error in result.errors]), (1, [3]))
+        line = f"other,other,1,{self.supplier.uuid}"
+        result = ProductImporter().run(read_csv(io.BytesIO("\n".join([lines[0], line]).encode())))
+        self.assertEqual((result.created, sorted(result.errors[0]["errors"])), (0, ["sku"]))
+
+    def test_conflicting_batch_falls_back_to_rows(self):
+        """
+        Test: A unique value taken after the check fails its row only, the others are created.
+        """
+        rows = self.product_rows(2) + [("late", "late", "OLD-1", 1, 1, "tools", self.supplier.uuid)]
+        importer = ProductImporter()
+        with mock.patch.object(importer, "existing_values", return_value={"sku": set(), "slug": set()}):
+            with self.captureOnCommitCallbacks(execute=True):
+                result = importer.run(read_csv(self.csv_file(rows)))
+        self.assertEqual((result.created, [error["line"] for error in result.errors]), (2, [4]))
+        self.assertEqual(Category.objects.get(pk=self.category.pk).product_count, 2)
+        self.assertEqual(
+            ChangeLog.objects.filter(model="product").exclude(object_id=Product.objects.get(sku="OLD-1").pk).count(), 2
+        )
+
+    def test_xlsx_endpoint_and_command(self):
+        """
+        Test API: XLSX customer uploads import through the endpoint; the command dry-runs CSV.
+        """
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(["name", "contact_email", "phone"])
+        sheet.append(["Initech", "ap@initech.example", "555"])
+        sheet.append(["Initech again", "ap@initech.example", None])
+        sheet.append([None, "nameless@example.com", None])
+        upload = io.BytesIO()
+        workbook.save(upload)
+        upload.name = "customers.xlsx"
+        upload.seek(0)
+        response = self.client.post("/api/imports/customers/", {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["created"], 1)
+        self.assertEqual([error["line"] for error in response.data["data"]["errors"]], [3, 4])
+        self.assertEqual(Customer.objects.get(contact_email="ap@initech.example").phone, "555")
+
+        with tempfile.NamedTemporaryFile(suffix=".csv") as path:
+            path.write(self.csv_file(self.product_rows(2)).getvalue())
+            path.flush()
+            out = io.StringIO()
+            call_command("import_records", "products", path.name, "--dry-run", stdout=out)
+        self.assertIn("Validated 2 products, 0 failed", out.getvalue())
+        self.assertFalse(Product.objects.filter(sku="SKU-0").exists())
+
+        upload = io.BytesIO(b"a,b")
+        upload.name = "data.json"
+        response = self.client.post("/api/imports/products/", {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class QuotationConversionTestCase(APITestCase):
+
+    """
+    Test suite for quotation items and conversion to sales orders
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(user=api_admin())
+        self.customer = Customer.objects.create(name="Initech", contact_email="buyer@initech.example")
+        self.supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+        self.widget = self.product("widget", stock=10, selling_price=100)
+        self.gadget = self.product("gadget", stock=5, selling_price=40)
+        self.quotation = Quotation.objects.create(
+            reference="Q-1", note="", status="pending", customer=self.customer,
+            discount_percentage=10, tax_percentage=16, shipping_amount=50,
+        )
+        self.url = f"/api/quotations/{self.quotation.pk}/"
+
+    def product(self, name, stock, selling_price=1):
+        return Product.objects.create(
+            name=name, slug=name, sku=name, stock=stock, selling_price=selling_price, supplier=self.supplier
+        )
+
+    def set_items(self, items):
+        return self.client.put(f"{self.url}items/", items, format="json")
+
+    def test_items_and_totals(self):
+        """
+        Test API: Replacing the items prices missing unit costs and recalculates the totals.
+        """
+        response = self.set_items([
+            {"product": str(self.widget.pk), "quantity": 3},
+            {"product": str(self.gadget.pk), "quantity": 5, "unitcost": 30},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row["total_amount"] for row in response.data["data"]], [300, 150])
+        # 450 - 45 discount + 65 tax (16% of 405) + 50 shipping
+        self.assertEqual(response.data["quotation"]["sub_total"], 450)
+        self.assertEqual(response.data["quotation"]["total_amount"], 520)
+
+        response = self.set_items([
+            {"product": str(self.widget.pk), "quantity": 0},
+            {"product": str(self.widget.pk), "quantity": 1},
+            {"product": "00000000-0000-0000-0000-000000000000", "quantity": 1},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([sorted(errors) for errors in response.data["items"]], [["quantity"], ["product"], ["product"]])
+        self.assertEqual(self.quotation.items.count(), 2)
+
+    def test_convert(self):
+        """
+        Test API: Approved quotations convert once into a sales order, reserving the stock.
+        """
+        self.set_items([{"product": str(self.widget.pk), "quantity": 4}, {"product": str(self.gadget.pk), "quantity": 5}])
+        self.assertEqual(self.client.post(f"{self.url}convert/").status_code, status.HTTP_409_CONFLICT)
+        Quotation.objects.filter(pk=self.quotation.pk).update(status="approved")
+
+        response = self.client.post(f"{self.url}convert/")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get(pk=response.data["data"]["id"])
+        self.assertEqual((order.order_type, order.customer_id, order.total_items), ("sale_order", self.customer.pk, 9))
+        self.assertEqual(order.sub_total, 600)
+        self.assertEqual(set(order.orderItems.values_list("product_id", "unitcost")), {(self.widget.pk, 100), (self.gadget.pk, 40)})
+        self.assertEqual(Product.objects.get(pk=self.widget.pk).stock, 6)
+        self.assertEqual(Product.objects.get(pk=self.gadget.pk).stock, 0)
+        self.quotation.refresh_from_db()
+        self.assertEqual((self.quotation.status, self.quotation.order_id), ("converted", order.pk))
+        self.assertEqual(order.due, self.quotation.total_amount)
+        self.assertEqual(self.client.post(f"{self.url}convert/").status_code, status.HTTP_409_CONFLICT)
+
+    def test_order_keeps_quoted_terms(self):
+        """
+        Test API: A converted order totals the quoted discount, tax and shipping, and later saves keep them and the stock.
+        """
+        self.set_items([{"product": str(self.widget.pk), "quantity": 3}])
+        Quotation.objects.filter(pk=self.quotation.pk).update(status="approved")
+        order_id = self.client.post(f"{self.url}convert/").data["data"]["id"]
+        self.quotation.refresh_from_db()
+        # 300 - 30 discount + 43 tax (16% of 270) + 50 shipping
+        self.assertEqual(self.quotation.total_amount, 363)
+        order = Order.objects.get(pk=order_id)
+        self.assertAlmostEqual(order.total_amount, 363)
+        self.assertAlmostEqual(order.vat, 43)
+        self.assertEqual((order.discount_amount, order.shipping_amount, order.due), (30, 50, 363))
+
+        response = self.client.patch(f"/api/sales-orders/{order_id}/", {"order_status": "processing"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        order.refresh_from_db()
+        self.assertEqual(order.order_status, "processing")
+        self.assertAlmostEqual(order.total_amount, 363)
+        self.assertEqual(list(order.orderItems.values_list("unitcost", flat=True)), [100])
+        self.assertEqual(Product.objects.get(pk=self.widget.pk).stock, 7)
+        self.assertEqual(verify_customer_summaries(), {})
+        self.assertEqual(find_drift([order_id]), {})
+
+    def test_short_stock_writes_nothing(self):
+        """
+        Test API: A conversion that stock does not cover leaves stock and orders untouched.
+        """
+        self.set_items([{"product": str(self.widget.pk), "quantity": 1}, {"product": str(self.gadget.pk), "quantity": 6}])
+        Quotation.objects.filter(pk=self.quotation.pk).update(status="approved")
+        response = self.client.post(f"{self.url}convert/")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIn("Not enough stock available", response.data["message"])
+        self.assertEqual(Product.objects.get(pk=self.widget.pk).stock, 10)
+        self.assertFalse(Order.objects.exists())
+
+    def test_large_basket_query_count(self):
+        """
+        Test: Converting a 1200 line basket takes a fixed number of queries, not one per line.
+        """
+        products = Product.objects.bulk_create([
+            Product(name=f"p{index}", slug=f"p{index}", sku=f"p{index}", stock=5, selling_price=2, supplier=self.supplier)
+            for index in range(1200)
+        ])
+        self.set_items([{"product": str(product.pk), "quantity": 2} for product in products])
+        Quotation.objects.filter(pk=self.quotation.pk).update(status="approved")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f"{self.url}convert/")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # Bulk INSERTs are split by the backend's parameter limit, count the rest.
+        self.assertLess(len([query for query in queries.captured_queries if not query["sql"].startswith("INSERT")]), 25)
+        self.assertEqual(Order.objects.get().total_items, 2400)
+        self.assertEqual(set(Product.objects.filter(pk__in=[product.pk for product in products]).values_list("stock", flat=True)), {3})
+
+
+class PricingTestCase(APITestCase):
+
+    """
+    Test suite for price lists, tax rules and basket quotes
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(user=api_admin())
+        cache.clear()
+        self.customer = Customer.objects.create(name="Initech", contact_email="buyer@initech.example")
+        self.supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+        self.vat = TaxType.objects.create(name="VAT", rate=16)
+        self.inclusive = TaxType.objects.create(name="Inclusive VAT", rate=25, inclusive=True)
+        self.widget = self.product("widget", selling_price=100, tax_type=self.vat.pk)
+        self.gadget = self.product("gadget", selling_price=125, tax_type=self.inclusive.pk)
+        self.gizmo = self.product("gizmo", selling_price=10, tax=5)
+        self.default_list = PriceList.objects.create(name="Default")
+        self.customer_list = PriceList.objects.create(name="Initech", customer=self.customer)
+
+    def product(self, name, **kwargs):
+        return Product.objects.create(name=name, slug=name, sku=name, stock=0, supplier=self.supplier, **kwargs)
+
+    def quote(self, items, customer=None):
+        data = {"items": items}
+        if customer is not None:
+            data["customer"] = customer
+        return self.client.post("/api/pricing/quote/", data, format="json")
+
+    def set_prices(self, price_list, items):
+        # Price books are invalidated once the transaction commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.put(f"/api/price-lists/{price_list.pk}/items/", items, format="json")
+
+    def test_tax_rules(self):
+        """
+        Test API: Lines are taxed by their tax type, inclusive rates taken out of the price.
+        """
+        response = self.quote([
+            {"product": str(self.widget.pk), "quantity": 2},
+            {"product": str(self.gadget.pk), "quantity": 1},
+            {"product": str(self.gizmo.pk), "quantity": 3},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row["unit_price"], row["net"], row["tax"], row["total"]) for row in response.data["data"]],
+            [(100, 200, 32, 232), (125, 100, 25, 125), (10, 30, 2, 32)],
+        )
+        self.assertEqual(response.data["totals"], {"total_items": 6, "net": 330, "tax": 59, "total": 389})
+
+    def test_price_lists_and_quantity_breaks(self):
+        """
+        Test API: The customer's list wins over the default list, per quantity break.
+        """
+        self.assertEqual(self.set_prices(self.default_list, [
+            {"product": str(self.widget.pk), "unit_price": 90},
+            {"product": str(self.widget.pk), "unit_price": 80, "min_quantity": 10},
+        ]).status_code, status.HTTP_200_OK)
+        self.set_prices(self.customer_list, [{"product": str(self.widget.pk), "unit_price": 70, "min_quantity": 50}])
+        items = [{"product": str(self.widget.pk), "quantity": quantity} for quantity in (1, 10, 50)]
+
+        response = self.quote(items, customer=self.customer.pk)
+        self.assertEqual(
+            [(row["unit_price"], row["price_list"]) for row in response.data["data"]],
+            [(90, self.default_list.pk), (80, self.default_list.pk), (70, self.customer_list.pk)],
+        )
+        other = Customer.objects.create(name="Globex", contact_email="buyer@globex.example")
+        response = self.quote(items, customer=other.pk)
+        self.assertEqual([row["unit_price"] for row in response.data["data"]], [90, 80, 80])
+
+        # Changes invalidate the cached price book.
+        self.set_prices(self.customer_list, [{"product": str(self.widget.pk), "unit_price": 60}])
+        response = self.quote(items, customer=self.customer.pk)
+        self.assertEqual([row["unit_price"] for row in response.data["data"]], [60, 60, 60])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer_list.active = False
+            self.customer_list.save()
+        response = self.quote(items, customer=self.customer.pk)
+        self.assertEqual([row["unit_price"] for row in response.data["data"]], [90, 80, 80])
+
+    def test_changes_reach_processes_with_their_own_cache(self):
+        """
+        Test API: The price book version is read from the database, not from the process's cache.
+        """
+        self.set_prices(self.default_list, [{"product": str(self.widget.pk), "unit_price": 90}])
+        items = [{"product": str(self.widget.pk), "quantity": 1}]
+        self.assertEqual(self.quote(items).data["data"][0]["unit_price"], 90)
+        # Another process changes the prices; this process's cache is not told.
+        with mock.patch("api.caching.cache"):
+            self.set_prices(self.default_list, [{"product": str(self.widget.pk), "unit_price": 85}])
+        self.assertEqual(self.quote(items).data["data"][0]["unit_price"], 85)
+
+    def test_invalid_baskets(self):
+        """
+        Test API: Invalid lines, products and customers are rejected.
+        """
+        response = self.quote([{"product": str(self.widget.pk), "quantity": 0}, {"product": "x", "quantity": 1}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([sorted(errors) for errors in response.data["items"]], [["quantity"], ["product"]])
+        response = self.quote([{"product": "00000000-0000-0000-0000-000000000000", "quantity": 1}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.quote([{"product": str(self.widget.pk), "quantity": 1}], customer=999)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.set_prices(self.default_list, [
+            {"product": str(self.widget.pk), "unit_price": 1}, {"product": str(self.widget.pk), "unit_price": 2}
+        ])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_quotation_default_prices(self):
+        """
+        Test API: Quotation lines without unit cost take the customer's price.
+        """
+        self.set_prices(self.customer_list, [{"product": str(self.widget.pk), "unit_price": 75}])
+        quotation = Quotation.objects.create(reference="Q-1", note="", status="pending", customer=self.customer)
+        response = self.client.put(
+            f"/api/quotations/{quotation.pk}/items/", [{"product": str(self.widget.pk), "quantity": 2}], format="json"
+        )
+        self.assertEqual(response.data["data"][0]["unitcost"], 75)
+
+    def test_large_basket(self):
+        """
+        Test: A 10k line basket is priced with a fixed number of queries once the price book is cached.
+        """
+        products = Product.objects.bulk_create([
+            Product(name=f"p{index}", slug=f"p{index}", sku=f"p{index}", stock=0, selling_price=3, supplier=self.supplier)
+            for index in range(10000)
+        ])
+        PriceListItem.objects.bulk_create([
+            PriceListItem(price_list=self.default_list, product=product, unit_price=2) for product in products[::2]
+        ])
+        items = [{"product": str(product.pk), "quantity": 1} for product in products]
+        self.quote(items)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.quote(items)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The price book version and the basket's products.
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(response.data["totals"]["net"], 25000)
+
+
+class CategoryTreeTestCase(APITestCase):
+
+    """
+    Test suite for the category tree and its subtree product counts
+    """
+
+    def setUp(self):
+        self.supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+        self.electronics = self.category("Electronics")
+        self.phones = self.category("Phones", self.electronics)
+        self.smartphones = self.category("Smartphones", self.phones)
+        self.garden = self.category("Garden")
+
+    def category(self, name, parent=None):
+        response = self.client.post(
+            "/api/categories/", {"name": name, "slug": name.lower(), "parent": parent and parent.pk}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Category.objects.get(pk=response.data["id"])
+
+    def product(self, name, category):
+        return Product.objects.create(name=name, slug=name, sku=name, stock=0, supplier=self.supplier, category=category)
+
+    def counts(self):
+        return dict(Category.objects.values_list("name", "product_count"))
+
+    def test_paths_and_counts(self):
+        """
+        Test: Paths follow the parents and counts include every descendant.
+        """
+        e, p, s = self.electronics.pk, self.phones.pk, self.smartphones.pk
+        self.assertEqual((self.smartphones.path, self.smartphones.depth), (f"{e}/{p}/{s}/", 2))
+        phone = self.product("phone", self.smartphones)
+        self.product("case", self.phones)
+        self.product("hose", self.garden)
+        self.assertEqual(self.counts(), {"Electronics": 2, "Phones": 2, "Smartphones": 1, "Garden": 1})
+
+        phone.category = self.garden
+        phone.save()
+        self.assertEqual(self.counts(), {"Electronics": 1, "Phones": 1, "Smartphones": 0, "Garden": 2})
+        phone.delete()
+        self.assertEqual(self.counts(), {"Electronics": 1, "Phones": 1, "Smartphones": 0, "Garden": 1})
+        self.assertEqual(verify_category_tree(), {})
+
+    def test_move_subtree(self):
+        """
+        Test API: Moving a category moves its descendants and their product counts.
+        """
+        self.product("phone", self.smartphones)
+        self.product("case", self.phones)
+        response = self.client.patch(f"/api/categories/{self.phones.pk}/", {"parent": self.garden.pk}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.smartphones.refresh_from_db()
+        g, p, s = self.garden.pk, self.phones.pk, self.smartphones.pk
+        self.assertEqual((self.smartphones.path, self.smartphones.depth), (f"{g}/{p}/{s}/", 2))
+        self.assertEqual(self.counts(), {"Electronics": 0, "Phones": 2, "Smartphones": 1, "Garden": 2})
+        self.assertEqual(verify_category_tree(), {})
+
+        response = self.client.patch(f"/api/categories/{self.garden.pk}/", {"parent": s}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.delete(f"/api/categories/{self.garden.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get("/api/categories/", {"parent": "root"})
+        self.assertEqual(sorted(row["name"] for row in response.data), ["Electronics", "Garden"])
+
+    def test_delete_needs_empty_category(self):
+        """
+        Test API: Categories with products are not deleted, empty leaves are.
+        """
+        case = self.product("case", self.smartphones)
+        response = self.client.delete(f"/api/categories/{self.smartphones.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("products", response.data)
+        case.category = self.garden
+        case.save()
+        response = self.client.delete(f"/api/categories/{self.smartphones.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(verify_category_tree(), {})
+
+    def test_depth_is_limited_by_the_path(self):
+        """
+        Test API: Categories nested past the path length are rejected, moves included.
+        """
+        parent = self.garden
+        while True:
+            try:
+                parent = Category.objects.create(name="level", slug="level", parent=parent)
+            except ValueError:
+                break
+        self.assertLessEqual(len(parent.path), Category._meta.get_field("path").max_length)
+        response = self.client.post(
+            "/api/categories/", {"name": "deep", "slug": "deep", "parent": parent.pk}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Category.objects.filter(name="deep").exists())
+        response = self.client.patch(f"/api/categories/{self.electronics.pk}/", {"parent": parent.pk}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.smartphones.refresh_from_db()
+        self.assertEqual(self.smartphones.depth, 2)
+        self.assertEqual(verify_category_tree(), {})
+
+    def test_subtree_products(self):
+        """
+        Test API: Category products include the descendants' with one product query per page.
+        """
+        for index in range(5):
+            self.product(f"phone-{index}", self.smartphones)
+        self.product("case", self.phones)
+        self.product("hose", self.garden)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/api/categories/{self.electronics.pk}/products/", {"page_size": 4})
+        # Category, the page and its warehouses.
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(response.data["category"]["product_count"], 6)
+        skus = [row["sku"] for row in response.data["data"]]
+        response = self.client.get(response.data["next"])
+        skus += [row["sku"] for row in response.data["data"]]
+        self.assertEqual(skus, ["case"] + [f"phone-{index}" for index in range(5)])
+        self.assertIsNone(response.data["next"])
+
+        response = self.client.get(f"/api/suppliers/{self.supplier.pk}/products/", {"category": self.phones.pk})
+        self.assertEqual(len(response.data["data"]), 6)
+
+    def test_repair(self):
+        """
+        Test: Drift from queryset updates is found and repaired.
+        """
+        self.product("phone", self.smartphones)
+        Product.objects.update(category=self.garden)
+        drifted = verify_category_tree()
+        self.assertEqual(set(drifted), {self.electronics.pk, self.phones.pk, self.smartphones.pk, self.garden.pk})
+        verify_category_tree(repair=True)
+        self.assertEqual(self.counts(), {"Electronics": 0, "Phones": 0, "Smartphones": 0, "Garden": 1})
+        self.assertEqual(verify_category_tree(), {})
+
+
+class RoleScopingTestCase(APITestCase):
+
+    """
+    Test suite for role-scoped querysets
+    """
+
+    def setUp(self):
+        self.acme = Customer.objects.create(name="Acme", contact_email="buyer@acme.example")
+        self.globex = Customer.objects.create(name="Globex", contact_email="buyer@globex.example")
+        self.buyer = User.objects.create(name="Buyer", email="buyer@example.com", role="customer")
+        CustomerUser.objects.create(customer=self.acme, user=self.buyer)
+        self.clerk = User.objects.create(name="Clerk", email="clerk@example.com", role="staff")
+        self.admin = User.objects.create(name="Admin", email="admin@example.com", role="admin")
+        self.north = Warehouse.objects.create(name="North", email="north@example.com")
+        self.south = Warehouse.objects.create(name="South", email="south@example.com")
+        self.east = Warehouse.objects.create(name="East", email="east@example.com")
+        self.north.staff.add(self.clerk)
+
+        self.orders = {
+            customer.name: [
+                Order.objects.create(order_type="sale_order", order_status="pending", customer=customer)
+                for _ in range(3)
+            ]
+            for customer in (self.acme, self.globex)
+        }
+        archive_chunk([self.orders["Acme"][0].pk, self.orders["Globex"][0].pk])
+        self.quotations = {
+            customer.name: Quotation.objects.create(reference=customer.name, note="", status="pending", customer=customer)
+            for customer in (self.acme, self.globex)
+        }
+        self.transfers = [
+            Order.objects.create(
+                order_type="transfer_order", order_status="pending", from_warehouse=source, to_warehouse=target
+            )
+            for source, target in ((self.north, self.south), (self.south, self.north), (self.south, self.east))
+        ]
+        Order.objects.create(order_type="purchase_order", order_status="draft")
+
+    def ids(self, url, user, key="id", **params):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED if "orders" in url else status.HTTP_200_OK)
+        rows = response.data["data"] if isinstance(response.data, dict) else response.data
+        return sorted(row[key] for row in rows)
+
+    def test_customer_scope(self):
+        """
+        Test API: Customer users only see their customers' orders and quotations.
+        """
+        acme = [order.pk for order in self.orders["Acme"]]
+        self.assertEqual(self.ids("/api/sales-orders/", self.buyer), acme[1:])
+        self.assertEqual(self.ids("/api/sales-orders/", self.buyer, archived="true"), acme)
+        self.assertEqual(self.ids("/api/purchase-orders/", self.buyer), [])
+        self.assertEqual(self.ids("/api/transfer-orders/", self.buyer), [])
+        self.assertEqual(self.ids("/api/quotations/", self.buyer), [self.quotations["Acme"].pk])
+        self.assertEqual(self.ids("/api/customers/", self.buyer), [self.acme.pk])
+
+        for url in (
+            f"/api/sales-orders/{self.orders['Globex'][1].pk}/",
+            f"/api/sales-orders/{self.orders['Globex'][0].pk}/",
+            f"/api/quotations/{self.quotations['Globex'].pk}/",
+            f"/api/customers/{self.globex.pk}/orders/",
+        ):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(f"/api/sales-orders/{acme[0]}/").status_code, status.HTTP_200_OK)
+
+    def test_staff_scope(self):
+        """
+        Test API: Staff users only see their warehouses and the transfers touching them.
+        """
+        self.assertEqual(self.ids("/api/warehouses/", self.clerk, key="name"), ["North"])
+        self.assertEqual(self.ids("/api/transfer-orders/", self.clerk), [order.pk for order in self.transfers[:2]])
+        response = self.client.get("/api/warehouses/utilization/")
+        self.assertEqual([row["id"] for row in response.data["data"]], [self.north.pk])
+        # Sales orders are not scoped for staff.
+        self.assertEqual(len(self.ids("/api/sales-orders/", self.clerk)), 4)
+
+    def test_unrestricted(self):
+        """
+        Test API: Admins see every row.
+        """
+        self.assertEqual(len(self.ids("/api/sales-orders/", self.admin)), 4)
+        self.assertEqual(len(self.ids("/api/warehouses/", self.admin, key="name")), 3)
+        self.assertEqual(len(self.ids("/api/quotations/", self.admin)), 2)
+
+    def test_anonymous_requests_refused(self):
+        """
+        Test API: Requests without a token neither list nor write any customer's orders.
+        """
+        response = self.client.get("/api/sales-orders/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertNotIn("data", response.json())
+        order = {"order_status": "pending", "order_due_date": "2030-01-01T00:00:00Z", "customer": self.globex.pk}
+        response = self.client.post("/api/sales-orders/", order, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get("/api/quotations/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_writes_stay_in_scope(self):
+        """
+        Test API: Customer users only create and move orders and quotations within their customers.
+        """
+        self.client.force_authenticate(user=self.buyer)
+        order = {"order_status": "pending", "order_due_date": "2030-01-01T00:00:00Z"}
+        response = self.client.post("/api/sales-orders/", {**order, "customer": self.globex.pk}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post("/api/sales-orders/", {**order, "customer": self.acme.pk}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post("/api/purchase-orders/", order, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        acme_order = self.orders["Acme"][1].pk
+        response = self.client.patch(f"/api/sales-orders/{acme_order}/", {"customer": self.globex.pk}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Order.objects.get(pk=acme_order).customer_id, self.acme.pk)
+        response = self.client.patch(f"/api/sales-orders/{acme_order}/", {"order_status": "processing"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        quotation = {"reference": "Q", "note": "-", "status": "pending"}
+        response = self.client.post("/api/quotations/", {**quotation, "customer": self.globex.pk}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.patch(
+            f"/api/quotations/{self.quotations['Acme'].pk}/", {"customer": self.globex.pk}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Quotation.objects.filter(customer=self.globex).count(), 1)
+        response = self.client.post("/api/quotations/", {**quotation, "customer": self.acme.pk}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post("/api/sales-orders/", {**order, "customer": self.globex.pk}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_reports_and_feeds_refuse_customer_users(self):
+        """
+        Test API: Cross-customer views refuse customer users; quotes are limited to their customers.
+        """
+        self.client.force_authenticate(user=self.buyer)
+        for url in ("/api/changes/", "/api/reports/receivables-ageing/"):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        product = Product.objects.create(
+            name="widget", slug="widget", sku="W-1", stock=0, selling_price=10,
+            supplier=Supplier.objects.create(name="Acme", email="acme@example.com"),
+        )
+        basket = {"items": [{"product": str(product.pk), "quantity": 1}]}
+        response = self.client.post("/api/pricing/quote/", {**basket, "customer": self.globex.pk}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post("/api/pricing/quote/", {**basket, "customer": self.acme.pk}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(user=self.clerk)
+        for url in ("/api/changes/", "/api/reports/receivables-ageing/"):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_memberships_resolved_once(self):
+        """
+        Test: Scoping costs one membership query per request, however many rows and querysets.
+        """
+        for _ in range(20):
+            Order.objects.create(order_type="sale_order", order_status="pending", customer=self.acme)
+        self.client.force_authenticate(user=self.admin)
+        with CaptureQueriesContext(connection) as unscoped:
+            self.client.get("/api/sales-orders/", {"archived": "true"})
+        self.client.force_authenticate(user=self.buyer)
+        with CaptureQueriesContext(connection) as scoped:
+            response = self.client.get("/api/sales-orders/", {"archived": "true"})
+        self.assertEqual(len(response.data["data"]), 23)
+        self.assertEqual(len(scoped), len(unscoped) + 1)
+
+
+class TokenAuthenticationTestCase(APITestCase):
+
+    """
+    Test suite for signed API tokens
+    """
+
+    def setUp(self):
+        cache.clear()
+        verified_tokens.clear()
+        self.acme = Customer.objects.create(name="Acme", contact_email="buyer@acme.example")
+        self.globex = Customer.objects.create(name="Globex", contact_email="buyer@globex.example")
+        self.buyer = User.objects.create(name="Buyer", email="buyer@example.com", role="customer")
+        CustomerUser.objects.create(customer=self.acme, user=self.buyer)
+        for customer in (self.acme, self.globex):
+            Order.objects.create(order_type="sale_order", order_status="pending", customer=customer)
+
+    def get_orders(self, token=None):
+        headers = {"HTTP_AUTHORIZATION": f"Token {token}"} if token else {}
+        return self.client.get("/api/sales-orders/", **headers)
+
+    def test_token_authenticates_user(self):
+        """
+        Test API: A token issued by the command authenticates its user, who is then scoped.
+        """
+        out = io.StringIO()
+        call_command("issue_token", "buyer@example.com", stdout=out)
+        response = self.get_orders(out.getvalue().strip())
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [row["id"] for row in response.data["data"]], [Order.objects.get(customer=self.acme).pk]
+        )
+        self.assertEqual(self.get_orders().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_tokens(self):
+        """
+        Test API: Tampered, expired and malformed tokens are rejected with 401.
+        """
+        token = issue_token(self.buyer)
+        for bad in (token[:-2] + "xx", issue_token(self.buyer, max_age=-1), "a b"):
+            response = self.get_orders(bad)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get_orders(token).status_code, status.HTTP_201_CREATED)
+
+    def test_cached_token_costs_no_queries(self):
+        """
+        Test: A verified token is served from the cache, costing no more queries than a pre-authenticated request.
+        """
+        token = issue_token(self.buyer)
+        self.get_orders(token)
+        self.client.force_authenticate(user=self.buyer)
+        with CaptureQueriesContext(connection) as forced:
+            self.get_orders()
+        self.client.force_authenticate(user=None)
+        with CaptureQueriesContext(connection) as authenticated:
+            response = self.get_orders(token)
+        self.assertEqual(len(response.data["data"]), 1)
+        self.assertEqual(len(authenticated), len(forced))
+
+    def test_revocation(self):
+        """
+        Test API: Revoked tokens and changed roles apply on the next request.
+        """
+        token = issue_token(self.buyer)
+        self.assertEqual(len(self.get_orders(token).data["data"]), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.buyer.role = "admin"
+            self.buyer.save()
+        self.assertEqual(len(self.get_orders(token).data["data"]), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            revoke_tokens(self.buyer.pk)
+        self.assertEqual(self.get_orders(token).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get_orders(issue_token(User.objects.get(pk=self.buyer.pk))).status_code, 201)
+
+    def test_revocation_reaches_processes_without_shared_cache(self):
+        """
+        Test: A revocation the cache never hears of applies once the cached token is due for revalidation.
+        """
+        token = issue_token(self.buyer)
+        self.assertEqual(self.get_orders(token).status_code, status.HTTP_201_CREATED)
+        # Revoked by another process with its own cache.
+        User.objects.filter(pk=self.buyer.pk).update(token_version=F("token_version") + 1)
+        self.assertEqual(self.get_orders(token).status_code, status.HTTP_201_CREATED)
+        later = time.time() + settings.API_TOKENS["REVALIDATE_AFTER"] + 1
+        with mock.patch("api.authentication.time.time", return_value=later):
+            self.assertEqual(self.get_orders(token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+THROTTLING = {
+    # Exact buckets, the tests mock the clock of LocalStore.
+    "STORE": "api.throttling.LocalStore",
+    "SCOPES": {
+        "default": {"rate": 1, "burst": 3, "concurrency": 1},
+        "reports": {"rate": 1, "burst": 1, "concurrency": None},
+    },
+    "ROUTES": {"reports/": "reports"},
+    "ROLE_MULTIPLIERS": {"admin": 2},
+}
+
+
+@override_settings(API_THROTTLING=THROTTLING)
+class ThrottlingTestCase(APITestCase):
+
+    """
+    Test suite for per-client rate limits and in-flight caps
+    """
+
+    def setUp(self):
+        cache.clear()
+        verified_tokens.clear()
+        get_store().clear()
+
+    def get(self, url="/api/categories/", address="10.0.0.1", token=None):
+        headers = {"HTTP_AUTHORIZATION": f"Token {token}"} if token else {}
+        return self.client.get(url, REMOTE_ADDR=address, **headers)
+
+    def test_bucket_refills(self):
+        """
+        Test API: A client gets its burst, then 429 with Retry-After until the bucket refills.
+        """
+        with mock.patch("api.throttling.monotonic", return_value=1000.0) as clock:
+            for _ in range(3):
+                self.assertNotEqual(self.get().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            response = self.get()
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(response["Retry-After"], "1")
+            self.assertEqual(response.json()["result"], "error")
+            clock.return_value = 1001.0
+            self.assertNotEqual(self.get().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(self.get().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_budgets_per_client_route_and_role(self):
+        """
+        Test API: Clients, users and expensive routes have separate budgets, scaled by role.
+        """
+        customer = User.objects.create(name="Buyer", email="buyer@example.com", role="customer")
+        admin = User.objects.create(name="Admin", email="admin@example.com", role="admin")
+        with mock.patch("api.throttling.monotonic", return_value=1000.0):
+            for _ in range(3):
+                self.get()
+            self.assertEqual(self.get().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertNotEqual(self.get(address="10.0.0.2").status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+            report = "/api/reports/receivables-ageing/"
+            self.assertEqual(self.get(report).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.get(report).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+            allowed = {}
+            for user in (customer, admin):
+                token = issue_token(user)
+                allowed[user.role] = sum(
+                    self.get(token=token).status_code != status.HTTP_429_TOO_MANY_REQUESTS for _ in range(8)
+                )
+        self.assertEqual(allowed, {"customer": 3, "admin": 6})
+
+    @override_settings(API_THROTTLING={**THROTTLING, "SCOPES": {"default": {"rate": 1, "burst": 10, "concurrency": 1}}})
+    def test_concurrency_cap(self):
+        """
+        Test: A client's requests in progress are capped, streams hold their slot until closed.
+        """
+        middleware = ThrottleMiddleware(lambda request: HttpResponse())
+        factory = RequestFactory()
+        first, second = factory.get("/api/categories/"), factory.get("/api/categories/")
+        self.assertIsNone(middleware.process_request(first))
+        response = middleware.process_request(second)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        stream = middleware.process_response(first, StreamingHttpResponse(iter([b"{}"])))
+        self.assertEqual(middleware.process_request(second).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # Closing sends request_finished, keep the test database connection open as the test client does.
+        request_finished.disconnect(close_old_connections)
+        try:
+            stream.close()
+        finally:
+            request_finished.connect(close_old_connections)
+        self.assertIsNone(middleware.process_request(second))
+        middleware.process_response(second, HttpResponse())
+        self.assertEqual(get_store().in_flight, {})
+
+    def test_cache_store(self):
+        """
+        Test API: The cache store enforces the burst per window and the in-flight cap.
+        """
+        with override_settings(API_THROTTLING={**THROTTLING, "STORE": "api.throttling.CacheStore"}):
+            store = get_store()
+            statuses = [self.get().status_code for _ in range(4)]
+            self.assertEqual(statuses.count(status.HTTP_429_TOO_MANY_REQUESTS), 1)
+            self.assertTrue(store.acquire("default:ip:10.0.0.1", 1))
+            self.assertFalse(store.acquire("default:ip:10.0.0.1", 1))
+            store.release("default:ip:10.0.0.1")
+            self.assertTrue(store.acquire("default:ip:10.0.0.1", 1))
+
+    def test_shared_store_by_default(self):
+        """
+        Test: Without a STORE setting the counters live in the shared cache.
+        """
+        with override_settings(API_THROTTLING={}):
+            self.assertIsInstance(get_store(), CacheStore)
+
+    def test_token_verified_once_per_request(self):
+        """
+        Test API: The view's authentication reuses the token the middleware verified.
+        """
+        user = User.objects.create(name="Buyer", email="buyer@example.com", role="customer")
+        token = issue_token(user)
+        with mock.patch.object(
+            SignedTokenAuthentication, "authenticate_token", autospec=True,
+            side_effect=SignedTokenAuthentication.authenticate_token,
+        ) as authenticate_token:
+            self.assertEqual(self.get(token=token).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.get(token=token[:-2] + "xx").status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(authenticate_token.call_count, 2)
+
+    def test_decision_overhead(self):
+        """
+        Test: Throttling a request costs microseconds.
+        """
+        limits = {"default": {"rate": 1e9, "burst": 1e9, "concurrency": 10}}
+        with override_settings(API_THROTTLING={**THROTTLING, "SCOPES": limits}):
+            middleware = ThrottleMiddleware(lambda request: HttpResponse())
+            request, response = RequestFactory().get("/api/categories/"), HttpResponse()
+            started = time.perf_counter()
+            for _ in range(10000):
+                middleware.process_request(request)
+                middleware.process_response(request, response)
+            per_request = (time.perf_counter() - started) / 10000
+        self.assertLess(per_request, 100e-6)
+
+
+class ShipmentManifestTestCase(APITestCase):
+
+    """
+    Test suite for shipment manifests
+    """
+
+    url = "/api/shipment-manifests/"
+
+    def setUp(self):
+        self.client.force_authenticate(user=api_admin())
+        self.supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+        self.products = [
+            Product.objects.create(name=f"P{i}", slug=f"p{i}", sku=f"p{i}", stock=0, supplier=self.supplier)
+            for i in range(3)
+        ]
+        self.warehouse = Warehouse.objects.create(name="North", email="north@example.com", capacity=1000)
+
+    def post(self, items, shipment_type="incoming", **fields):
+        data = {"shipment_type": shipment_type, "warehouse": self.warehouse.pk, "items": items, **fields}
+        return self.client.post(self.url, data, format="json")
+
+    def held(self):
+        return dict(WarehouseProduct.objects.filter(warehouse=self.warehouse).values_list("product_id", "quantity"))
+
+    def test_manifest_moves_stock(self):
+        """
+        Test API: A manifest records its lines and moves their stock at once.
+        """
+        first, second, _ = self.products
+        response = self.post(
+            [{"product": str(first.pk), "quantity": 10}, {"product": str(second.pk), "quantity": 4},
+             {"product": str(first.pk), "quantity": 1}],
+            reference="TRUCK-7",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            (response.data["data"]["total_lines"], response.data["data"]["total_quantity"]), (3, 15)
+        )
+        self.assertEqual(self.held(), {first.pk: 11, second.pk: 4})
+        self.warehouse.refresh_from_db()
+        self.assertEqual(self.warehouse.occupancy, 15)
+
+        manifest_id = response.data["data"]["id"]
+        response = self.post([{"product": str(first.pk), "quantity": 11}], "outgoing")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.held(), {first.pk: 0, second.pk: 4})
+
+        response = self.client.get(f"{self.url}{manifest_id}/items/")
+        self.assertEqual(response.data["total"], 3)
+        self.assertEqual([line["quantity"] for line in response.data["data"]], [10, 4, 1])
+        self.assertEqual(Shipment.objects.filter(manifest_id=manifest_id, warehouse=self.warehouse).count(), 3)
+
+    def test_outgoing_shortage_writes_nothing(self):
+        """
+        Test API: An outgoing manifest with one short line fails as a whole.
+        """
+        first, second, _ = self.products
+        self.post([{"product": str(first.pk), "quantity": 5}, {"product": str(second.pk), "quantity": 1}])
+        response = self.post(
+            [{"product": str(first.pk), "quantity": 5}, {"product": str(second.pk), "quantity": 2}], "outgoing"
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIn("Not enough stock", response.data["message"])
+        self.assertEqual(self.held(), {first.pk: 5, second.pk: 1})
+        self.assertEqual(ShipmentManifest.objects.count(), 1)
+        self.assertEqual(Shipment.objects.count(), 2)
+
+    def test_invalid_lines(self):
+        """
+        Test API: Every line is validated before anything is written.
+        """
+        response = self.post([
+            {"product": str(self.products[0].pk), "quantity": 1},
+            {"product": str(self.products[1].pk), "quantity": 0},
+            {"product": "999999", "quantity": 1},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["items"][1].keys(), {"quantity"})
+        self.assertEqual(self.post([]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.post(self.url, {"items": []}, format="json").data.keys(), {"warehouse"}
+        )
+        self.assertFalse(ShipmentManifest.objects.exists())
+        self.assertEqual(self.held(), {})
+
+    def test_large_manifest_query_count(self):
+        """
+        Test: A 2000 line truck receipt takes a fixed number of queries, not three per line.
+        """
+        products = Product.objects.bulk_create([
+            Product(name=f"bulk{index}", slug=f"bulk{index}", sku=f"bulk{index}", stock=0, supplier=self.supplier)
+            for index in range(2000)
+        ])
+        Warehouse.objects.filter(pk=self.warehouse.pk).update(capacity=0)
+        items = [{"product": str(product.pk), "quantity": 2} for product in products]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(items)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # Bulk INSERTs are split by the backend's parameter limit, count the rest.
+        self.assertLess(len([query for query in queries.captured_queries if not query["sql"].startswith("INSERT")]), 15)
+        self.assertEqual(WarehouseProduct.objects.filter(warehouse=self.warehouse, quantity=2).count(), 2000)
+
+
+@override_settings(SKU_INDEX={"REFRESH_INTERVAL": 60, "WARM_ON_STARTUP": True})
+class SkuIndexTestCase(APITestCase):
+
+    """
+    Test suite for SKU lookups from the in-process index
+    """
+
+    url = "/api/products/by-sku/"
+
+    def setUp(self):
+        sku_index.clear()
+        self.supplier = Supplier.objects.create(name="Acme", email="acme@example.com")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products = [
+                Product.objects.create(name=f"P{i}", slug=f"p{i}", sku=f"SKU-{i}", stock=5, supplier=self.supplier)
+                for i in range(3)
+            ]
+
+    def test_single_scan(self):
+        """
+        Test API: A scan returns the product with that SKU, unknown SKUs 404.
+        """
+        response = self.client.get(f"{self.url}SKU-1/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["id"], str(self.products[1].pk))
+        self.assertEqual(response.data["data"]["stock"], 5)
+        self.assertEqual(self.client.get(f"{self.url}NOPE/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_batch_of_scans(self):
+        """
+        Test API: A batch of 1000 scans is answered in one call without queries once warm.
+        """
+        warm_sku_index()
+        skus = [f"SKU-{i % 4}" for i in range(1000)]
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, {"skus": skus}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["SKU-2"]["id"], str(self.products[2].pk))
+        self.assertEqual(response.data["missing"], ["SKU-3"])
+        response = self.client.post(self.url, {"skus": "SKU-1"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_follows_changes(self):
+        """
+        Test: Saves, deletes and logged bulk changes reach the index through the change log.
+        """
+        self.assertIsNotNone(sku_index.get("SKU-0"))
+        product = self.products[0]
+        product.sku = "SKU-0B"
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+            self.products[1].delete()
+        self.assertIsNone(sku_index.get("SKU-0"))
+        self.assertEqual(sku_index.get(" SKU-0B ")["id"], str(product.pk))
+        self.assertIsNone(sku_index.get("SKU-1"))
+
+        # Bulk paths log their changes without signals, picked up on the next refresh.
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_product_stock({self.products[2].pk: 2})
+        self.assertEqual(sku_index.get("SKU-2")["stock"], 5)
+        with mock.patch("api.sku_index.monotonic", return_value=time.monotonic() + 61):
+            self.assertEqual(sku_index.get("SKU-2")["stock"], 3)
+
+    @override_settings(CHANGE_FEED_COMMIT_LAG=5)
+    def test_late_committed_entries_are_not_skipped(self):
+        """
+        Test: An entry committing after a newer one is still applied, the token stays at the safe token.
+        """
+        sku_index.warm()
+        # An id taken by a transaction that has not committed yet.
+        gap = ChangeLog.objects.create(model="product", object_id="pending")
+        gap_id = gap.pk
+        gap.delete()
+        product = self.products[0]
+        product.sku = "SKU-0B"
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertEqual(sku_index.get("SKU-0B")["id"], str(product.pk))
+
+        # The older transaction commits now.
+        Product.objects.filter(pk=self.products[1].pk).update(sku="SKU-LATE")
+        ChangeLog.objects.create(id=gap_id, model="product", object_id=str(self.products[1].pk))
+        sku_index.expire()
+        self.assertEqual(sku_index.get("SKU-LATE")["id"], str(self.products[1].pk))
+        self.assertLess(sku_index.token, gap_id)
+
+    def test_lookup_cost(self):
+        """
+        Test: A warm single lookup costs microseconds.
+        """
+        sku_index.get("SKU-0")
+        started = time.perf_counter()
+        for _ in range(10000):
+            sku_index.get("SKU-1")
+        self.assertLess((time.perf_counter() - started) / 10000, 50e-6)
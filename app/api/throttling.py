@@ -0,0 +1,209 @@
+"""
+Per-client rate limits and in-flight caps for the API (ThrottleMiddleware).
+
+Every request under ``/api/`` is charged to a client, the user of a valid
+``Authorization: Token`` header or else the remote address, and to a scope
+picked by the first matching route prefix (``ROUTES``, e.g. reports and
+imports get budgets of their own), ``default`` otherwise. A scope allows::
+
+    rate         tokens added per second to the client's bucket
+    burst        bucket size, the requests a client may send at once
+    concurrency  requests of the client in progress at the same time (None: no cap)
+
+scaled by the client's role in ``ROLE_MULTIPLIERS``. A request is refused
+with 429 when the bucket is empty or the cap is reached.
+
+Counters live in a pluggable store (``STORE``):
+
+* ``CacheStore``, the default, counts in a Django cache with atomic
+  ``add``/``incr`` so workers sharing a cache (Redis, Memcached) share the
+  limits. Buckets are approximated by fixed windows of ``burst / rate``
+  seconds allowing ``burst`` requests each, and in-flight counters expire
+  after ``timeout`` seconds (``STORE_OPTIONS``) should a worker die holding
+  them.
+* ``LocalStore`` keeps exact token buckets and in-flight counts in the
+  process behind one lock, a decision is a dict lookup and a few float
+  operations. Limits apply per worker process, so it suits a single process
+  or development.
+
+The token is verified once per request: ``identify`` keeps the outcome on
+the request for the view's ``SignedTokenAuthentication``.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.utils.module_loading import import_string
+from rest_framework import exceptions
+
+from .authentication import SignedTokenAuthentication
+
+DEFAULTS = {
+    "ENABLED": True,
+    "STORE": "api.throttling.CacheStore",
+    # Keyword arguments of the store class.
+    "STORE_OPTIONS": {},
+    "PATH_PREFIX": "/api/",
+    "SCOPES": {
+        "default": {"rate": 50, "burst": 200, "concurrency": 32},
+    },
+    # Path prefix below PATH_PREFIX -> scope, first match wins.
+    "ROUTES": {},
+    "ROLE_MULTIPLIERS": {},
+}
+
+
+def get_setting(name):
+    return getattr(settings, "API_THROTTLING", {}).get(name, DEFAULTS[name])
+
+
+class LocalStore:
+    """Exact token buckets and in-flight counters held by this process."""
+
+    def __init__(self, max_keys=100000, **options):
+        self.max_keys = max_keys
+        # key -> [tokens, updated], least recently used first
+        self.buckets = OrderedDict()
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Take a token from the bucket of ``key``, return 0 or the seconds until one is available."""
+        now = monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [burst, now]
+                # A dropped bucket comes back full, at worst a client gets one extra burst.
+                if len(self.buckets) > self.max_keys:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / rate
+
+    def acquire(self, key, limit):
+        """Count a request of ``key`` in progress, False when ``limit`` are already."""
+        with self.lock:
+            count = self.in_flight.get(key, 0)
+            if count >= limit:
+                return False
+            self.in_flight[key] = count + 1
+            return True
+
+    def release(self, key):
+        with self.lock:
+            count = self.in_flight.pop(key, 0) - 1
+            if count > 0:
+                self.in_flight[key] = count
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+            self.in_flight.clear()
+
+
+class CacheStore:
+    """Windowed counters in a Django cache, shared by the processes sharing it."""
+
+    def __init__(self, alias="default", timeout=300, **options):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def take(self, key, rate, burst):
+        window = burst / rate
+        now = time.time()
+        slot = int(now // window)
+        key = f"throttle:{key}:{slot}"
+        self.cache.add(key, 0, math.ceil(window) + 1)
+        try:
+            count = self.cache.incr(key)
+        except ValueError:
+            # Expired between add and incr, the window is over anyway.
+            return 0
+        if count <= burst:
+            return 0
+        return (slot + 1) * window - now
+
+    def acquire(self, key, limit):
+        key = f"throttle:{key}:in-flight"
+        self.cache.add(key, 0, self.timeout)
+        try:
+            count = self.cache.incr(key)
+        except ValueError:
+            return True
+        if count > limit:
+            self.release_key(key)
+            return False
+        return True
+
+    def release(self, key):
+        self.release_key(f"throttle:{key}:in-flight")
+
+    def release_key(self, key):
+        try:
+            self.cache.decr(key)
+        except ValueError:
+            pass
+
+
+@lru_cache(maxsize=None)
+def get_store():
+    return import_string(get_setting("STORE"))(**get_setting("STORE_OPTIONS"))
+
+
+def _reset_store(setting, **kwargs):
+    if setting == "API_THROTTLING":
+        get_store.cache_clear()
+
+
+setting_changed.connect(_reset_store)
+
+
+def route_scope(path):
+    """Return the scope name of a request path under PATH_PREFIX."""
+    route = path[len(get_setting("PATH_PREFIX")):]
+    for prefix, scope in get_setting("ROUTES").items():
+        if route.startswith(prefix):
+            return scope
+    return "default"
+
+
+def identify(request):
+    """
+    Return ``(client key, role)`` of a request: the user of a valid token,
+    otherwise the remote address with the role "anonymous".
+    """
+    header = request.META.get("HTTP_AUTHORIZATION", "").split()
+    authenticator = SignedTokenAuthentication()
+    if len(header) == 2 and header[0].lower() == authenticator.keyword.lower():
+        try:
+            user = authenticator.verify_request_token(request, header[1])
+        except exceptions.AuthenticationFailed:
+            pass
+        else:
+            return f"user:{user.pk}", user.role
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}", "anonymous"
+
+
+def get_limits(scope, role):
+    """Return ``(rate, burst, concurrency)`` of ``scope`` for ``role``."""
+    scopes = get_setting("SCOPES")
+    limits = scopes.get(scope) or scopes.get("default") or DEFAULTS["SCOPES"]["default"]
+    factor = get_setting("ROLE_MULTIPLIERS").get(role, 1)
+    concurrency = limits.get("concurrency")
+    return (
+        limits["rate"] * factor,
+        max(1, int(limits["burst"] * factor)),
+        max(1, int(concurrency * factor)) if concurrency is not None else None,
+    )
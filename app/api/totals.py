@@ -0,0 +1,191 @@
+"""
+Verification of the denormalized order totals, customer summaries and
+category tree.
+
+Totals are maintained incrementally (see ``apply_order_deltas``,
+``apply_customer_deltas`` and ``apply_category_deltas``); this module
+recomputes them from the source rows to detect and repair drift, e.g. after
+raw SQL or a crash between an item write and its delta.
+"""
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .models import (
+    ArchivedOrder, Category, Customer, CustomerSummary, Order, OrderItem, Product, ancestor_ids, counted_orders,
+)
+
+
+def expected_totals(quantity, amount, discount_amount=0, shipping_amount=0, vat_rate=None):
+    """Return the totals of an order with these item sums and terms (see Order)."""
+    rate = getattr(settings, "ORDER_VAT_RATE", 0.16) if vat_rate is None else vat_rate
+    taxable = amount - discount_amount
+    return {
+        "total_items": quantity,
+        "sub_total": amount,
+        "vat": taxable * rate,
+        "total_amount": taxable * (1 + rate) + shipping_amount,
+    }
+
+
+TERM_FIELDS = ["discount_amount", "shipping_amount", "vat_rate"]
+
+
+def find_drift(order_ids):
+    """Return ``{order_id: expected_totals}`` for the given orders whose totals drifted."""
+    orders = Order.objects.filter(id__in=order_ids).values_list("id", *TERM_FIELDS, *Order.TOTAL_FIELDS)
+    sums = dict(
+        (order_id, (quantity, amount))
+        for order_id, quantity, amount in OrderItem.objects.filter(order_id__in=order_ids)
+        .order_by().values("order_id")
+        .annotate(quantity=Sum("quantity"), amount=Sum("total_amount"))
+        .values_list("order_id", "quantity", "amount")
+    )
+    drifted = {}
+    for order_id, discount_amount, shipping_amount, vat_rate, *stored in orders:
+        expected = expected_totals(*sums.get(order_id, (0, 0)), discount_amount, shipping_amount, vat_rate)
+        if any(
+            not math.isclose(value, expected[field], abs_tol=0.005)
+            for field, value in zip(Order.TOTAL_FIELDS, stored)
+        ):
+            drifted[order_id] = expected
+    return drifted
+
+
+def verify_order_totals(batch_size=1000, repair=False):
+    """
+    Check every order in batches; yields ``(checked, drifted)`` per batch,
+    repairing drifted orders when ``repair`` is set.
+    """
+    last_id = 0
+    while True:
+        order_ids = list(
+            Order.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return
+        with transaction.atomic():
+            if repair:
+                # Hold the rows so concurrent item deltas apply after the repair.
+                list(Order.objects.filter(id__in=order_ids).select_for_update().values_list("id"))
+            drifted = find_drift(order_ids)
+            if repair and drifted:
+                orders = [Order(id=order_id, **totals) for order_id, totals in drifted.items()]
+                Order.objects.bulk_update(orders, Order.TOTAL_FIELDS)
+        last_id = order_ids[-1]
+        yield len(order_ids), drifted
+
+
+def expected_customer_summaries():
+    """
+    Return ``{customer_id: (order_count, revenue, due)}`` recomputed from the
+    hot and archived sales orders with one grouped query per table.
+    """
+    expected = {}
+    for model in (Order, ArchivedOrder):
+        rows = counted_orders(model.objects.all()).order_by().values("customer_id").annotate(
+            count=Count("pk"), revenue=Sum("total_amount"), due=Sum("due")
+        ).values_list("customer_id", "count", "revenue", "due")
+        for customer_id, count, revenue, due in rows:
+            old = expected.get(customer_id, (0, 0, 0))
+            expected[customer_id] = (old[0] + count, old[1] + revenue, old[2] + due)
+    return expected
+
+
+def verify_customer_summaries(repair=False):
+    """
+    Return ``{customer_id: expected (order_count, revenue, due)}`` for the
+    summaries that drifted, overwriting them when ``repair`` is set.
+    """
+    with transaction.atomic():
+        expected = expected_customer_summaries()
+        if repair:
+            # Hold the summaries so concurrent deltas apply after the repair.
+            list(CustomerSummary.objects.select_for_update().values_list("pk"))
+        stored = {
+            customer_id: (count, revenue, due)
+            for customer_id, count, revenue, due in CustomerSummary.objects.values_list(
+                "customer_id", "order_count", "revenue", "due"
+            )
+        }
+        drifted = {}
+        for customer_id in expected.keys() | stored.keys():
+            want, have = expected.get(customer_id, (0, 0, 0)), stored.get(customer_id, (0, 0, 0))
+            if want[0] != have[0] or want[2] != have[2] or not math.isclose(want[1], have[1], abs_tol=0.005):
+                drifted[customer_id] = want
+        if repair and drifted:
+            # Archived orders may reference customers that were deleted since.
+            existing = set(Customer.objects.filter(pk__in=drifted).values_list("pk", flat=True))
+            CustomerSummary.objects.bulk_create(
+                [
+                    CustomerSummary(customer_id=customer_id, order_count=count, revenue=revenue, due=due)
+                    for customer_id, (count, revenue, due) in drifted.items() if customer_id in existing
+                ],
+                update_conflicts=True,
+                unique_fields=["customer"],
+                update_fields=["order_count", "revenue", "due"],
+            )
+    return drifted
+
+
+def expected_category_tree():
+    """
+    Return ``{category_id: (path, depth, product_count)}`` recomputed from
+    the parent links and one grouped count of the products.
+    """
+    parents = dict(Category.objects.values_list("pk", "parent_id"))
+    paths = {}
+
+    def path_of(category_id):
+        if category_id not in paths:
+            # Iterative, trees can be deeper than the recursion limit.
+            chain = [category_id]
+            while parents[chain[-1]] is not None and parents[chain[-1]] not in paths:
+                chain.append(parents[chain[-1]])
+                if len(chain) > len(parents):
+                    raise ValueError(f"Category {category_id} has a cycle in its parents")
+            for pk in reversed(chain):
+                paths[pk] = paths.get(parents[pk], "") + f"{pk}/"
+        return paths[category_id]
+
+    counts = dict.fromkeys(parents, 0)
+    direct = Product.objects.filter(category__isnull=False).order_by().values("category_id").annotate(
+        count=Count("pk")
+    ).values_list("category_id", "count")
+    for category_id, count in direct:
+        if category_id in parents:
+            for ancestor in ancestor_ids(path_of(category_id)):
+                counts[ancestor] += count
+    return {
+        category_id: (path_of(category_id), path_of(category_id).count("/") - 1, counts[category_id])
+        for category_id in parents
+    }
+
+
+def verify_category_tree(repair=False):
+    """
+    Return ``{category_id: expected (path, depth, product_count)}`` for the
+    categories that drifted, overwriting them when ``repair`` is set.
+    """
+    with transaction.atomic():
+        if repair:
+            # Hold the tree so concurrent moves and deltas apply after the repair.
+            list(Category.objects.select_for_update().values_list("pk"))
+        expected = expected_category_tree()
+        drifted = {
+            category_id: expected[category_id]
+            for category_id, *stored in Category.objects.values_list("pk", "path", "depth", "product_count")
+            if tuple(stored) != expected[category_id]
+        }
+        if repair and drifted:
+            Category.objects.bulk_update(
+                [
+                    Category(pk=category_id, path=path, depth=depth, product_count=count)
+                    for category_id, (path, depth, count) in drifted.items()
+                ],
+                ["path", "depth", "product_count"],
+                batch_size=1000,
+            )
+    return drifted
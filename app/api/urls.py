@@ -1,4 +1,4 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from . import views
 from rest_framework.urlpatterns import format_suffix_patterns
@@ -11,8 +11,11 @@ router.register(r"customers", views.CustomerViewSet)
 router.register(r"warehouses", views.WarehouseViewSet)
 router.register(r"locations", views.LocationViewSet)
 router.register(r"shipments", views.ShippingViewSet)
+router.register(r"shipment-manifests", views.ShipmentManifestViewSet)
 router.register(r"quotations", views.QuotationViewSet)
 router.register(r"suppliers", views.SupplierViewSet)
+router.register(r"tax-types", views.TaxTypeViewSet)
+router.register(r"price-lists", views.PriceListViewSet)
 #router.register(r'stocks', views.StockViewSet)
 router.register(r'categories', views.CategoryViewSet)
 router.register(r'sales-orders', views.SalesOrderViewSet)
@@ -22,16 +25,20 @@ router.register(r'transfer-orders', views.TransferOrderViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
-    path(
-        'suppliers/<int:id>/products/', 
+    re_path(
+        r'^suppliers/(?P<id>[0-9]+)/products/?$',
         views.SupplierProducts.as_view(),
         name="supplier.products"
     ),
+    path('changes/', views.ChangeFeedView.as_view(), name="changes"),
+    path('imports/<str:resource>/', views.ImportView.as_view(), name="imports"),
     path(
-        'suppliers/<int:id>/products', 
-        views.SupplierProducts.as_view(), 
-        name="supplier.products"
+        'reports/receivables-ageing/',
+        views.ReceivablesAgeingView.as_view(),
+        name="reports.receivables_ageing"
     ),
+    path('pricing/quote/', views.PricingQuoteView.as_view(), name="pricing.quote"),
+    path('stock-events/', views.stock_events, name="stock.events"),
     #path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
 ]
 
@@ -1,33 +1,57 @@
+import csv
+import hashlib
 import re
-from django.http import Http404
-from drf_yasg import openapi
-from drf_yasg.utils import swagger_auto_schema
+import time
+import uuid
+import zipfile
+from collections import defaultdict
+from datetime import datetime
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.http import Http404, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import parse_etags, urlencode
 from rest_framework import status, generics, viewsets
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, action
-from .models import User, Customer, CustomerUser, Shipment, Supplier
+from .models import User, Customer, CustomerUser, Shipment, ShipmentManifest, Supplier
 from .serializers import UserSerializer, CustomerSerialiser, CustomerUserSerialiser
 from .models import Product, Warehouse, Order, Location, Quotation, Category
+from .models import ArchivedOrder, PriceList, TaxType, subtree_filter
 from .serializers import ProductSerializer
 from .serializers import WarehouseSerializer
 from .serializers import LocationSerializer, OrderSerialiser, ShipmentSerializer, SupplierSerializer
-from .serializers import QuotationSerializer, CategorySerializer
+from .serializers import ShipmentManifestSerializer
+from .serializers import QuotationSerializer, QuotationItemSerializer, CategorySerializer
+from .serializers import PriceListSerializer, PriceListItemSerializer, TaxTypeSerializer
+from .allocation import allocate_orders
+from .archive import archive_cutoff
+from .authentication import SignedTokenAuthentication
+from .caching import get_version, supplier_catalog
+from .changes import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, TRACKED_MODELS, changes_since
+from .events import Subscription, format_event, get_backend, get_setting, publish_stock_change
+from .fast_serializers import serialize_many
+from .imports import IMPORTERS, read_rows
+from .pagination import KeysetPagination
+from .planning import create_draft_orders, suggest_reorders
+from .pricing import parse_basket, price_basket, set_price_list_items
+from .quotations import convert_quotation, set_quotation_items
+from .reports import ageing_report
+from .scoping import NotCustomerUser, RoleScopedQuerysetMixin, RoleScopedWritesMixin, get_scope
+from .shipments import create_manifest
+from .sku_index import MAX_BATCH_SIZE as MAX_SKU_BATCH, sku_index
+from .stock import apply_warehouse_deltas
 from django.shortcuts import get_object_or_404
 
 
-# The swagger_auto_schema decorator is used to document the API endpoints.
-@swagger_auto_schema(
-    method="get",
-    operation_summary="Lists all products",
-    operation_description="API endpoint that retrieves all products and returns them in JSON "
-    "format.",
-    responses={
-        200: "All products in JSON format",
-        400: "Bad request: Check error message for details",
-        500: "Internal server error: Unexpected error",
-    },
-)
+# Swagger documentation for the function based views lives in api/schema.py,
+# which is only imported by the documentation view.
 @api_view(["GET"])
 def get_products(request):
     """
@@ -51,27 +75,6 @@ def get_products(request):
     except Exception as e:
         return Response({"result": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
-@swagger_auto_schema(
-    method="get",
-    operation_summary="Lists all users or a single user by email",
-    operation_description="API endpoint that retrieves all users or a single user by email and returns them in JSON "
-    "format.",
-    manual_parameters=[
-        openapi.Parameter(
-            "email",
-            openapi.IN_QUERY,
-            description="User is searched by this email and returned if found. Optional, if not "
-            "present, all users are returned.",
-            type=openapi.TYPE_STRING,
-        )
-    ],
-    responses={
-        200: "One or all users in JSON format",
-        400: "Bad request: Check error message for details",
-        404: "If user was requested by email but not found",
-        500: "Internal server error: Unexpected error",
-    },
-)
 @api_view(["GET"])
 def get_users(request):
     """
@@ -138,26 +141,6 @@ def edit_user(request, email=''):
     except ValidationError as e:
         return Response({"result": "error", "message": e.detail}, status=status.HTTP_400_BAD_REQUEST)
 
-@swagger_auto_schema(
-    method="post",
-    operation_summary="Creates new user",
-    operation_description="API endpoint that creates a new user and returns the created user in JSON format.",
-    request_body=openapi.Schema(
-        type=openapi.TYPE_OBJECT,
-        properties={
-            "name": openapi.Schema(type=openapi.TYPE_STRING, description="Name of the user"),
-            "email": openapi.Schema(type=openapi.TYPE_STRING, description="Email of the user"),
-            "username": openapi.Schema(type=openapi.TYPE_STRING, description="Username of the user"),
-            "age": openapi.Schema(type=openapi.TYPE_INTEGER, description="Age of the user"),
-        },
-        required=["name", "email", "age"],
-    ),
-    responses={
-        201: "Return the created user in JSON format",
-        400: "Bad request: Check error message for details",
-        500: "Internal server error: Unexpected error",
-    },
-)
 @api_view(["POST"])
 def add_user(request):
     """
@@ -183,31 +166,6 @@ def add_user(request):
         return Response({"result": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-@swagger_auto_schema(
-    method="put",
-    operation_summary="Updates existing user",
-    operation_description="API endpoint that updates an existing users name and age by provided email and returns "
-    "updated user in JSON format.",
-    request_body=openapi.Schema(
-        type=openapi.TYPE_OBJECT,
-        properties={
-            "name": openapi.Schema(type=openapi.TYPE_STRING, description="Update the name of the user"),
-            "age": openapi.Schema(type=openapi.TYPE_INTEGER, description="Update the age of the user"),
-        },
-        required=["name", "age"],
-    ),
-    manual_parameters=[
-        openapi.Parameter(
-            "email", openapi.IN_QUERY, description="Email of the user to update", type=openapi.TYPE_STRING
-        )
-    ],
-    responses={
-        200: "Return the created user in JSON format",
-        400: "Bad request: Check error message for details",
-        404: "No user found with the provided email address",
-        500: "Internal server error: Unexpected error",
-    },
-)
 @api_view(["PUT"])
 def update_user(request):
     """
@@ -254,22 +212,6 @@ def update_user(request):
         return Response({"result": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-@swagger_auto_schema(
-    method="delete",
-    operation_summary="Deletes existing user",
-    operation_description="API endpoint that deletes an existing user record by email",
-    manual_parameters=[
-        openapi.Parameter(
-            "email", openapi.IN_QUERY, description="Email of the user to be deleted", type=openapi.TYPE_STRING
-        )
-    ],
-    responses={
-        204: "Success: User deleted",
-        400: "Bad request: Check error message for details",
-        404: "No user found with the provided email address",
-        500: "Internal server error: Unexpected error",
-    },
-)
 @api_view(["DELETE"])
 def delete_user(request):
     """
@@ -309,43 +251,227 @@ class UserViewSet(viewsets.ModelViewSet):
 class ProductViewSet(viewsets.ModelViewSet): 
     queryset = Product.objects.all()
     serializer_class = ProductSerializer  
+    read_replica = True
 
     def list(self, request):
-        products = Product.objects.all()
-        serializer = ProductSerializer(products, many=True)
+        data = serialize_many(ProductSerializer, Product.objects.all())
         return Response(
             {
                 "result": "success", 
-                "data": serializer.data,
-                "total": len(serializer.data)
+                "data": data,
+                "total": len(data)
             }, 
             status=status.HTTP_201_CREATED
         )
 
-class CustomerViewSet(viewsets.ModelViewSet): 
+    @action(detail=False, methods=["get"], url_path=r"by-sku/(?P<sku>[^/]+)")
+    def by_sku(self, request, sku=None):
+        """Product with the scanned SKU, from the in-process SKU index."""
+        product = sku_index.get(sku)
+        if product is None:
+            return Response({"result": "error", "message": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"result": "success", "data": product}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"], url_path="by-sku")
+    def by_skus(self, request):
+        """
+        Look up a batch of scans, {"skus": [...]}. "data" maps every SKU to its
+        product, or null when there is none; "missing" lists those SKUs.
+        """
+        skus = request.data.get("skus") if isinstance(request.data, dict) else None
+        if not isinstance(skus, list) or not all(isinstance(sku, str) for sku in skus):
+            raise ValidationError({"skus": ["Expected a list of SKUs."]})
+        if len(skus) > MAX_SKU_BATCH:
+            raise ValidationError({"skus": [f"At most {MAX_SKU_BATCH} SKUs per request."]})
+        data = sku_index.get_many(skus)
+        return Response(
+            {
+                "result": "success",
+                "data": data,
+                "missing": [sku for sku, product in data.items() if product is None],
+                "total": len(data)
+            },
+            status=status.HTTP_200_OK
+        )
+
+class CustomerViewSet(RoleScopedQuerysetMixin, viewsets.ModelViewSet): 
     queryset = Customer.objects.all()
     serializer_class = CustomerSerialiser    
+    read_replica = True
+    role_scopes = {"customer": "pk"}
+    order_pagination = KeysetPagination(ordering_fields=("order_date",), default_ordering="-order_date")
+
+    @action(detail=True)
+    def orders(self, request, pk=None):
+        """
+        Sales orders of the customer, newest first, keyset paginated on
+        (order_date, id). ?archived=true pages the archived orders instead,
+        ?status= filters. The lifetime totals come from the maintained
+        CustomerSummary in the same query that checks the customer exists.
+        """
+        customer = self.get_queryset().filter(pk=pk).values(
+            'summary__order_count', 'summary__revenue', 'summary__due'
+        ).first() if str(pk).isdigit() else None
+        if customer is None:
+            return Response({"result": "error", "message": "Customer not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        model = ArchivedOrder if request.query_params.get("archived") in ("1", "true") else Order
+        orders = model.objects.filter(customer_id=pk, order_type=Order.OrderType.SALE_ORDER)
+        if request.query_params.get("status"):
+            orders = orders.filter(order_status=request.query_params["status"])
+        page, size, ordering = self.order_pagination.paginate(request, orders)
+        data, next_url = self.order_pagination.get_next(request, serialize_many(OrderSerialiser, page), size, ordering)
+        return Response(
+            {
+                "result": "success",
+                "summary": {
+                    "order_count": customer["summary__order_count"] or 0,
+                    "revenue": round(customer["summary__revenue"] or 0, 2),
+                    "due": customer["summary__due"] or 0,
+                },
+                "data": data,
+                "total": len(data),
+                "next": next_url,
+            },
+            status=status.HTTP_200_OK
+        )
 
 class OrderViewSet(viewsets.ModelViewSet):  
     queryset = Order.objects.all()
     serializer_class = OrderSerialiser
 
 
-class WarehouseViewSet(viewsets.ModelViewSet):  
-    queryset = Warehouse.objects.all()
+class WarehouseViewSet(RoleScopedQuerysetMixin, viewsets.ModelViewSet):  
+    queryset = Warehouse.objects.prefetch_related('warehouse_products')
     serializer_class = WarehouseSerializer
+    read_replica = True
+    role_scopes = {"staff": "pk"}
+
+    @action(detail=False)
+    def utilization(self, request):
+        """
+        Capacity utilization of every warehouse, read from the maintained
+        occupancy counters in a single query. A capacity of 0 is unlimited.
+        """
+        warehouses = self.scope_queryset(Warehouse.objects.all()).order_by('id').values('id', 'name', 'capacity', 'occupancy')
+        data = [
+            {
+                **warehouse,
+                "available": warehouse["capacity"] - warehouse["occupancy"] if warehouse["capacity"] else None,
+                "utilization": (
+                    round(warehouse["occupancy"] / warehouse["capacity"], 4) if warehouse["capacity"] else None
+                ),
+            }
+            for warehouse in warehouses
+        ]
+        return Response({"result": "success", "data": data, "total": len(data)})
 
 class LocationViewSet(viewsets.ModelViewSet):  
     queryset = Location.objects.all()
     serializer_class = LocationSerializer
 
-class ShippingViewSet(viewsets.ModelViewSet):  
+class ShippingViewSet(RoleScopedQuerysetMixin, viewsets.ModelViewSet):  
     queryset = Shipment.objects.all()
     serializer_class = ShipmentSerializer
+    role_scopes = {
+        "customer": ("order__customer_id", "archived_order__customer_id"),
+        "staff": "warehouse_id",
+    }
 
-class QuotationViewSet(viewsets.ModelViewSet):  
+class ShipmentManifestViewSet(RoleScopedQuerysetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Batches of shipment lines for one warehouse. POST takes the manifest
+    fields plus "items", a list of {"product", "quantity"}, and moves the
+    stock of all lines at once; manifests cannot be changed afterwards.
+    """
+    queryset = ShipmentManifest.objects.all()
+    serializer_class = ShipmentManifestSerializer
+    role_scopes = {
+        "customer": ("order__customer_id", "archived_order__customer_id"),
+        "staff": "warehouse_id",
+    }
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            manifest = create_manifest(request.data.get("items"), **serializer.validated_data)
+        except ValueError as e:
+            return Response({"result": "error", "message": str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response({"result": "success", "data": self.get_serializer(manifest).data}, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=["get"])
+    def items(self, request, pk=None):
+        """List the manifest's lines."""
+        manifest = self.get_object()
+        data = list(manifest.shipments.order_by("pk").values("id", "product", "quantity"))
+        return Response(
+            {"result": "success", "manifest": self.get_serializer(manifest).data, "data": data, "total": len(data)},
+            status=status.HTTP_200_OK
+        )
+
+class QuotationViewSet(RoleScopedWritesMixin, viewsets.ModelViewSet):  
     queryset = Quotation.objects.all()
     serializer_class = QuotationSerializer
+    role_scopes = {"customer": "customer_id"}
+
+    @action(detail=True, methods=["get", "put"])
+    def items(self, request, pk=None):
+        """
+        GET lists the quotation's lines. PUT replaces them all with a list of
+        {"product", "quantity", "unitcost"} (unitcost defaults to the
+        product's selling price) and recalculates the quotation totals.
+        """
+        quotation = self.get_object()
+        if request.method == "PUT":
+            try:
+                quotation = set_quotation_items(quotation, request.data)
+            except ValueError as e:
+                return Response({"result": "error", "message": str(e)}, status=status.HTTP_409_CONFLICT)
+        data = serialize_many(QuotationItemSerializer, quotation.items.order_by('pk'))
+        return Response(
+            {
+                "result": "success",
+                "quotation": self.get_serializer(quotation).data,
+                "data": data,
+                "total": len(data)
+            },
+            status=status.HTTP_200_OK
+        )
+
+    @action(detail=True, methods=["post"])
+    def convert(self, request, pk=None):
+        """
+        Convert an approved quotation into a pending sales order at the quoted
+        prices, reserving the stock of every line in the same transaction.
+        """
+        quotation = self.get_object()
+        try:
+            order = convert_quotation(quotation.pk)
+        except ValueError as e:
+            return Response({"result": "error", "message": str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response({"result": "success", "data": OrderSerialiser(order).data}, status=status.HTTP_201_CREATED)
+
+class TaxTypeViewSet(viewsets.ModelViewSet):
+    queryset = TaxType.objects.all()
+    serializer_class = TaxTypeSerializer
+
+class PriceListViewSet(viewsets.ModelViewSet):
+    queryset = PriceList.objects.all()
+    serializer_class = PriceListSerializer
+
+    @action(detail=True, methods=["get", "put"])
+    def items(self, request, pk=None):
+        """
+        GET lists the price list's prices. PUT replaces them all with a list
+        of {"product", "unit_price", "min_quantity"} (min_quantity, the
+        quantity break, defaults to 1).
+        """
+        price_list = self.get_object()
+        if request.method == "PUT":
+            price_list = set_price_list_items(price_list, request.data)
+        data = serialize_many(PriceListItemSerializer, price_list.items.order_by('product_id', 'min_quantity'))
+        return Response({"result": "success", "data": data, "total": len(data)}, status=status.HTTP_200_OK)
 
 class SupplierViewSet(viewsets.ModelViewSet):
     queryset = Supplier.objects.all()
@@ -390,41 +516,199 @@ class OrderList(generics.ListAPIView):
     queryset = Order.objects.all()
     serializer_class = OrderSerialiser
 
-class PurchaseOrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.filter(order_type='purchase_order')
-    serializer_class = OrderSerialiser
+class OrderPartitionMixin:
+    """
+    Order ViewSets read recent orders from the hot table. When the requested
+    range reaches past the archive cutoff (?order_date_after=<date> older than
+    ORDER_ARCHIVE_AFTER_DAYS) or ?archived=true is passed, archived orders are
+    read as well; archived orders can also be retrieved by id.
+    """
+    order_type = None
+
+    def get_date_range(self):
+        bounds = []
+        for param in ("order_date_after", "order_date_before"):
+            value = self.request.query_params.get(param)
+            if not value:
+                bounds.append(None)
+                continue
+            parsed = parse_datetime(value) or parse_date(value)
+            if parsed is None:
+                raise ValidationError({param: "Expected an ISO 8601 date or datetime"})
+            if not isinstance(parsed, datetime):
+                parsed = datetime.combine(parsed, datetime.min.time())
+            bounds.append(parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed))
+        return bounds
+
+    def filter_orders(self, queryset):
+        after, before = self.get_date_range()
+        queryset = queryset.filter(order_type=self.order_type)
+        if after:
+            queryset = queryset.filter(order_date__gte=after)
+        if before:
+            queryset = queryset.filter(order_date__lt=before)
+        return queryset
+
+    def includes_archive(self):
+        if self.request.query_params.get("archived") in ("1", "true"):
+            return True
+        after, _ = self.get_date_range()
+        return after is not None and after < archive_cutoff()
+
+    def get_queryset(self):
+        return self.filter_orders(Order.objects.all())
+
+    def scope_queryset(self, queryset):
+        # Overridden by RoleScopedQuerysetMixin, also applied to the archive.
+        return queryset
+
+    def perform_create(self, serializer):
+        serializer.save(order_type=self.order_type)
 
     def list(self, request):
-        orders = Order.objects.all()
-        serializer = OrderSerialiser(orders, many=True)
+        serializer_class, context = self.get_serializer_class(), self.get_serializer_context()
+        data = serialize_many(serializer_class, self.get_queryset(), context)
+        if self.includes_archive():
+            archived = self.scope_queryset(self.filter_orders(ArchivedOrder.objects.all()))
+            # Old open orders stay hot, so the two tables overlap in time.
+            data = sorted(
+                data + serialize_many(serializer_class, archived, context),
+                key=lambda order: (parse_datetime(order["order_date"]), order["id"])
+            )
         return Response(
             {
                 "result": "success", 
-                "data": serializer.data,
-                "total": len(serializer.data)
+                "data": data,
+                "total": len(data)
             }, 
             status=status.HTTP_201_CREATED
         )
 
-class SalesOrderViewSet(viewsets.ModelViewSet):
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            instance = self.get_object()
+        except Http404:
+            instance = get_object_or_404(
+                self.scope_queryset(ArchivedOrder.objects.filter(order_type=self.order_type)),
+                pk=self.kwargs[self.lookup_field]
+            )
+        return Response(self.get_serializer(instance).data)
+
+class PurchaseOrderViewSet(RoleScopedWritesMixin, OrderPartitionMixin, viewsets.ModelViewSet):
+    queryset = Order.objects.filter(order_type='purchase_order')
+    serializer_class = OrderSerialiser
+    read_replica = True
+    order_type = Order.OrderType.PURCHASE_ORDER
+    role_scopes = {"customer": None}
+
+    @action(detail=False, methods=["post"])
+    def plan(self, request):
+        """
+        Compute reorder suggestions (optionally for "suppliers") and create a
+        draft purchase order per supplier unless "dry_run" is true.
+        """
+        suppliers = request.data.get("suppliers") or []
+        if not isinstance(suppliers, list) or not all(isinstance(value, int) for value in suppliers):
+            raise ValidationError({"suppliers": "Expected a list of integer ids"})
+        suggestions = suggest_reorders(suppliers)
+        orders = [] if request.data.get("dry_run") else create_draft_orders(suggestions)
+        return Response({
+            "result": "success",
+            "data": [suggestion.as_dict() for suggestion in suggestions],
+            "orders": self.get_serializer(orders, many=True).data,
+            "total": len(suggestions),
+        })
+
+class SalesOrderViewSet(RoleScopedWritesMixin, OrderPartitionMixin, viewsets.ModelViewSet):
     queryset = Order.objects.filter(order_type='sale_order')
     serializer_class = OrderSerialiser 
-
-    def list(self, request):
-        orders = Order.objects.all()
-        serializer = ProductSerializer(orders, many=True)
-        return Response(
-            {
-                "result": "success", 
-                "data": serializer.data,
-                "total": len(serializer.data)
-            }, 
-            status=status.HTTP_201_CREATED
-        )
-
-class TransferOrderViewSet(viewsets.ModelViewSet):   
+    read_replica = True
+    order_type = Order.OrderType.SALE_ORDER
+    role_scopes = {"customer": "customer_id"}
+
+    def get_ids(self, name):
+        values = self.request.data.get(name) or []
+        if not isinstance(values, list) or not all(isinstance(value, int) for value in values):
+            raise ValidationError({name: "Expected a list of integer ids"})
+        return values
+
+    def allocation_response(self, order_ids, requested=None):
+        """
+        Allocate pending, unshipped orders across warehouses, preferring those
+        at the locations listed in "locations" (see api/allocation.py).
+        Requested orders that are not allocated are reported as skipped.
+        """
+        try:
+            allocations = allocate_orders(order_ids, self.get_ids("locations"))
+        except ValueError as e:
+            return Response({"result": "error", "message": str(e)}, status=status.HTTP_409_CONFLICT)
+        planned = {allocation.order_id for allocation in allocations}
+        return Response({
+            "result": "success",
+            "data": [allocation.as_dict() for allocation in allocations],
+            "skipped": [order_id for order_id in (requested or order_ids) if order_id not in planned],
+            "total": len(allocations),
+        })
+
+    @action(detail=True, methods=["post"])
+    def allocate(self, request, pk=None):
+        return self.allocation_response([self.get_object().pk])
+
+    @action(detail=False, methods=["post"], url_path="allocate")
+    def allocate_batch(self, request):
+        order_ids = self.get_ids("orders")
+        if not order_ids:
+            raise ValidationError({"orders": "This field is required."})
+        visible = set(self.get_queryset().filter(pk__in=order_ids).values_list('pk', flat=True))
+        return self.allocation_response([order_id for order_id in order_ids if order_id in visible], order_ids)
+
+class TransferOrderViewSet(RoleScopedWritesMixin, OrderPartitionMixin, viewsets.ModelViewSet):   
     queryset = Order.objects.filter(order_type='transfer_order')
     serializer_class = OrderSerialiser
+    read_replica = True
+    order_type = Order.OrderType.TRANSFER_ORDER
+    role_scopes = {"customer": None, "staff": ("from_warehouse_id", "to_warehouse_id")}
+
+    @action(detail=True, methods=["post"])
+    def transfer(self, request, pk=None):
+        """
+        Move the order's items from from_warehouse to to_warehouse in one
+        stock movement (checked against stock and the destination's
+        capacity) and complete the order.
+        """
+        order = self.get_object()
+        try:
+            with transaction.atomic():
+                # Checked on the locked row: a concurrent transfer of the same
+                # order waits here and then finds it completed.
+                order = Order.objects.select_for_update().get(pk=order.pk)
+                deltas = self.transfer_deltas(order)
+                stock = apply_warehouse_deltas(deltas)
+                Order.objects.filter(pk=order.pk).update(order_status=Order.OrderStatus.COMPLETED)
+        except ValueError as e:
+            return Response({"result": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        for (warehouse_id, product_id), quantity in stock.items():
+            publish_stock_change(product_id, quantity, deltas[(warehouse_id, product_id)], warehouse_id)
+        order.refresh_from_db()
+        return Response({"result": "success", "data": self.get_serializer(order).data})
+
+    @staticmethod
+    def transfer_deltas(order):
+        """Return the stock movement of a transfer order, raise ValueError when it cannot move."""
+        if order.order_status in (Order.OrderStatus.COMPLETED, Order.OrderStatus.CANCELLED):
+            raise ValueError(f"Transfer order is already {order.order_status}")
+        if not order.from_warehouse_id or not order.to_warehouse_id:
+            raise ValueError("Transfer order needs both from_warehouse and to_warehouse")
+        if order.from_warehouse_id == order.to_warehouse_id:
+            raise ValueError("Transfer order must move stock between two warehouses")
+        deltas = defaultdict(int)
+        for product_id, quantity in order.orderItems.values_list('product_id', 'quantity'):
+            deltas[(order.from_warehouse_id, product_id)] -= quantity
+            deltas[(order.to_warehouse_id, product_id)] += quantity
+        if not deltas:
+            raise ValueError("Transfer order has no items")
+        return deltas
 
 class ShippingList(generics.ListAPIView):
     queryset = Shipment.objects.all()
@@ -445,39 +729,345 @@ class SupplierList(generics.ListAPIView):
 class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    product_pagination = KeysetPagination(
+        ordering_fields=("sku", "name", "stock", "price", "updated_at"), default_ordering="sku"
+    )
+
+    def get_queryset(self):
+        """?parent=<id> lists the children of a category, ?parent=root the top level."""
+        categories = super().get_queryset()
+        parent = self.request.query_params.get('parent')
+        if parent == 'root':
+            categories = categories.filter(parent__isnull=True)
+        elif parent is not None:
+            if not parent.isdigit():
+                raise ValidationError({"parent": ["Must be a category id or root"]})
+            categories = categories.filter(parent_id=parent)
+        return categories.order_by('path')
+
+    def perform_create(self, serializer):
+        self.save_placed(serializer)
+
+    def perform_update(self, serializer):
+        self.save_placed(serializer)
+
+    @staticmethod
+    def save_placed(serializer):
+        try:
+            serializer.save()
+        except ValueError as e:
+            raise ValidationError({"parent": [str(e)]})
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # Locked, products cannot be added to the category until it is gone.
+            instance = Category.objects.select_for_update().get(pk=instance.pk)
+            if instance.children.exists():
+                raise ValidationError({"parent": ["Move or delete the subcategories first"]})
+            # Product.category does not cascade.
+            if instance.product_count or instance.products.exists():
+                raise ValidationError({"products": ["Move or delete the category's products first"]})
+            super().perform_destroy(instance)
+
+    @action(detail=True)
+    def products(self, request, pk=None):
+        """
+        Products of the category and all of its descendants, keyset paginated
+        like /api/suppliers/<id>/products/. The subtree is one range scan of
+        the category path index joined to the products.
+        """
+        category = Category.objects.filter(pk=pk).values(
+            'id', 'name', 'path', 'depth', 'product_count'
+        ).first() if str(pk).isdigit() else None
+        if category is None:
+            return Response({"result": "error", "message": "Category not found"}, status=status.HTTP_404_NOT_FOUND)
+        page, size, ordering = self.product_pagination.paginate(
+            request, Product.objects.filter(**subtree_filter(category['path']))
+        )
+        data, next_url = self.product_pagination.get_next(
+            request, serialize_many(ProductSerializer, page), size, ordering
+        )
+        return Response(
+            {
+                "result": "success",
+                "category": category,
+                "data": data,
+                "total": len(data),
+                "next": next_url,
+            },
+            status=status.HTTP_200_OK
+        )
 
 class SupplierProducts(generics.ListAPIView):
+    """
+    Products of one supplier, keyset paginated.
+
+    GET /api/suppliers/<id>/products/?search=&status=&category=&low_stock=true
+    &ordering=-stock&page_size=100&cursor=<next cursor>
+
+    The supplier aggregates (SKU count, units and value in stock) come from
+    the same query that checks the supplier exists. Pages (rows and the next
+    cursor) are cached under the supplier's catalog version, which product
+    saves and deletes bump; invalidation reaches other worker processes only
+    through a shared default cache (see CACHES in settings.py).
+    """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    read_replica = True
+    pagination = KeysetPagination(
+        ordering_fields=("sku", "name", "stock", "price", "updated_at"), default_ordering="sku"
+    )
 
     def get(self, request, *args, **kwargs):
         supplier_id = self.kwargs.get('id')
-        products = Product.objects.filter(supplier=supplier_id)
-        serializer = ProductSerializer(products, many=True)
+        params = urlencode(sorted(request.query_params.lists()), doseq=True)
+        digest = hashlib.md5(f"{request.accepted_renderer.format}?{params}".encode()).hexdigest()
+        version = get_version(supplier_catalog(supplier_id))
+        etag = f'"{version}-{digest}"'
+        # Weak comparison: the compression middleware weakens the ETag.
+        if etag in (tag.removeprefix("W/") for tag in parse_etags(request.headers.get("If-None-Match", ""))):
+            return HttpResponseNotModified(headers={"ETag": etag})
+
+        cache_key = f"{supplier_catalog(supplier_id)}:{version}:{digest}"
+        payload = cache.get(cache_key)
+        if payload is None:
+            supplier = Supplier.objects.filter(pk=supplier_id).annotate(
+                sku_count=Count('products'),
+                stock_units=Coalesce(Sum('products__stock'), 0),
+                stock_value=Coalesce(Sum(F('products__stock') * F('products__price')), 0),
+            ).values('id', 'name', 'sku_count', 'stock_units', 'stock_value').first()
+            if supplier is None:
+                return Response(
+                    {"result": "error", "message": "Supplier not found"}, status=status.HTTP_404_NOT_FOUND
+                )
+            page, size, ordering = self.pagination.paginate(
+                request, self.filter_products(Product.objects.filter(supplier_id=supplier_id))
+            )
+            data, cursor = self.pagination.get_next_cursor(serialize_many(ProductSerializer, page), size, ordering)
+            payload = {"supplier": supplier, "data": data, "cursor": cursor}
+            cache.set(cache_key, payload, settings.SUPPLIER_PRODUCTS_CACHE_TIMEOUT)
+        # The next URL is built per request, the cached page is shared by every host name.
+        return Response({
+            "result": "success",
+            "supplier": payload["supplier"],
+            "data": payload["data"],
+            "total": len(payload["data"]),
+            "next": self.pagination.get_next_url(request, payload["cursor"]),
+        }, status=status.HTTP_200_OK, headers={"ETag": etag})
+
+    def filter_products(self, products):
+        params = self.request.query_params
+        if params.get('search'):
+            products = products.filter(Q(name__icontains=params['search']) | Q(sku__icontains=params['search']))
+        if params.get('status'):
+            products = products.filter(status=params['status'])
+        if params.get('category'):
+            if not params['category'].isdigit():
+                raise ValidationError({"category": ["Must be a category id"]})
+            # The category and its descendants.
+            path = Category.objects.filter(pk=params['category']).values_list('path', flat=True).first()
+            products = products.filter(**subtree_filter(path)) if path is not None else products.none()
+        if params.get('low_stock') in ('1', 'true'):
+            products = products.filter(stock__lte=F('min_stock'))
+        return products
+
+
+class ChangeFeedView(generics.GenericAPIView):
+    """
+    Delta sync feed for products, customers and warehouses.
+
+    GET /api/changes/?since=<token>[&limit=<n>][&models=product,customer]
+    returns upserts and deletes after ``since`` in commit order. Clients store
+    the returned ``next`` token and pass it on the following call until
+    ``has_more`` is false. Not available to customer users, the feed covers
+    every customer.
+    """
+    permission_classes = [NotCustomerUser]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            since = int(request.query_params.get("since", 0))
+            limit = int(request.query_params.get("limit", DEFAULT_PAGE_SIZE))
+            if since < 0 or limit < 1:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {"result": "error", "message": "since and limit must be non-negative integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        models = None
+        if request.query_params.get("models"):
+            models = request.query_params["models"].split(",")
+            unknown = set(models) - set(TRACKED_MODELS)
+            if unknown:
+                return Response(
+                    {"result": "error", "message": f"Unknown models: {', '.join(sorted(unknown))}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        events, next_token, has_more = changes_since(since, min(limit, MAX_PAGE_SIZE), models)
         return Response(
             {
-                "result": "success", 
-                "data": serializer.data,
-                "total": len(serializer.data)
-            }, 
+                "result": "success",
+                "data": events,
+                "next": next_token,
+                "has_more": has_more
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class ImportView(generics.GenericAPIView):
+    """
+    Bulk import of products or customers.
+
+    POST /api/imports/<products|customers>/ with a multipart "file" (.csv or
+    .xlsx, a header row of serializer field names) imports the valid rows in
+    batches and reports the failed ones by line; ?dry_run=true only
+    validates. Large files are better loaded with `manage.py import_records`.
+    """
+
+    def post(self, request, resource, *args, **kwargs):
+        if resource not in IMPORTERS:
+            return Response(
+                {"result": "error", "message": f"Unknown import '{resource}'"}, status=status.HTTP_404_NOT_FOUND
+            )
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"result": "error", "message": "file is required"}, status=status.HTTP_400_BAD_REQUEST)
+        importer = IMPORTERS[resource](dry_run=request.query_params.get("dry_run") in ("1", "true"))
+        try:
+            result = importer.run(read_rows(upload.file, upload.name))
+        except (ValueError, csv.Error, zipfile.BadZipFile) as e:
+            return Response({"result": "error", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"result": "success", "data": result.as_dict()}, status=status.HTTP_200_OK)
+
+
+class ReceivablesAgeingView(generics.GenericAPIView):
+    """
+    Accounts-receivable ageing per customer.
+
+    GET /api/reports/receivables-ageing/[?customer=<id>][&refresh=true]
+    returns outstanding sales order balances bucketed by days past due
+    (current, 1-30, 31-60, 61-90, 90+ by default), largest balances first,
+    with the bucket totals. Served from the daily snapshot in api/reports.py;
+    refresh=true rebuilds it. Not available to customer users.
+    """
+    permission_classes = [NotCustomerUser]
+
+    def get(self, request, *args, **kwargs):
+        customer = request.query_params.get("customer")
+        if customer is not None and not customer.isdigit():
+            return Response(
+                {"result": "error", "message": "customer must be an integer id"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        as_of, rows, totals = ageing_report(
+            customer=int(customer) if customer is not None else None,
+            refresh=request.query_params.get("refresh") in ("1", "true"),
+        )
+        return Response(
+            {
+                "result": "success",
+                "as_of": as_of,
+                "data": rows,
+                "totals": totals,
+                "total": len(rows)
+            },
             status=status.HTTP_200_OK
         )
 
-    # def get_products(self, request, *args, **kwargs):
-    #     print(self.kwargs)
-    #     exit()
-    #     supplier_id = self.kwargs.get('id')
-    #     products = Product.objects.filter(supplier=supplier_id)
-    #     serializer = ProductSerializer(products, many=True)
-    #     return Response(
-    #         {
-    #             "result": "success", 
-    #             "data": serializer.data,
-    #             "total": len(serializer.data)
-    #         }, 
-    #         status=status.HTTP_201_CREATED
-    #     )
-
-    # def get_queryset(self):
-    #     supplier_id = self.kwargs.get('id')
-    #     return Product.objects.filter(supplier=supplier_id)
\ No newline at end of file
+
+class PricingQuoteView(generics.GenericAPIView):
+    """
+    Price a basket with the customer's price lists and the products' tax rules.
+
+    POST /api/pricing/quote/ {"customer": <id>, "items": [{"product", "quantity"}]}
+    returns one row per line (unit price, the price list it came from, net,
+    tax and total) and the basket totals. Without customer the default
+    prices apply; customer users may only price for their own customers.
+    See api/pricing.py.
+    """
+
+    def post(self, request, *args, **kwargs):
+        customer = request.data.get("customer")
+        if customer is not None and (
+            isinstance(customer, bool) or not str(customer).isdigit()
+            or not Customer.objects.filter(pk=int(customer)).exists()
+        ):
+            return Response(
+                {"result": "error", "message": "customer must be the id of an existing customer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        scope = get_scope(request)
+        if customer is not None and scope.role == "customer" and int(customer) not in scope.customer_ids:
+            return Response(
+                {"result": "error", "message": "customer must be one of your customers"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        lines = parse_basket(request.data.get("items"))
+        rows, totals = price_basket(lines, int(customer) if customer is not None else None)
+        return Response(
+            {
+                "result": "success",
+                "data": rows,
+                "totals": totals,
+                "total": len(rows)
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+async def stock_events(request):
+    """
+    Server-Sent Events stream of stock level changes.
+
+    GET /api/stock-events/?products=<uuid>,<uuid>&warehouses=<id>,<id>
+    Both filters are optional; without them every stock change is pushed.
+    Served through asgi.py, one connection replaces polling /api/products/.
+    The stream ends after STOCK_EVENTS["MAX_AGE"] seconds and EventSource
+    clients reconnect automatically.
+    Callers authenticate with a signed API token (``Authorization: Token <token>``),
+    anything else is refused with 401 before the stream opens.
+    """
+    authenticator = SignedTokenAuthentication()
+    try:
+        authenticated = await sync_to_async(authenticator.authenticate)(request)
+    except AuthenticationFailed as e:
+        authenticated, message = None, str(e.detail)
+    else:
+        message = "Authentication credentials were not provided."
+    if authenticated is None:
+        response = JsonResponse({"result": "error", "message": message}, status=status.HTTP_401_UNAUTHORIZED)
+        response["WWW-Authenticate"] = authenticator.authenticate_header(request)
+        return response
+
+    try:
+        products = [str(uuid.UUID(value)) for value in request.GET.get("products", "").split(",") if value]
+        warehouses = [int(value) for value in request.GET.get("warehouses", "").split(",") if value]
+    except ValueError:
+        return JsonResponse(
+            {"result": "error", "message": "products must be UUIDs and warehouses integers"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    backend = get_backend()
+    subscription = Subscription(products, warehouses)
+    backend.subscribe(subscription)
+    heartbeat = get_setting("HEARTBEAT")
+    deadline = time.monotonic() + get_setting("MAX_AGE")
+
+    async def stream():
+        try:
+            yield b"retry: 3000\n\n"
+            while time.monotonic() < deadline:
+                event = await subscription.get(timeout=heartbeat)
+                yield format_event(event) if event is not None else b": keepalive\n\n"
+        finally:
+            backend.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django-rest-api.settings")
 
 application = get_asgi_application()
+
+# Scanner lookups are served from memory from the first request on.
+from api.sku_index import warm_sku_index  # noqa: E402 - needs the app registry
+
+warm_sku_index()
@@ -75,9 +75,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "api.middleware.ThrottleMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "api.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "api.db_routers.ReplicaRoutingMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
@@ -118,6 +121,45 @@ DATABASES = {
     }
 }
 
+# Read replicas
+# 'SQL_REPLICA_HOSTS' is a space separated list of replica hosts sharing the primary's
+# credentials; each becomes a 'replica_<n>' alias. Safe-method reads of views with
+# read_replica = True go to a replica unless the client wrote within REPLICA_PIN_SECONDS.
+
+REPLICA_DATABASES = []
+for index, host in enumerate(environ.get("SQL_REPLICA_HOSTS", "").split(), start=1):
+    DATABASES[f"replica_{index}"] = {**DATABASES["default"], "HOST": host}
+    REPLICA_DATABASES.append(f"replica_{index}")
+
+DATABASE_ROUTERS = ["api.db_routers.ReplicaRouter"]
+REPLICA_PIN_COOKIE = "db_pin"
+REPLICA_PIN_SECONDS = int(environ.get("REPLICA_PIN_SECONDS", 5))
+
+# Test harness: a second SQLite file stands in for a replica. Routing stays off
+# (REPLICA_DATABASES is empty) unless a test enables it for the "replica" alias.
+TESTING = len(sys.argv) > 1 and sys.argv[1] == "test"
+if TESTING and DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    DATABASES["default"]["TEST"] = {"NAME": BASE_DIR / "test_primary.sqlite3"}
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "replica.sqlite3",
+        "TEST": {"NAME": BASE_DIR / "test_replica.sqlite3"},
+    }
+
+# Cache
+# Supplier product pages, price books and token revocations are invalidated
+# through the default cache, so every worker process must share it: set
+# CACHE_BACKEND (e.g. django.core.cache.backends.redis.RedisCache) and
+# CACHE_LOCATION when running more than one process. The local memory default
+# suits a single process and the tests; `manage.py check --deploy` warns about it.
+
+CACHES = {
+    "default": {
+        "BACKEND": environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": environ.get("CACHE_LOCATION", ""),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -159,6 +201,143 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, "static"),)
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# VAT rate applied to the order totals maintained from their items.
+ORDER_VAT_RATE = float(environ.get("ORDER_VAT_RATE", 0.16))
+
+# Reorder planning (api/planning.py, `python manage.py plan_reorders`): products
+# are reordered when stock plus open purchase orders falls to min_stock plus the
+# sales expected over the supplier lead time, up to COVER_DAYS of further sales.
+REORDER_PLANNING = {
+    "SALES_WINDOW_DAYS": int(environ.get("REORDER_SALES_WINDOW_DAYS", 30)),
+    "LEAD_TIME_DAYS": int(environ.get("REORDER_LEAD_TIME_DAYS", 7)),
+    "COVER_DAYS": int(environ.get("REORDER_COVER_DAYS", 14)),
+}
+
+# Pages of /api/suppliers/<id>/products/ are cached for this many seconds
+# (default cache, shared between processes, see CACHES). Product saves and
+# deletes invalidate a supplier's pages immediately; bulk stock movements show
+# up once the entry expires.
+SUPPLIER_PRODUCTS_CACHE_TIMEOUT = int(environ.get("SUPPLIER_PRODUCTS_CACHE_TIMEOUT", 60))
+
+# Price lists and tax types are cached as lookup tables for this many seconds
+# (default cache, see api/pricing.py). Any change to them invalidates the
+# tables in every process immediately, the version is kept in the database.
+PRICE_BOOK_CACHE_TIMEOUT = int(environ.get("PRICE_BOOK_CACHE_TIMEOUT", 3600))
+
+# Receivables ageing report (/api/reports/receivables-ageing/): upper bounds in
+# days past due of the overdue buckets, and the lifetime of the cached snapshot.
+RECEIVABLES_AGEING = {
+    "BUCKETS": [30, 60, 90],
+    "SNAPSHOT_TIMEOUT": int(environ.get("RECEIVABLES_SNAPSHOT_TIMEOUT", 300)),
+}
+
+# Change feed (/api/changes/, api/changes.py): entries newer than this many seconds
+# are held back, since with concurrent writers (PostgreSQL) log ids are not
+# assigned in commit order. Must exceed the longest write transaction. SQLite
+# serializes writers, so no lag is needed there.
+CHANGE_FEED_COMMIT_LAG = float(environ.get(
+    "CHANGE_FEED_COMMIT_LAG", 0 if DATABASES["default"]["ENGINE"].endswith("sqlite3") else 5
+))
+
+# Completed and cancelled orders older than this move to the archive tables
+# with `python manage.py archive_orders`.
+ORDER_ARCHIVE_AFTER_DAYS = int(environ.get("ORDER_ARCHIVE_AFTER_DAYS", 365))
+
+# OpenAPI schema precomputed at deploy time with `python manage.py generate_schema`.
+# Used by the documentation view while its checksum matches the source.
+SWAGGER_SCHEMA_FILE = environ.get("SWAGGER_SCHEMA_FILE", BASE_DIR / "openapi.json")
+
+# Live stock events (Server-Sent Events at /api/stock-events/, served via asgi.py).
+# BACKEND must implement publish/subscribe/unsubscribe, the local backend fans out
+# within a single process.
+STOCK_EVENTS = {
+    "BACKEND": environ.get("STOCK_EVENTS_BACKEND", "api.events.LocalBackend"),
+    "HEARTBEAT": 15,
+    "MAX_AGE": 300,
+}
+
+# Signed API tokens (api/authentication.py, `python manage.py issue_token <email>`):
+# lifetime in seconds, the number of verified tokens each process keeps and
+# the seconds after which a kept token is checked against the database again,
+# the longest a revocation takes to reach processes not sharing the cache.
+API_TOKENS = {
+    "MAX_AGE": int(environ.get("API_TOKEN_MAX_AGE", 30 * 24 * 3600)),
+    "CACHE_SIZE": int(environ.get("API_TOKEN_CACHE_SIZE", 10000)),
+    "REVALIDATE_AFTER": int(environ.get("API_TOKEN_REVALIDATE_AFTER", 60)),
+}
+
+# Rate limits and in-flight caps per client and route (api/throttling.py). A
+# client is the user of the request's token, else its address; "rate" is in
+# requests per second, "burst" the requests allowed at once and "concurrency"
+# the requests in progress at once (None: no cap). Route prefixes below /api/
+# pick a scope, roles scale the limits. CacheStore shares the counts between
+# worker processes through the default cache (see CACHES);
+# api.throttling.LocalStore counts exactly but per process, for a single
+# process or development.
+API_THROTTLING = {
+    "ENABLED": environ.get("API_THROTTLING", "true") == "true",
+    "STORE": environ.get("API_THROTTLING_STORE", "api.throttling.CacheStore"),
+    "SCOPES": {
+        "default": {"rate": 50, "burst": 200, "concurrency": 32},
+        "reports": {"rate": 1, "burst": 10, "concurrency": 2},
+        "imports": {"rate": 0.2, "burst": 5, "concurrency": 1},
+        "pricing": {"rate": 10, "burst": 50, "concurrency": 4},
+        # Event streams stay open for STOCK_EVENTS["MAX_AGE"] seconds.
+        "events": {"rate": 1, "burst": 10, "concurrency": None},
+    },
+    "ROUTES": {
+        "reports/": "reports",
+        "imports/": "imports",
+        "pricing/": "pricing",
+        "stock-events/": "events",
+    },
+    "ROLE_MULTIPLIERS": {"admin": 4, "super_admin": 4},
+}
+
+# In-process SKU index behind /api/products/by-sku/ (api/sku_index.py): built at
+# startup by wsgi.py/asgi.py, then refreshed from the change log at most every
+# REFRESH_INTERVAL seconds (immediately after product writes in the same process).
+SKU_INDEX = {
+    "REFRESH_INTERVAL": float(environ.get("SKU_INDEX_REFRESH_INTERVAL", 1.0)),
+    "WARM_ON_STARTUP": environ.get("SKU_INDEX_WARM_ON_STARTUP", "true") == "true",
+}
+
+# Responses are negotiated from the Accept header: plain application/json is
+# rendered exactly as before, "application/json; encoder=orjson" switches to
+# orjson and "application/msgpack" (or ?format=msgpack) to MessagePack.
+
+REST_FRAMEWORK = {
+    # Stateless tokens only: API calls never load the session or check CSRF.
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "api.authentication.SignedTokenAuthentication",
+    ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+        "api.renderers.MessagePackRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+        "api.renderers.MessagePackParser",
+    ],
+}
+
+# Response compression (api.middleware.CompressionMiddleware). Brotli and zstd
+# are used when installed and accepted by the client, gzip otherwise. Bodies
+# under MIN_SIZE bytes are sent uncompressed; streaming responses always are
+# compressed, chunk by chunk.
+RESPONSE_COMPRESSION = {
+    "ENCODINGS": ["br", "zstd", "gzip"],
+    "LEVELS": {
+        "br": int(environ.get("COMPRESSION_BROTLI_LEVEL", 4)),
+        "zstd": int(environ.get("COMPRESSION_ZSTD_LEVEL", 3)),
+        "gzip": int(environ.get("COMPRESSION_GZIP_LEVEL", 6)),
+    },
+    "MIN_SIZE": int(environ.get("COMPRESSION_MIN_SIZE", 860)),
+}
+
 CORS_ORIGIN_WHITELIST = (
     'http://localhost:7777',
 )
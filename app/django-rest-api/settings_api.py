@@ -0,0 +1,58 @@
+"""
+Lean settings profile for workers that only serve the API.
+
+Strips the admin, sessions, messages, static files and swagger apps together
+with the session, CSRF, auth, messages and clickjacking middleware, none of
+which a token API needs. Serve the admin and documentation from workers
+running the full ``django-rest-api.settings`` profile.
+
+Usage: DJANGO_SETTINGS_MODULE=django-rest-api.settings_api
+Measure with: python manage.py profile_startup --settings=django-rest-api.settings_api
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK, TEMPLATES
+
+LEAN_EXCLUDED_APPS = [
+    "django.contrib.admin",
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+    "drf_yasg",
+]
+
+LEAN_EXCLUDED_MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in LEAN_EXCLUDED_APPS]
+
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in LEAN_EXCLUDED_MIDDLEWARE]
+
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        "OPTIONS": {
+            "context_processors": [
+                "django.template.context_processors.debug",
+                "django.template.context_processors.request",
+            ],
+        },
+    },
+]
+
+# Signed tokens need neither sessions nor django.contrib.auth. Without the
+# auth app there is no AnonymousUser; unauthenticated requests get
+# request.user = None.
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_RENDERER_CLASSES": ["api.renderers.FastJSONRenderer", "api.renderers.MessagePackRenderer"],
+    "DEFAULT_AUTHENTICATION_CLASSES": ["api.authentication.SignedTokenAuthentication"],
+    "UNAUTHENTICATED_USER": None,
+}
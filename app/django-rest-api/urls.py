@@ -14,25 +14,30 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include, re_path
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Miinventory API",
-        default_version="v1",
-        description="Miinventory API built in Django REST API",
-    ),
-    public=True,
-)
+
+
+def schema_swagger_ui(request, *args, **kwargs):
+    # drf_yasg is imported on the first documentation hit only, keeping it off
+    # the import path of workers that only serve the API.
+    from api.schema import swagger_ui_view
+
+    return swagger_ui_view()(request, *args, **kwargs)
+
 
 urlpatterns = [
-    # Admin - Optional
-    path("admin/", admin.site.urls),
     # API
     path("api/", include("api.urls")),
-    # Documentation
-    path("", schema_view.with_ui("swagger", cache_timeout=0), name="schema-swagger-ui"),
 ]
+
+# The lean API settings profile (settings_api.py) leaves out the admin and docs.
+if apps.is_installed("django.contrib.admin"):
+    from django.contrib import admin
+
+    # Admin - Optional
+    urlpatterns.append(path("admin/", admin.site.urls))
+
+if apps.is_installed("drf_yasg"):
+    # Documentation
+    urlpatterns.append(path("", schema_swagger_ui, name="schema-swagger-ui"))